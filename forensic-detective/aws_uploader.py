@@ -5,11 +5,29 @@ Uploads validated images and forensic reports to S3 with WORM storage
 
 import json
 import boto3
+from boto3.exceptions import S3UploadFailedError
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
 from pathlib import Path
-from typing import Optional
-from datetime import datetime
+from typing import Callable, Optional
+from datetime import datetime, timezone
 
-from forensic_analyzer import ForensicResult
+from digests import FileDigests, digest_buffer, digest_file
+from forensic_analyzer import ForensicResult, ANALYZER_VERSION
+
+
+# Originals at or above this size are sent as multipart uploads
+MULTIPART_THRESHOLD_BYTES = 16 * 1024 * 1024
+MULTIPART_CHUNK_BYTES = 8 * 1024 * 1024
+
+# Parts of one multipart upload sent in parallel
+MULTIPART_CONCURRENCY = 8
+
+# Evidence retention (legal requirement)
+RETENTION_YEARS = 5
+
+# Content-addressed layout: images stored once under their SHA-256
+BLOB_PREFIX = 'blobs/sha256'
 
 
 class EvidenceUploader:
@@ -22,7 +40,10 @@ class EvidenceUploader:
         self,
         bucket_name: str,
         profile_name: str = 'omni-inspector',
-        region: str = 'us-east-1'
+        region: str = 'us-east-1',
+        s3_client=None,
+        endpoint_url: Optional[str] = None,
+        content_addressed: bool = False
     ):
         """
         Initialize evidence uploader
@@ -31,66 +52,126 @@ class EvidenceUploader:
             bucket_name: S3 bucket name (e.g., 'omni-inspector-evidence-prod')
             profile_name: AWS profile name
             region: AWS region
+            s3_client: Pre-built S3 client (e.g. for a local S3 stand-in);
+                       skips creating a session from the profile
+            endpoint_url: S3-compatible endpoint (e.g. MinIO or LocalStack)
+            content_addressed: Store each image once under its SHA-256 and
+                               give every case a pointer manifest to it
         """
         self.bucket_name = bucket_name
+        self.content_addressed = content_addressed
+        
+        if s3_client is not None:
+            self.s3_client = s3_client
+            self.dynamodb = None
+        else:
+            # Initialize boto3 session with profile
+            session = boto3.Session(profile_name=profile_name, region_name=region)
+            self.s3_client = session.client('s3', endpoint_url=endpoint_url)
+            self.dynamodb = session.resource('dynamodb')
+        
+        self.transfer_config = TransferConfig(
+            multipart_threshold=MULTIPART_THRESHOLD_BYTES,
+            multipart_chunksize=MULTIPART_CHUNK_BYTES,
+            max_concurrency=MULTIPART_CONCURRENCY
+        )
         
-        # Initialize boto3 session with profile
-        session = boto3.Session(profile_name=profile_name, region_name=region)
-        self.s3_client = session.client('s3')
-        self.dynamodb = session.resource('dynamodb')
+        # Cleared after the first upload rejected for missing Object Lock
+        # configuration, so later uploads skip the failing attempt
+        self.object_lock_enabled = True
     
     def upload_evidence(
         self,
         image_path: str,
         forensic_result: ForensicResult,
         case_id: str,
-        inspector_id: str
+        inspector_id: str,
+        timestamp: Optional[str] = None
     ) -> dict:
         """
         Upload image and forensic report to S3
         
+        The image is uploaded first and the report only once it is stored,
+        so a locked report never names a missing image; each is a single
+        request that also sets the Object Lock retention, and large images
+        are sent as multipart uploads with parallel parts.
+        
+        In the content-addressed layout the image is stored once under
+        blobs/sha256/ and skipped when a HEAD finds it already there; the
+        case gets a manifest.json pointing at the blob and its report. A
+        reused blob's retention is extended to this case's; if it cannot
+        be, the case gets its own copy of the image instead. The report and
+        the manifest are written only after the blob PUT succeeds, or the
+        HEAD has found the blob, so neither names a missing image.
+        
         Args:
             image_path: Path to the original image
             forensic_result: Forensic analysis result
             case_id: Unique case identifier
             inspector_id: Inspector/user identifier
+            timestamp: Upload time in the S3 keys (default: now); a retry
+                       passes the first attempt's, so it writes the same keys
             
         Returns:
-            Dictionary with S3 URLs and metadata
+            Dictionary with S3 URLs and metadata ('manifest_url' and
+            'deduplicated' in the content-addressed layout)
         """
         if not forensic_result.is_authentic:
             raise ValueError(f"Cannot upload rejected image: {forensic_result.rejection_reason}")
         
-        timestamp = datetime.utcnow().isoformat()
+        timestamp = timestamp or datetime.utcnow().isoformat()
         path = Path(image_path)
         
         # Generate S3 keys
         base_key = f"evidence/{case_id}/{timestamp}"
-        image_key = f"{base_key}/original{path.suffix}"
         report_key = f"{base_key}/forensic_report.json"
+        digests = forensic_result.digests
+        deduplicated = False
+        if self.content_addressed:
+            digests = digests or digest_file(image_path)
+            image_key = self._blob_key(digests)
+            blob = self._head_object(image_key)
+            deduplicated = blob is not None
+            if deduplicated and not self._extend_retention(image_key, blob):
+                # The shared blob would expire before this case's retention ends
+                image_key = f"{base_key}/original{path.suffix}"
+                deduplicated = False
+        else:
+            image_key = f"{base_key}/original{path.suffix}"
         
-        # Upload original image
-        image_url = self._upload_file(
-            file_path=image_path,
-            s3_key=image_key,
-            content_type=self._get_content_type(path.suffix),
-            metadata={
-                'case-id': case_id,
-                'inspector-id': inspector_id,
+        image_metadata = {
+            'case-id': case_id,
+            'inspector-id': inspector_id,
+            'file-hash': forensic_result.file_hash,
+            'timestamp': timestamp
+        }
+        if image_key.startswith(BLOB_PREFIX):
+            # Per-case details live in the pointer manifests, not on the blob
+            image_metadata = {
                 'file-hash': forensic_result.file_hash,
                 'timestamp': timestamp
             }
-        )
         
-        # Create forensic report
+        # Create forensic report (the image URL is known from its key)
         report = self._create_report(
             forensic_result=forensic_result,
             case_id=case_id,
             inspector_id=inspector_id,
-            image_s3_url=image_url
+            image_s3_url=self._s3_url(image_key)
         )
         
-        # Upload forensic report
+        # Upload original image, then the forensic report: the report is
+        # immutable once written, so it must not outlive a failed image PUT
+        if deduplicated:
+            image_url = self._s3_url(image_key)
+        else:
+            image_url = self._upload_file(
+                file_path=image_path,
+                s3_key=image_key,
+                content_type=self._get_content_type(path.suffix),
+                metadata=image_metadata,
+                digests=digests
+            )
         report_url = self._upload_json(
             data=report,
             s3_key=report_key,
@@ -101,37 +182,130 @@ class EvidenceUploader:
             }
         )
         
-        # Enable Object Lock (WORM) on both files
-        self._enable_object_lock(image_key)
-        self._enable_object_lock(report_key)
-        
-        return {
+        upload_result = {
             'case_id': case_id,
             'timestamp': timestamp,
             'image_url': image_url,
             'report_url': report_url,
-            'file_hash': forensic_result.file_hash
+            'file_hash': forensic_result.file_hash,
+            'digests': digests.to_dict() if digests else None
         }
+        
+        if self.content_addressed:
+            upload_result['deduplicated'] = deduplicated
+            # Written after the blob, so a pointer never names a missing object
+            upload_result['manifest_url'] = self._upload_json(
+                data={
+                    'case_id': case_id,
+                    'inspector_id': inspector_id,
+                    'timestamp': timestamp,
+                    'original_filename': path.name,
+                    'image_s3_url': image_url,
+                    'report_s3_url': report_url,
+                    'digests': digests.to_dict(),
+                    'deduplicated': deduplicated
+                },
+                s3_key=f"{base_key}/manifest.json",
+                metadata={
+                    'case-id': case_id,
+                    'inspector-id': inspector_id,
+                    'file-hash': forensic_result.file_hash,
+                    'timestamp': timestamp
+                }
+            )
+        
+        return upload_result
+    
+    def _blob_key(self, digests: FileDigests) -> str:
+        """Content-addressed key of an image (fanned out by hash prefix)"""
+        return f"{BLOB_PREFIX}/{digests.sha256[:2]}/{digests.sha256}"
+    
+    def _extend_retention(self, s3_key: str, head: dict) -> bool:
+        """
+        Extend an existing object's COMPLIANCE retention to a new upload's
+        
+        Args:
+            s3_key: Object key
+            head: HEAD response of the object
+        
+        Returns:
+            False if the object stays locked for less than that
+        """
+        if not self.object_lock_enabled:
+            return True
+        retain_until = self._object_lock_args()['ObjectLockRetainUntilDate'].replace(tzinfo=timezone.utc)
+        if head.get('ObjectLockMode') == 'COMPLIANCE' and head.get('ObjectLockRetainUntilDate', retain_until) >= retain_until:
+            return True
+        
+        try:
+            # COMPLIANCE retention may be extended, never shortened
+            self.s3_client.put_object_retention(
+                Bucket=self.bucket_name,
+                Key=s3_key,
+                Retention={'Mode': 'COMPLIANCE', 'RetainUntilDate': retain_until}
+            )
+            return True
+        except ClientError as e:
+            if 'objectlock' in str(e).lower().replace(' ', ''):
+                # Bucket without Object Lock: nothing to extend
+                print(f"Warning: Could not enable Object Lock: {e}")
+                self.object_lock_enabled = False
+                return True
+            print(f"Warning: Could not extend retention of {s3_key}: {e}")
+            return False
+    
+    def _head_object(self, s3_key: str) -> Optional[dict]:
+        """HEAD an object; None when it does not exist"""
+        try:
+            return self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
     
     def _upload_file(
         self,
         file_path: str,
         s3_key: str,
         content_type: str,
-        metadata: dict
+        metadata: dict,
+        digests: Optional[FileDigests] = None
     ) -> str:
-        """Upload file to S3"""
-        with open(file_path, 'rb') as f:
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=s3_key,
-                Body=f,
-                ContentType=content_type,
-                Metadata=metadata,
-                ServerSideEncryption='AES256'
-            )
+        """Upload file to S3 (multipart with parallel parts when large)"""
+        extra_args = {
+            'ContentType': content_type,
+            'Metadata': metadata,
+            'ServerSideEncryption': 'AES256'
+        }
         
-        return f"s3://{self.bucket_name}/{s3_key}"
+        if digests is not None and digests.size < MULTIPART_THRESHOLD_BYTES:
+            # Single PUT carrying the digests from the analysis; S3 verifies
+            # them, so the SDK does not hash the file again
+            def upload(lock_args):
+                with open(file_path, 'rb') as f:
+                    self.s3_client.put_object(
+                        Bucket=self.bucket_name,
+                        Key=s3_key,
+                        Body=f,
+                        ContentMD5=digests.content_md5,
+                        ChecksumSHA256=digests.checksum_sha256,
+                        **extra_args,
+                        **lock_args
+                    )
+        else:
+            # Multipart checksums are per part and computed while sending
+            def upload(lock_args):
+                self.s3_client.upload_file(
+                    file_path,
+                    self.bucket_name,
+                    s3_key,
+                    ExtraArgs={**extra_args, 'ChecksumAlgorithm': 'SHA256', **lock_args},
+                    Config=self.transfer_config
+                )
+        
+        self._with_object_lock(upload)
+        
+        return self._s3_url(s3_key)
     
     def _upload_json(
         self,
@@ -140,39 +314,62 @@ class EvidenceUploader:
         metadata: dict
     ) -> str:
         """Upload JSON data to S3"""
-        json_data = json.dumps(data, indent=2)
+        body = json.dumps(data, indent=2).encode('utf-8')
+        digests = digest_buffer(body)
         
-        self.s3_client.put_object(
+        self._with_object_lock(lambda lock_args: self.s3_client.put_object(
             Bucket=self.bucket_name,
             Key=s3_key,
-            Body=json_data.encode('utf-8'),
+            Body=body,
+            ContentMD5=digests.content_md5,
+            ChecksumSHA256=digests.checksum_sha256,
             ContentType='application/json',
             Metadata=metadata,
-            ServerSideEncryption='AES256'
-        )
+            ServerSideEncryption='AES256',
+            **lock_args
+        ))
         
+        return self._s3_url(s3_key)
+    
+    def _s3_url(self, s3_key: str) -> str:
         return f"s3://{self.bucket_name}/{s3_key}"
     
-    def _enable_object_lock(self, s3_key: str):
+    def _object_lock_args(self) -> dict:
         """
-        Enable Object Lock (WORM) on S3 object
+        Object Lock (WORM) parameters for a PUT
         This ensures the evidence cannot be modified or deleted
         """
+        # Set retention for 5 years (legal requirement)
+        now = datetime.utcnow()
         try:
-            # Set retention for 5 years (legal requirement)
-            retention_date = datetime.utcnow().replace(year=datetime.utcnow().year + 5)
-            
-            self.s3_client.put_object_retention(
-                Bucket=self.bucket_name,
-                Key=s3_key,
-                Retention={
-                    'Mode': 'COMPLIANCE',
-                    'RetainUntilDate': retention_date
-                }
-            )
-        except Exception as e:
-            # Object Lock might not be enabled on bucket
-            print(f"Warning: Could not enable Object Lock: {e}")
+            retention_date = now.replace(year=now.year + RETENTION_YEARS)
+        except ValueError:  # February 29th
+            retention_date = now.replace(year=now.year + RETENTION_YEARS, day=28)
+        
+        return {
+            'ObjectLockMode': 'COMPLIANCE',
+            'ObjectLockRetainUntilDate': retention_date
+        }
+    
+    def _with_object_lock(self, upload: Callable[[dict], object]):
+        """
+        Run upload(lock_args) with Object Lock set inline on the PUT
+        
+        If the bucket has no Object Lock configuration the upload is retried
+        without it, as the separate retention call used to do.
+        """
+        if self.object_lock_enabled:
+            try:
+                return upload(self._object_lock_args())
+            except (ClientError, S3UploadFailedError) as e:
+                # "Bucket is missing Object Lock Configuration"
+                if 'objectlock' not in str(e).lower().replace(' ', ''):
+                    raise
+                # Object Lock might not be enabled on bucket
+                print(f"Warning: Could not enable Object Lock: {e}")
+                self.object_lock_enabled = False
+        
+        return upload({})
     
     def _create_report(
         self,
@@ -190,7 +387,7 @@ class EvidenceUploader:
             'inspector_id': inspector_id,
             'analysis_timestamp': datetime.utcnow().isoformat(),
             'image_s3_url': image_s3_url,
-            'analyzer_version': '1.0.0'
+            'analyzer_version': ANALYZER_VERSION
         }
         
         # Add legal compliance info
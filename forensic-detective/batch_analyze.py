@@ -4,154 +4,458 @@ Analyzes all images in a folder and generates a summary report
 """
 
 import os
-import sys
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from forensic_analyzer import ForensicAnalyzer
-import json
+from forensic_analyzer import ForensicAnalyzer, ANALYZER_VERSION
+from folder_manifest import FolderManifest
+from report_writer import JsonlReportWriter, read_report, write_json_report
+from result_cache import ResultCache
+from stage_timing import StageStats
 
-def analyze_folder(folder_path, ela_threshold=0.20):
-    """Analyze all images in a folder"""
+
+REPORT_PATH = 'batch_analysis_report.jsonl'
+
+# Batches queued per worker; bounds memory however large the folder is
+BATCHES_IN_FLIGHT_PER_WORKER = 4
+
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.bmp']
+
+
+# Analyzer owned by each worker process (set by _init_worker)
+_worker_analyzer = None
+_worker_triage = False
+
+
+def _init_worker(ela_threshold, cache_path=None, triage=False):
+    """Create one analyzer (and cache connection) per worker process"""
+    global _worker_analyzer, _worker_triage
+    cache = ResultCache(cache_path, ANALYZER_VERSION) if cache_path else None
+    _worker_analyzer = ForensicAnalyzer(
+        ela_threshold=ela_threshold, cache=cache, record_timings=True
+    )
+    _worker_triage = triage
+
+
+def _analyze_in_worker(image_path):
+    """Analyze a single image inside a worker process"""
+    try:
+        if _worker_triage:
+            return _worker_analyzer.triage_image(str(image_path)), None
+        return _worker_analyzer.analyze_image(str(image_path)), None
+    except Exception as e:
+        return None, str(e)
+
+
+def _analyze_batch(image_paths):
+    """Analyze a batch of images inside a worker process"""
+    return [_analyze_in_worker(image_path) for image_path in image_paths]
+
+
+def iter_analysis(image_files, ela_threshold=0.20, workers=1, cache_path=None, triage=False):
+    """
+    Analyze images and yield (result, error) pairs in input order
+    
+    With workers > 1 the images are spread across a process pool; results
+    still stream back in the same order as image_files. With cache_path,
+    previously analyzed files are answered from the result cache. With
+    triage, only metadata checks run and results are TriageResults.
+    """
+    if workers <= 1:
+        _init_worker(ela_threshold, cache_path, triage)
+        for image_path in image_files:
+            yield _analyze_in_worker(image_path)
+        return
+    
+    # Batch small tasks together to keep IPC overhead low on large folders
+    chunksize = max(1, min(32, len(image_files) // (workers * 4)))
+    max_in_flight = workers * BATCHES_IN_FLIGHT_PER_WORKER
+    
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(ela_threshold, cache_path, triage)
+    ) as executor:
+        # Submit lazily (unlike executor.map) so only a few batches are
+        # queued or buffered at any time
+        in_flight = deque()
+        for start in range(0, len(image_files), chunksize):
+            if len(in_flight) >= max_in_flight:
+                yield from in_flight.popleft().result()
+            in_flight.append(
+                executor.submit(_analyze_batch, image_files[start:start + chunksize])
+            )
+        while in_flight:
+            yield from in_flight.popleft().result()
+
+
+def find_images(folder):
+    """List the image files directly inside a folder"""
+    image_files = []
+    for ext in IMAGE_EXTENSIONS:
+        image_files.extend(folder.glob(f'*{ext}'))
+        image_files.extend(folder.glob(f'*{ext.upper()}'))
+    # Globs overlap on case-insensitive filesystems
+    return sorted(set(image_files))
+
+
+def json_report_path_for(report_path):
+    """Single-document JSON report written next to a JSONL report"""
+    return Path(report_path).with_suffix('.json')
+
+
+def manifest_path_for(report_path):
+    """Manifest file kept next to a batch report"""
+    report_path = Path(report_path)
+    return report_path.with_name(report_path.stem + '.manifest.json')
+
+
+def open_manifest(report_path, ela_threshold, triage):
+    """Load the manifest for a report; stale settings start a fresh one"""
+    return FolderManifest(manifest_path_for(report_path), {
+        'ela_threshold': ela_threshold,
+        'triage': triage,
+        'analyzer_version': ANALYZER_VERSION
+    })
+
+
+def analyze_folder(
+    folder_path,
+    ela_threshold=0.20,
+    workers=1,
+    cache_path=None,
+    triage=False,
+    incremental=False,
+    report_path=REPORT_PATH,
+    manifest=None,
+    resume=False,
+    json_report=True
+):
+    """
+    Analyze all images in a folder
     
-    analyzer = ForensicAnalyzer(ela_threshold=ela_threshold)
-    results = []
+    Records are streamed to a JSONL report as each image finishes and the
+    summary is kept as running counters, so memory does not grow with the
+    number of images. With resume, images already in a partial report from
+    an interrupted run are skipped.
+    
+    With incremental (or an explicit manifest), only files that are new or
+    changed since the last run are analyzed; the records of the others are
+    taken from the manifest next to the report and merged into it.
+    
+    With json_report, the finished report is also written as the single
+    JSON document (batch_analysis_report.json by default) that consumers
+    of the pre-JSONL format read.
+    
+    Returns:
+        ReportStats of the written report
+    """
     
-    # Get all image files
-    image_extensions = ['.jpg', '.jpeg', '.png', '.bmp']
     folder = Path(folder_path)
     
     if not folder.exists():
         print(f"❌ Folder not found: {folder_path}")
         return
     
-    image_files = []
-    for ext in image_extensions:
-        image_files.extend(folder.glob(f'*{ext}'))
-        image_files.extend(folder.glob(f'*{ext.upper()}'))
+    image_files = find_images(folder)
     
     if not image_files:
         print(f"❌ No images found in: {folder_path}")
         return
     
+    if incremental and manifest is None:
+        manifest = open_manifest(report_path, ela_threshold, triage)
+    
+    if manifest is not None:
+        pending, previous, removed = manifest.changed_files(image_files)
+        manifest.prune(removed)
+    else:
+        pending, previous = image_files, {}
+    
+    writer = JsonlReportWriter(report_path, {
+        'folder': str(folder_path),
+        'ela_threshold': ela_threshold,
+        'triage': triage,
+        'analyzer_version': ANALYZER_VERSION
+    })
+    done = writer.resume() if resume else 0
+    if done and (done > len(image_files) or str(image_files[done - 1]) != writer.last_path):
+        print(f"⚠️  {report_path} does not match the folder contents; starting over")
+        done = 0
+    if not done:
+        writer.start()
+    
+    remaining = image_files[done:]
+    if done:
+        finished = {str(image_path) for image_path in image_files[:done]}
+        if manifest is not None:
+            # Changed files finished before the interruption go in the
+            # manifest too, or the next incremental run analyzes them again
+            changed = {str(image_path) for image_path in pending} & finished
+            for record in read_report(report_path):
+                if record['path'] in changed and 'error' not in record:
+                    manifest.record(Path(record['path']), None, record)
+        pending = [image_path for image_path in pending if str(image_path) not in finished]
+    pending_keys = {str(image_path) for image_path in pending}
+    
     print(f"\n{'='*70}")
     print(f"BATCH FORENSIC ANALYSIS")
     print(f"{'='*70}")
     print(f"Folder: {folder_path}")
     print(f"Images found: {len(image_files)}")
+    if done:
+        print(f"Resuming: {done} already in report")
+    if manifest is not None:
+        print(f"New or changed: {len(pending)} (unchanged: {len(remaining) - len(pending)})")
     print(f"ELA Threshold: {ela_threshold}")
+    if workers > 1:
+        print(f"Workers: {workers}")
+    if triage:
+        print(f"Mode: metadata triage (ELA skipped)")
     print(f"{'='*70}\n")
     
-    # Analyze each image
-    for i, image_path in enumerate(image_files, 1):
-        print(f"[{i}/{len(image_files)}] Analyzing: {image_path.name}")
-        
-        try:
-            result = analyzer.analyze_image(str(image_path))
-            
-            # Summary
-            status = "✅ AUTHENTIC" if result.is_authentic else "❌ REJECTED"
-            print(f"  Status: {status}")
-            print(f"  ELA Score: {result.tampering.ela_score:.4f}")
-            print(f"  Size: {result.file_size:,} bytes")
-            print(f"  Dimensions: {result.image_dimensions[0]}x{result.image_dimensions[1]}")
-            
-            if result.gps.is_valid():
-                print(f"  GPS: {result.gps.latitude:.6f}, {result.gps.longitude:.6f}")
-            else:
-                print(f"  GPS: Not available")
+    # Analyze each new or changed image, merging unchanged records in folder order
+    analysis = iter_analysis(pending, ela_threshold, workers, cache_path, triage)
+    stage_stats = StageStats()
+    i = 0
+    with writer:
+        for image_path in remaining:
+            key = str(image_path)
+            if key not in pending_keys:
+                if key in previous:
+                    writer.write(previous[key])
+                continue
             
-            if result.camera.make:
-                print(f"  Camera: {result.camera.make} {result.camera.model}")
-            else:
-                print(f"  Camera: Not available")
+            result, error = next(analysis)
+            i += 1
+            print(f"[{i}/{len(pending)}] Analyzing: {image_path.name}")
             
-            if not result.is_authentic:
-                print(f"  Reason: {result.rejection_reason}")
+            try:
+                if error is not None:
+                    raise RuntimeError(error)
+                
+                # Summary
+                status = "✅ AUTHENTIC" if result.is_authentic else "❌ REJECTED"
+                print(f"  Status: {status}")
+                ela_skipped = triage or 'ela' in result.skipped_checks
+                if triage:
+                    print(f"  ELA Score: skipped (triage)")
+                elif ela_skipped:
+                    print(f"  ELA Score: skipped (failed metadata checks)")
+                else:
+                    print(f"  ELA Score: {result.tampering.ela_score:.4f}")
+                print(f"  Size: {result.file_size:,} bytes")
+                print(f"  Dimensions: {result.image_dimensions[0]}x{result.image_dimensions[1]}")
+                
+                if result.gps.is_valid():
+                    print(f"  GPS: {result.gps.latitude:.6f}, {result.gps.longitude:.6f}")
+                else:
+                    print(f"  GPS: Not available")
+                
+                if result.camera.make:
+                    print(f"  Camera: {result.camera.make} {result.camera.model}")
+                else:
+                    print(f"  Camera: Not available")
+                
+                if not result.is_authentic:
+                    print(f"  Reason: {result.rejection_reason}")
+                
+                print()
+                
+                if not triage and result.timings:
+                    stage_stats.add(result.timings)
+                
+                # Store result
+                record = {
+                    'filename': image_path.name,
+                    'path': key,
+                    'authentic': result.is_authentic,
+                    'ela_score': None if ela_skipped else result.tampering.ela_score,
+                    'has_gps': result.gps.is_valid(),
+                    'has_camera_info': bool(result.camera.make),
+                    'size': result.file_size,
+                    'dimensions': f"{result.image_dimensions[0]}x{result.image_dimensions[1]}",
+                    'rejection_reason': result.rejection_reason if not result.is_authentic else None
+                }
+                if manifest is not None:
+                    manifest.record(image_path, getattr(result, 'file_hash', None), record)
+                
+            except Exception as e:
+                print(f"  ❌ Error: {str(e)}\n")
+                # Errors are not recorded in the manifest so the next run retries
+                record = {
+                    'filename': image_path.name,
+                    'path': key,
+                    'error': str(e)
+                }
             
-            print()
-            
-            # Store result
-            results.append({
-                'filename': image_path.name,
-                'path': str(image_path),
-                'authentic': result.is_authentic,
-                'ela_score': result.tampering.ela_score,
-                'has_gps': result.gps.is_valid(),
-                'has_camera_info': bool(result.camera.make),
-                'size': result.file_size,
-                'dimensions': f"{result.image_dimensions[0]}x{result.image_dimensions[1]}",
-                'rejection_reason': result.rejection_reason if not result.is_authentic else None
-            })
-            
-        except Exception as e:
-            print(f"  ❌ Error: {str(e)}\n")
-            results.append({
-                'filename': image_path.name,
-                'path': str(image_path),
-                'error': str(e)
-            })
+            writer.write(record)
+    
+    if manifest is not None:
+        manifest.save()
     
     # Summary statistics
+    stats = writer.stats
+    json_path = json_report_path_for(report_path)
+    if json_report and json_path != Path(report_path):
+        write_json_report(report_path, json_path, {
+            'folder': str(folder_path),
+            'ela_threshold': ela_threshold,
+            **stats.to_dict()
+        })
     print(f"{'='*70}")
     print(f"SUMMARY")
     print(f"{'='*70}")
     
-    total = len(results)
-    authentic = sum(1 for r in results if r.get('authentic', False))
-    rejected = sum(1 for r in results if 'authentic' in r and not r['authentic'])
-    errors = sum(1 for r in results if 'error' in r)
-    
-    with_gps = sum(1 for r in results if r.get('has_gps', False))
-    with_camera = sum(1 for r in results if r.get('has_camera_info', False))
-    
+    total = stats.total
     print(f"Total images: {total}")
-    print(f"✅ Authentic: {authentic} ({authentic/total*100:.1f}%)")
-    print(f"❌ Rejected: {rejected} ({rejected/total*100:.1f}%)")
-    if errors > 0:
-        print(f"⚠️  Errors: {errors}")
-    print(f"\n📍 With GPS: {with_gps} ({with_gps/total*100:.1f}%)")
-    print(f"📷 With Camera Info: {with_camera} ({with_camera/total*100:.1f}%)")
-    
-    if rejected > 0:
+    print(f"✅ Authentic: {stats.authentic} ({stats.authentic/total*100:.1f}%)")
+    print(f"❌ Rejected: {stats.rejected} ({stats.rejected/total*100:.1f}%)")
+    if stats.errors > 0:
+        print(f"⚠️  Errors: {stats.errors}")
+    print(f"\n📍 With GPS: {stats.with_gps} ({stats.with_gps/total*100:.1f}%)")
+    print(f"📷 With Camera Info: {stats.with_camera} ({stats.with_camera/total*100:.1f}%)")
+    
+    if stats.rejected > 0:
         print(f"\nRejection reasons:")
-        reasons = {}
-        for r in results:
-            if not r.get('authentic', True) and 'rejection_reason' in r:
-                reason = r['rejection_reason']
-                reasons[reason] = reasons.get(reason, 0) + 1
-        
-        for reason, count in reasons.items():
+        for reason, count in stats.reasons.items():
             print(f"  - {reason}: {count}")
     
-    print(f"{'='*70}\n")
+    if stage_stats.histograms:
+        print(f"\nStage timings (ms, this run):")
+        print(f"  {'stage':<12}{'images':>8}{'p50':>10}{'p95':>10}{'p99':>10}")
+        for stage in stage_stats.stages():
+            histogram = stage_stats.histograms[stage]
+            p50, p95, p99 = (histogram.percentile(q) / 1e6 for q in (50, 95, 99))
+            print(f"  {stage:<12}{histogram.total:>8}{p50:>10.2f}{p95:>10.2f}{p99:>10.2f}")
     
-    # Save detailed report
-    report_path = 'batch_analysis_report.json'
-    with open(report_path, 'w') as f:
-        json.dump({
-            'folder': str(folder_path),
-            'ela_threshold': ela_threshold,
-            'total_images': total,
-            'authentic': authentic,
-            'rejected': rejected,
-            'errors': errors,
-            'with_gps': with_gps,
-            'with_camera_info': with_camera,
-            'results': results
-        }, f, indent=2)
+    print(f"{'='*70}\n")
     
     print(f"📄 Detailed report saved to: {report_path}")
+    if json_report and json_path != Path(report_path):
+        print(f"📄 JSON report saved to: {json_path}")
     
-    return results
+    return stats
 
 
-if __name__ == '__main__':
-    if len(sys.argv) < 2:
-        print("Usage: python batch_analyze.py <folder_path> [ela_threshold]")
-        print("Example: python batch_analyze.py ../talos-inspection-photos")
-        print("Example: python batch_analyze.py ../talos-inspection-photos 0.25")
-        sys.exit(1)
+def watch_folder(
+    folder_path,
+    ela_threshold=0.20,
+    workers=1,
+    cache_path=None,
+    triage=False,
+    interval=2.0,
+    report_path=REPORT_PATH,
+    json_report=True
+):
+    """
+    Continuously analyze a drop folder
+    
+    Polls the folder every interval seconds. A poll only stats the files
+    against the manifest; analysis and a new report run only when images
+    were added, changed or removed. Stops on Ctrl+C.
+    """
+    folder = Path(folder_path)
+    manifest = open_manifest(report_path, ela_threshold, triage)
     
-    folder_path = sys.argv[1]
-    ela_threshold = float(sys.argv[2]) if len(sys.argv) > 2 else 0.20
+    print(f"👀 Watching {folder_path} every {interval:g}s (Ctrl+C to stop)")
+    try:
+        while True:
+            if folder.exists():
+                pending, _, removed = manifest.changed_files(find_images(folder))
+                manifest.prune(removed)
+                if pending or removed:
+                    analyze_folder(
+                        folder_path, ela_threshold, workers, cache_path, triage,
+                        report_path=report_path, manifest=manifest, json_report=json_report
+                    )
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("\nStopped watching")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Batch forensic analysis of a folder of images',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python batch_analyze.py ../talos-inspection-photos
+  python batch_analyze.py ../talos-inspection-photos 0.25
+  python batch_analyze.py ../talos-inspection-photos --workers 8
+  python batch_analyze.py ../talos-inspection-photos --cache forensic_cache.db
+  python batch_analyze.py ../talos-inspection-photos --triage --workers 8
+  python batch_analyze.py ../talos-inspection-photos --incremental
+  python batch_analyze.py ../drop-folder --watch --interval 1
+  python batch_analyze.py ../talos-inspection-photos --resume
+        """
+    )
+    parser.add_argument('folder_path', help='Folder with images to analyze')
+    parser.add_argument(
+        'ela_threshold',
+        nargs='?',
+        type=float,
+        default=0.20,
+        help='ELA tampering threshold (default: 0.20)'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help=f'Number of analysis processes (default: 1, this machine has {os.cpu_count()} cores)'
+    )
+    parser.add_argument(
+        '--cache',
+        help='SQLite result cache; unchanged photos skip decoding and ELA'
+    )
+    parser.add_argument(
+        '--triage',
+        action='store_true',
+        help='Metadata-only triage: EXIF and timestamp checks without decoding or ELA'
+    )
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Only analyze new or changed files; reuse the rest from the manifest next to the report'
+    )
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help='Keep polling the folder and analyze images as they arrive (implies --incremental)'
+    )
+    parser.add_argument(
+        '--interval',
+        type=float,
+        default=2.0,
+        help='Polling interval in seconds for --watch (default: 2.0)'
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Continue an interrupted run from its partially written report'
+    )
+    parser.add_argument(
+        '--no-json',
+        action='store_true',
+        help='Only write the JSONL report, not the single-document JSON copy next to it'
+    )
+    parser.add_argument(
+        '--report',
+        default=REPORT_PATH,
+        help=f'Report file; the manifest is stored next to it (default: {REPORT_PATH})'
+    )
+    args = parser.parse_args()
     
-    analyze_folder(folder_path, ela_threshold)
+    if args.watch:
+        watch_folder(
+            args.folder_path, args.ela_threshold, args.workers, args.cache, args.triage,
+            interval=args.interval, report_path=args.report, json_report=not args.no_json
+        )
+    else:
+        analyze_folder(
+            args.folder_path, args.ela_threshold, args.workers, args.cache, args.triage,
+            incremental=args.incremental, report_path=args.report, resume=args.resume,
+            json_report=not args.no_json
+        )
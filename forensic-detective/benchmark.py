@@ -0,0 +1,291 @@
+"""
+Forensic benchmark suite
+Generates a synthetic evidence corpus and times every ForensicAnalyzer stage
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+from PIL import Image
+
+from create_test_image import gradient_pixels, build_exif
+from forensic_analyzer import ForensicAnalyzer
+from stage_timing import STAGES
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+DEFAULT_RESOLUTIONS = [(640, 480), (1920, 1080), (4032, 3024)]
+
+# 'none' writes no EXIF at all; 'bad_timestamp' is dated one year ahead
+EXIF_VARIANTS = ('full', 'no_gps', 'no_camera', 'bad_timestamp', 'none')
+
+# Every Nth group of resolutions gets a spliced patch
+TAMPERED_EVERY = 4
+
+
+def synthetic_scene(width: int, height: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Photo-like RGB frame: gradient, smooth blotches and sensor noise
+
+    Fully vectorized; the texture gives JPEG recompression realistic work
+    instead of the flat areas of a pure gradient.
+    """
+    frame = gradient_pixels(width, height).astype(np.int16)
+
+    # Low-frequency blotches: a coarse random grid upsampled to full size
+    coarse = rng.integers(0, 256, (max(1, height // 64), max(1, width // 64), 3), dtype=np.uint8)
+    blotches = np.asarray(Image.fromarray(coarse).resize((width, height), Image.BILINEAR))
+    frame += (blotches.astype(np.int16) - 128) // 2
+
+    frame += rng.integers(-6, 7, frame.shape, dtype=np.int16)
+    return np.clip(frame, 0, 255).astype(np.uint8)
+
+
+def splice(frame: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """Paste a rectangle of noise whose recompression error stands out"""
+    height, width = frame.shape[:2]
+    patch_h = int(rng.integers(height // 8, height // 4 + 1))
+    patch_w = int(rng.integers(width // 8, width // 4 + 1))
+    y = int(rng.integers(0, height - patch_h + 1))
+    x = int(rng.integers(0, width - patch_w + 1))
+
+    frame = frame.copy()
+    frame[y:y + patch_h, x:x + patch_w] = rng.integers(0, 256, (patch_h, patch_w, 3), dtype=np.uint8)
+    return frame
+
+
+def corpus_spec(index: int, resolutions: List[Tuple[int, int]]) -> Tuple[Tuple[int, int], str, bool]:
+    """(resolution, EXIF variant, tampered) of the index-th corpus image"""
+    group = index // len(resolutions)
+    resolution = resolutions[index % len(resolutions)]
+    variant = EXIF_VARIANTS[group % len(EXIF_VARIANTS)]
+    tampered = group % TAMPERED_EVERY == TAMPERED_EVERY - 1
+    return resolution, variant, tampered
+
+
+def _generate_one(args) -> str:
+    """Write one corpus image (runs in a worker process)"""
+    output_dir, index, resolutions, seed = args
+    (width, height), variant, tampered = corpus_spec(index, resolutions)
+    rng = np.random.default_rng([seed, index])
+
+    frame = synthetic_scene(width, height, rng)
+    if tampered:
+        frame = splice(frame, rng)
+
+    name = f"{index:06d}_{width}x{height}_{variant}{'_tampered' if tampered else ''}.jpg"
+    path = Path(output_dir) / name
+
+    save_args = {'quality': 95}
+    if variant != 'none':
+        timestamp = datetime.now()
+        if variant == 'bad_timestamp':
+            timestamp += timedelta(days=365)
+        save_args['exif'] = build_exif(
+            with_gps=variant != 'no_gps',
+            with_camera=variant != 'no_camera',
+            timestamp=timestamp
+        )
+
+    Image.fromarray(frame).save(path, 'JPEG', **save_args)
+    return str(path)
+
+
+def generate_corpus(
+    output_dir: str,
+    count: int,
+    resolutions: List[Tuple[int, int]] = None,
+    workers: int = None,
+    seed: int = 0
+) -> List[str]:
+    """
+    Generate a synthetic benchmark corpus
+
+    Images cycle through the resolutions, and each group of resolutions
+    through the EXIF variants and spliced/clean, so every combination
+    appears once count reaches resolutions x 20. The same seed always
+    produces the same pixels.
+
+    Args:
+        output_dir: Directory for the JPEGs (created if missing)
+        count: Number of images
+        resolutions: (width, height) pairs (default: DEFAULT_RESOLUTIONS)
+        workers: Generator processes (default: CPU count)
+        seed: Random seed
+
+    Returns:
+        Paths of the generated images
+    """
+    resolutions = resolutions or DEFAULT_RESOLUTIONS
+    workers = workers or os.cpu_count() or 1
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+
+    tasks = [(str(output_dir), index, resolutions, seed) for index in range(count)]
+    if workers <= 1:
+        return [_generate_one(task) for task in tasks]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_generate_one, tasks, chunksize=max(1, count // (workers * 4))))
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process, or None if unavailable"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def run_benchmark(corpus_dir: str, ela_threshold: float = 0.20, limit: int = None) -> Dict:
+    """
+    Analyze a corpus and collect per-stage timings
+
+    Returns:
+        Report with images/sec, peak RSS and, per stage, the number of
+        images it ran for and mean/p50/p95/total milliseconds ('total' is
+        the whole analyze_image call, 'other' the time outside the stages)
+    """
+    image_files = sorted(Path(corpus_dir).glob('*.jpg'))[:limit]
+    analyzer = ForensicAnalyzer(ela_threshold=ela_threshold, record_timings=True)
+
+    samples = {stage: [] for stage in [*STAGES, 'other', 'total']}
+    rejected = 0
+    tampered = 0
+
+    started = time.perf_counter_ns()
+    for image_path in image_files:
+        image_start = time.perf_counter_ns()
+        result = analyzer.analyze_image(str(image_path))
+        total = time.perf_counter_ns() - image_start
+
+        timings = result.timings or {}
+        for stage, elapsed in timings.items():
+            samples[stage].append(elapsed)
+        samples['other'].append(total - sum(timings.values()))
+        samples['total'].append(total)
+
+        rejected += not result.is_authentic
+        tampered += result.tampering.is_tampered
+    elapsed = (time.perf_counter_ns() - started) / 1e9
+
+    stages = {}
+    for stage, values in samples.items():
+        ms = np.asarray(values, dtype=np.float64) / 1e6
+        stages[stage] = {
+            'count': int(ms.size),
+            'mean_ms': float(ms.mean()) if ms.size else 0.0,
+            'p50_ms': float(np.percentile(ms, 50)) if ms.size else 0.0,
+            'p95_ms': float(np.percentile(ms, 95)) if ms.size else 0.0,
+            'total_ms': float(ms.sum()),
+        }
+
+    return {
+        'corpus': str(corpus_dir),
+        'images': len(image_files),
+        'rejected': rejected,
+        'tampered': tampered,
+        'seconds': elapsed,
+        'images_per_sec': len(image_files) / elapsed if elapsed else 0.0,
+        'peak_rss_bytes': peak_rss_bytes(),
+        'stages': stages,
+    }
+
+
+def print_report(report: Dict):
+    """Print a benchmark report as a table"""
+    print(f"\n{'='*70}")
+    print(f"FORENSIC BENCHMARK")
+    print(f"{'='*70}")
+    print(f"Corpus: {report['corpus']}")
+    print(f"Images: {report['images']} ({report['rejected']} rejected, {report['tampered']} tampered)")
+    print(f"Throughput: {report['images_per_sec']:.2f} images/sec ({report['seconds']:.2f}s)")
+    if report['peak_rss_bytes'] is not None:
+        print(f"Peak RSS: {report['peak_rss_bytes'] / (1024 * 1024):.1f} MB")
+    else:
+        print(f"Peak RSS: n/a")
+
+    total_ms = report['stages']['total']['total_ms'] or 1.0
+    print(f"\n{'Stage':<12}{'images':>8}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'share':>9}")
+    for stage, stats in report['stages'].items():
+        share = stats['total_ms'] / total_ms * 100
+        print(
+            f"{stage:<12}{stats['count']:>8}{stats['mean_ms']:>10.2f}{stats['p50_ms']:>10.2f}"
+            f"{stats['p95_ms']:>10.2f}{share:>8.1f}%"
+        )
+    print(f"{'='*70}\n")
+
+
+def _parse_resolution(value: str) -> Tuple[int, int]:
+    width, _, height = value.lower().partition('x')
+    return int(width), int(height)
+
+
+def main():
+    """Benchmark entry point"""
+    parser = argparse.ArgumentParser(
+        description='Forensic Detective benchmark suite',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  # Generate 200 images across the default resolutions
+  python benchmark.py generate bench_corpus --count 200
+
+  # Small images only, 8 generator processes
+  python benchmark.py generate bench_corpus --count 1000 --resolution 640x480 --workers 8
+
+  # Time the analyzer and keep the numbers for comparison
+  python benchmark.py run bench_corpus --output bench.json
+        """
+    )
+    subparsers = parser.add_subparsers(dest='command', help='Command to execute')
+
+    generate_parser = subparsers.add_parser('generate', help='Generate a synthetic corpus')
+    generate_parser.add_argument('output_dir', help='Directory for the generated images')
+    generate_parser.add_argument('--count', type=int, default=100, help='Number of images (default: 100)')
+    generate_parser.add_argument(
+        '--resolution',
+        action='append',
+        type=_parse_resolution,
+        help='WIDTHxHEIGHT, repeatable (default: 640x480, 1920x1080, 4032x3024)'
+    )
+    generate_parser.add_argument('--workers', type=int, help='Generator processes (default: CPU count)')
+    generate_parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+
+    run_parser = subparsers.add_parser('run', help='Time the analyzer on a corpus')
+    run_parser.add_argument('corpus_dir', help='Corpus directory')
+    run_parser.add_argument('--ela-threshold', type=float, default=0.20, help='ELA threshold (default: 0.20)')
+    run_parser.add_argument('--limit', type=int, help='Analyze at most this many images')
+    run_parser.add_argument('--output', '-o', help='Save the report as JSON')
+
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        started = time.perf_counter()
+        paths = generate_corpus(args.output_dir, args.count, args.resolution, args.workers, args.seed)
+        print(f"✅ Generated {len(paths)} images in {time.perf_counter() - started:.1f}s: {args.output_dir}")
+    elif args.command == 'run':
+        report = run_benchmark(args.corpus_dir, args.ela_threshold, args.limit)
+        print_report(report)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+            print(f"📄 Report saved to: {args.output}")
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
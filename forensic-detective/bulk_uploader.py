@@ -0,0 +1,194 @@
+"""
+Bulk Evidence Uploader - Analyze and upload a whole folder of images
+Bounded worker pool, retry with backoff and a resumable upload manifest
+"""
+
+import json
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from aws_uploader import EvidenceUploader
+from batch_analyze import find_images
+from digests import digest_file
+from forensic_analyzer import ForensicAnalyzer
+
+
+DEFAULT_MANIFEST_PATH = 'upload_manifest.jsonl'
+
+# Upload attempts per image and exponential backoff between them
+DEFAULT_MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 30.0
+
+# Images queued per worker; bounds memory however large the folder is
+TASKS_IN_FLIGHT_PER_WORKER = 2
+
+
+class UploadManifest:
+    """
+    Append-only JSONL record of completed uploads
+
+    One line per (case_id, file_hash) with its S3 URLs, flushed as soon as
+    the upload finishes, so an interrupted run knows exactly what is
+    already stored. Safe to use from several threads.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.entries: Dict[Tuple[str, str], Dict] = {}
+        self._lock = threading.Lock()
+
+        if self.path.exists():
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # Torn final line from an interrupted run
+                    self.entries[(entry['case_id'], entry['file_hash'])] = entry
+
+    def get(self, case_id: str, file_hash: str) -> Optional[Dict]:
+        """Completed upload for this case and file, if any"""
+        return self.entries.get((case_id, file_hash))
+
+    def add(self, entry: Dict):
+        """Record a completed upload"""
+        with self._lock:
+            self.entries[(entry['case_id'], entry['file_hash'])] = entry
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+
+
+@dataclass
+class UploadOutcome:
+    """Result of analyzing and uploading one image"""
+    path: str
+    status: str  # 'uploaded', 'skipped', 'rejected' or 'failed'
+    file_hash: Optional[str] = None
+    s3_url: Optional[str] = None
+    detail: Optional[str] = None
+    attempts: int = 0
+
+
+class BulkUploader:
+    """
+    Analyze and upload every image of a folder to one case
+
+    Images flow through a bounded thread pool: each is hashed, skipped if
+    the manifest already has it for this case, analyzed, and uploaded with
+    retries. Rejected images are reported and never uploaded.
+    """
+
+    def __init__(
+        self,
+        uploader: EvidenceUploader,
+        analyzer: Optional[ForensicAnalyzer] = None,
+        manifest_path: str = DEFAULT_MANIFEST_PATH,
+        workers: int = 4,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        backoff_base: float = BACKOFF_BASE_SECONDS,
+        backoff_max: float = BACKOFF_MAX_SECONDS,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        """
+        Initialize bulk uploader
+
+        Args:
+            uploader: EvidenceUploader for the target bucket
+            analyzer: Analyzer used before upload (default: ForensicAnalyzer())
+            manifest_path: JSONL manifest of completed uploads
+            workers: Images processed concurrently
+            max_attempts: Upload attempts per image before giving up
+            backoff_base: Delay before the first retry; doubles per attempt
+            backoff_max: Upper bound for a single delay
+            sleep: Sleep function (injectable for tests)
+        """
+        self.uploader = uploader
+        self.analyzer = analyzer or ForensicAnalyzer()
+        self.manifest = UploadManifest(manifest_path)
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.sleep = sleep
+
+    def upload_folder(self, folder_path: str, case_id: str, inspector_id: str) -> Iterator[UploadOutcome]:
+        """Process every image in a folder; yields outcomes in folder order"""
+        return self.upload_images(find_images(Path(folder_path)), case_id, inspector_id)
+
+    def upload_images(
+        self,
+        image_files: List[Path],
+        case_id: str,
+        inspector_id: str
+    ) -> Iterator[UploadOutcome]:
+        """Process images on the worker pool; yields outcomes in input order"""
+        max_in_flight = self.workers * TASKS_IN_FLIGHT_PER_WORKER
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            in_flight = deque()
+            for image_path in image_files:
+                if len(in_flight) >= max_in_flight:
+                    yield in_flight.popleft().result()
+                in_flight.append(
+                    executor.submit(self._process, str(image_path), case_id, inspector_id)
+                )
+            while in_flight:
+                yield in_flight.popleft().result()
+
+    def _process(self, image_path: str, case_id: str, inspector_id: str) -> UploadOutcome:
+        """Hash, analyze and upload one image"""
+        try:
+            # One pass over the bytes; the analysis and the upload reuse it
+            digests = digest_file(image_path)
+        except OSError as e:
+            return UploadOutcome(image_path, 'failed', detail=str(e))
+        file_hash = digests.file_hash
+
+        done = self.manifest.get(case_id, file_hash)
+        if done is not None:
+            return UploadOutcome(image_path, 'skipped', file_hash, done['s3_url'], "Already uploaded")
+
+        result = self.analyzer.analyze_image(image_path, digests=digests)
+        if not result.is_authentic:
+            return UploadOutcome(image_path, 'rejected', file_hash, detail=result.rejection_reason)
+
+        # Every attempt writes the same keys, so a failed one leaves no
+        # locked objects under a prefix nothing points to
+        timestamp = datetime.utcnow().isoformat()
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                upload = self.uploader.upload_evidence(
+                    image_path=image_path,
+                    forensic_result=result,
+                    case_id=case_id,
+                    inspector_id=inspector_id,
+                    timestamp=timestamp
+                )
+                break
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    return UploadOutcome(image_path, 'failed', file_hash, detail=str(e), attempts=attempt)
+                self.sleep(self._backoff(attempt))
+
+        self.manifest.add({
+            'case_id': case_id,
+            'file_hash': upload['file_hash'],
+            's3_url': upload['image_url'],
+            'report_url': upload['report_url'],
+            'path': image_path,
+            'timestamp': upload['timestamp']
+        })
+        return UploadOutcome(image_path, 'uploaded', file_hash, upload['image_url'], attempts=attempt)
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
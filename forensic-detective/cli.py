@@ -9,16 +9,23 @@ from pathlib import Path
 
 from forensic_analyzer import ForensicAnalyzer
 from aws_uploader import EvidenceUploader
+from bulk_uploader import BulkUploader, DEFAULT_MANIFEST_PATH, DEFAULT_MAX_ATTEMPTS
 
 
 def analyze_command(args):
     """Analyze an image"""
     analyzer = ForensicAnalyzer(ela_threshold=args.ela_threshold)
-    result = analyzer.analyze_image(args.image)
+    
+    if args.triage:
+        result = analyzer.triage_image(args.image)
+    else:
+        result = analyzer.analyze_image(args.image)
     
     # Print result
     if args.json:
         print(json.dumps(result.to_dict(), indent=2))
+    elif args.triage:
+        print_triage_readable(result)
     else:
         print_human_readable(result)
     
@@ -46,7 +53,9 @@ def upload_command(args):
     uploader = EvidenceUploader(
         bucket_name=args.bucket,
         profile_name=args.profile,
-        region=args.region
+        region=args.region,
+        endpoint_url=args.endpoint_url,
+        content_addressed=args.content_addressed
     )
     
     try:
@@ -62,6 +71,10 @@ def upload_command(args):
         print(f"   Image URL: {upload_result['image_url']}")
         print(f"   Report URL: {upload_result['report_url']}")
         print(f"   File Hash: {upload_result['file_hash']}")
+        if 'manifest_url' in upload_result:
+            print(f"   Manifest URL: {upload_result['manifest_url']}")
+            if upload_result['deduplicated']:
+                print("   Image already stored; upload skipped")
         
         sys.exit(0)
     except Exception as e:
@@ -69,6 +82,45 @@ def upload_command(args):
         sys.exit(1)
 
 
+def upload_folder_command(args):
+    """Analyze and upload every image in a folder"""
+    folder = Path(args.folder)
+    if not folder.is_dir():
+        print(f"❌ Folder not found: {args.folder}")
+        sys.exit(1)
+    
+    bulk = BulkUploader(
+        uploader=EvidenceUploader(
+            bucket_name=args.bucket,
+            profile_name=args.profile,
+            region=args.region,
+            endpoint_url=args.endpoint_url,
+            content_addressed=args.content_addressed
+        ),
+        analyzer=ForensicAnalyzer(ela_threshold=args.ela_threshold),
+        manifest_path=args.manifest,
+        workers=args.workers,
+        max_attempts=args.max_attempts
+    )
+    
+    icons = {'uploaded': '✅', 'skipped': '⏭️ ', 'rejected': '❌', 'failed': '⚠️ '}
+    counts = dict.fromkeys(icons, 0)
+    for outcome in bulk.upload_folder(folder, args.case_id, args.inspector_id):
+        counts[outcome.status] += 1
+        line = f"{icons[outcome.status]} {outcome.status.upper():<8} {Path(outcome.path).name}"
+        if outcome.s3_url:
+            line += f" -> {outcome.s3_url}"
+        if outcome.detail and outcome.status != 'skipped':
+            line += f" ({outcome.detail})"
+        print(line)
+    
+    print(f"\nUploaded: {counts['uploaded']}, already uploaded: {counts['skipped']}, "
+          f"rejected: {counts['rejected']}, failed: {counts['failed']}")
+    print(f"Manifest: {args.manifest}")
+    
+    sys.exit(1 if counts['failed'] else 0)
+
+
 def print_human_readable(result):
     """Print result in human-readable format"""
     print("\n" + "="*60)
@@ -88,6 +140,52 @@ def print_human_readable(result):
     print(f"   Size: {result.file_size:,} bytes")
     print(f"   Dimensions: {result.image_dimensions[0]}x{result.image_dimensions[1]}")
     
+    print_metadata(result)
+    
+    # Tampering
+    print(f"\n🔍 TAMPERING ANALYSIS:")
+    if 'ela' in result.skipped_checks:
+        print(f"   Skipped: image already failed metadata checks")
+        print("\n" + "="*60 + "\n")
+        return
+    print(f"   ELA Score: {result.tampering.ela_score:.4f}")
+    print(f"   Tampered: {'Yes' if result.tampering.is_tampered else 'No'}")
+    print(f"   Confidence: {result.tampering.confidence:.2%}")
+    if result.tampering.suspicious_regions:
+        print(f"   Suspicious Regions: {len(result.tampering.suspicious_regions)}")
+        largest = sorted(result.tampering.regions, key=lambda r: r.area, reverse=True)
+        for region in largest[:5]:
+            print(f"     - {region.width}x{region.height} at ({region.x}, {region.y}), "
+                  f"{region.area:,} px, mean error {region.mean_error:.3f}")
+    
+    print("\n" + "="*60 + "\n")
+
+
+def print_triage_readable(result):
+    """Print a metadata-only triage result in human-readable format"""
+    print("\n" + "="*60)
+    print("METADATA TRIAGE REPORT")
+    print("="*60)
+    
+    # Provisional status
+    if result.is_authentic:
+        print("\n✅ STATUS: PASSES METADATA CHECKS (ELA pending)")
+    else:
+        print(f"\n❌ STATUS: REJECTED")
+        print(f"   Reason: {result.rejection_reason}")
+    
+    # File info
+    print(f"\n📁 FILE INFORMATION:")
+    print(f"   Size: {result.file_size:,} bytes")
+    print(f"   Dimensions: {result.image_dimensions[0]}x{result.image_dimensions[1]}")
+    
+    print_metadata(result)
+    
+    print("\n" + "="*60 + "\n")
+
+
+def print_metadata(result):
+    """Print GPS, camera and timestamp sections"""
     # GPS
     if result.gps.is_valid():
         print(f"\n📍 GPS COORDINATES:")
@@ -118,16 +216,6 @@ def print_human_readable(result):
         print(f"   Original: {result.timestamp.original}")
         if result.timestamp.modified:
             print(f"   Modified: {result.timestamp.modified}")
-    
-    # Tampering
-    print(f"\n🔍 TAMPERING ANALYSIS:")
-    print(f"   ELA Score: {result.tampering.ela_score:.4f}")
-    print(f"   Tampered: {'Yes' if result.tampering.is_tampered else 'No'}")
-    print(f"   Confidence: {result.tampering.confidence:.2%}")
-    if result.tampering.suspicious_regions:
-        print(f"   Suspicious Regions: {len(result.tampering.suspicious_regions)}")
-    
-    print("\n" + "="*60 + "\n")
 
 
 def main():
@@ -146,8 +234,14 @@ Examples:
   # Save report to file
   python cli.py analyze photo.jpg --output report.json
   
+  # Metadata-only triage (EXIF checks, no ELA)
+  python cli.py analyze photo.jpg --triage
+  
   # Analyze and upload to S3
   python cli.py upload photo.jpg --case-id CASE-001 --inspector-id INS-123
+  
+  # Analyze and upload a whole folder (re-run to resume)
+  python cli.py upload-folder photos/ --case-id CASE-001 --inspector-id INS-123 --workers 8
         """
     )
     
@@ -172,6 +266,11 @@ Examples:
         '-o',
         help='Save report to file'
     )
+    analyze_parser.add_argument(
+        '--triage',
+        action='store_true',
+        help='Metadata-only triage: parse EXIF from the header, skip decoding and ELA'
+    )
     analyze_parser.set_defaults(func=analyze_command)
     
     # Upload command
@@ -194,6 +293,15 @@ Examples:
         default='us-east-1',
         help='AWS region'
     )
+    upload_parser.add_argument(
+        '--endpoint-url',
+        help='S3-compatible endpoint (e.g. a local MinIO or LocalStack)'
+    )
+    upload_parser.add_argument(
+        '--content-addressed',
+        action='store_true',
+        help='Store each image once under its SHA-256, with per-case pointer manifests'
+    )
     upload_parser.add_argument(
         '--ela-threshold',
         type=float,
@@ -202,6 +310,63 @@ Examples:
     )
     upload_parser.set_defaults(func=upload_command)
     
+    # Bulk upload command
+    folder_parser = subparsers.add_parser(
+        'upload-folder',
+        help='Analyze and upload every image in a folder (resumable)'
+    )
+    folder_parser.add_argument('folder', help='Folder with images')
+    folder_parser.add_argument('--case-id', required=True, help='Case identifier')
+    folder_parser.add_argument('--inspector-id', required=True, help='Inspector identifier')
+    folder_parser.add_argument(
+        '--bucket',
+        default='omni-inspector-evidence-dev',
+        help='S3 bucket name'
+    )
+    folder_parser.add_argument(
+        '--profile',
+        default='omni-inspector',
+        help='AWS profile name'
+    )
+    folder_parser.add_argument(
+        '--region',
+        default='us-east-1',
+        help='AWS region'
+    )
+    folder_parser.add_argument(
+        '--endpoint-url',
+        help='S3-compatible endpoint (e.g. a local MinIO or LocalStack)'
+    )
+    folder_parser.add_argument(
+        '--content-addressed',
+        action='store_true',
+        help='Store each image once under its SHA-256, with per-case pointer manifests'
+    )
+    folder_parser.add_argument(
+        '--ela-threshold',
+        type=float,
+        default=0.15,
+        help='ELA tampering threshold'
+    )
+    folder_parser.add_argument(
+        '--workers',
+        type=int,
+        default=4,
+        help='Images analyzed and uploaded concurrently (default: 4)'
+    )
+    folder_parser.add_argument(
+        '--max-attempts',
+        type=int,
+        default=DEFAULT_MAX_ATTEMPTS,
+        help=f'Upload attempts per image, with exponential backoff (default: {DEFAULT_MAX_ATTEMPTS})'
+    )
+    folder_parser.add_argument(
+        '--manifest',
+        default=DEFAULT_MANIFEST_PATH,
+        help=f'Manifest of completed uploads used to resume (default: {DEFAULT_MANIFEST_PATH})'
+    )
+    folder_parser.set_defaults(func=upload_folder_command)
+    
     # Parse and execute
     args = parser.parse_args()
     
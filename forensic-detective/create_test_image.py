@@ -3,34 +3,33 @@ Create a test image with EXIF data for testing
 """
 
 from PIL import Image
+import numpy as np
 import piexif
 from datetime import datetime
-import random
 
 
-def create_test_image(filename="test_image.jpg", with_gps=True, with_camera=True):
+def gradient_pixels(width, height):
     """
-    Create a test image with EXIF metadata
+    Red/green gradient with constant blue, as a (height, width, 3) uint8 array
+    
+    Built with numpy broadcasting; matches the original per-pixel loop.
+    """
+    pixels = np.empty((height, width, 3), dtype=np.uint8)
+    pixels[..., 0] = (np.arange(width) / width * 255).astype(np.uint8)[np.newaxis, :]
+    pixels[..., 1] = (np.arange(height) / height * 255).astype(np.uint8)[:, np.newaxis]
+    pixels[..., 2] = 128
+    return pixels
+
+
+def build_exif(with_gps=True, with_camera=True, timestamp=None):
+    """
+    Build EXIF bytes for a test image
     
     Args:
-        filename: Output filename
-        with_gps: Include GPS coordinates
+        with_gps: Include GPS coordinates (Buenos Aires)
         with_camera: Include camera information
+        timestamp: Capture time (default: now)
     """
-    # Create a simple image
-    width, height = 1920, 1080
-    img = Image.new('RGB', (width, height))
-    
-    # Create a gradient pattern
-    pixels = img.load()
-    for y in range(height):
-        for x in range(width):
-            r = int((x / width) * 255)
-            g = int((y / height) * 255)
-            b = 128
-            pixels[x, y] = (r, g, b)
-    
-    # Create EXIF data
     exif_dict = {
         "0th": {},
         "Exif": {},
@@ -47,9 +46,9 @@ def create_test_image(filename="test_image.jpg", with_gps=True, with_camera=True
         exif_dict["Exif"][piexif.ExifIFD.ExposureTime] = (1, 125)  # 1/125s
     
     # Add timestamps
-    now = datetime.now().strftime("%Y:%m:%d %H:%M:%S").encode('utf-8')
-    exif_dict["Exif"][piexif.ExifIFD.DateTimeOriginal] = now
-    exif_dict["Exif"][piexif.ExifIFD.DateTimeDigitized] = now
+    taken = (timestamp or datetime.now()).strftime("%Y:%m:%d %H:%M:%S").encode('utf-8')
+    exif_dict["Exif"][piexif.ExifIFD.DateTimeOriginal] = taken
+    exif_dict["Exif"][piexif.ExifIFD.DateTimeDigitized] = taken
     
     # Add GPS coordinates (Buenos Aires, Argentina)
     if with_gps:
@@ -75,7 +74,23 @@ def create_test_image(filename="test_image.jpg", with_gps=True, with_camera=True
         exif_dict["GPS"][piexif.GPSIFD.GPSAltitude] = (25, 1)
     
     # Convert to bytes
-    exif_bytes = piexif.dump(exif_dict)
+    return piexif.dump(exif_dict)
+
+
+def create_test_image(filename="test_image.jpg", with_gps=True, with_camera=True):
+    """
+    Create a test image with EXIF metadata
+    
+    Args:
+        filename: Output filename
+        with_gps: Include GPS coordinates
+        with_camera: Include camera information
+    """
+    # Create a gradient image
+    width, height = 1920, 1080
+    img = Image.fromarray(gradient_pixels(width, height))
+    
+    exif_bytes = build_exif(with_gps, with_camera)
     
     # Save image with EXIF
     img.save(filename, "JPEG", quality=95, exif=exif_bytes)
@@ -0,0 +1,92 @@
+"""
+Digests - Single-pass multi-digest hashing of evidence files
+SHA-256 for the forensic record, MD5 for S3 Content-MD5/ETag, and the
+base64 forms S3 expects, all from one read of the bytes
+"""
+
+import base64
+import hashlib
+import mmap
+from dataclasses import dataclass
+from typing import Dict
+
+
+# Bytes fed to each hash per step; large enough to amortize call overhead,
+# small enough that the block is still in cache for the second hash
+DIGEST_BLOCK_BYTES = 1024 * 1024
+
+# Files at or above this size are memory-mapped rather than read in blocks
+DIGEST_MMAP_THRESHOLD_BYTES = 16 * 1024 * 1024
+
+
+@dataclass
+class FileDigests:
+    """Digests of one file, computed together"""
+    sha256: str  # Hex
+    md5: str  # Hex
+    size: int
+
+    @property
+    def file_hash(self) -> str:
+        """SHA-256 in the 'sha256:<hex>' form used in results"""
+        return f"sha256:{self.sha256}"
+
+    @property
+    def content_md5(self) -> str:
+        """Base64 MD5 for the Content-MD5 header"""
+        return base64.b64encode(bytes.fromhex(self.md5)).decode('ascii')
+
+    @property
+    def checksum_sha256(self) -> str:
+        """Base64 SHA-256 for the S3 ChecksumSHA256 parameter"""
+        return base64.b64encode(bytes.fromhex(self.sha256)).decode('ascii')
+
+    @property
+    def etag(self) -> str:
+        """ETag S3 reports for a single-part upload of the file"""
+        return f'"{self.md5}"'
+
+    def to_dict(self) -> Dict:
+        return {'sha256': self.sha256, 'md5': self.md5, 'size': self.size}
+
+
+def digest_buffer(buffer) -> FileDigests:
+    """
+    Digest an in-memory or memory-mapped buffer
+
+    Both hashes consume the same block before moving on, so the data is
+    streamed through memory once.
+    """
+    sha256 = hashlib.sha256()
+    md5 = hashlib.md5()
+    # Views are released explicitly so a memory map can be closed afterwards
+    with memoryview(buffer) as view:
+        size = len(view)
+        for start in range(0, size, DIGEST_BLOCK_BYTES):
+            with view[start:start + DIGEST_BLOCK_BYTES] as block:
+                sha256.update(block)
+                md5.update(block)
+    return FileDigests(sha256=sha256.hexdigest(), md5=md5.hexdigest(), size=size)
+
+
+def digest_file(path, mmap_threshold: int = DIGEST_MMAP_THRESHOLD_BYTES) -> FileDigests:
+    """Digest a file in one read (memory-mapped when large)"""
+    with open(path, 'rb') as f:
+        size = f.seek(0, 2)
+        f.seek(0)
+
+        if size >= mmap_threshold:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return digest_buffer(mapped)
+
+        sha256 = hashlib.sha256()
+        md5 = hashlib.md5()
+        block = bytearray(DIGEST_BLOCK_BYTES)
+        view = memoryview(block)
+        while True:
+            count = f.readinto(block)
+            if not count:
+                break
+            sha256.update(view[:count])
+            md5.update(view[:count])
+        return FileDigests(sha256=sha256.hexdigest(), md5=md5.hexdigest(), size=size)
@@ -0,0 +1,265 @@
+"""
+ELA Engine - Integer-arithmetic and tiled Error Level Analysis
+Bit-compatible with the float32 reference; very large images are processed
+in horizontal strips on a thread pool
+"""
+
+import io
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Tuple
+
+import numpy as np
+from PIL import Image
+
+
+# JPEG MCU height for 4:2:0 subsampling; strip boundaries stay on this grid
+MCU_SIZE = 16
+
+# Extra rows recompressed above and below each strip so chroma upsampling
+# at the strip edges sees the same neighbours as in a full-frame encode
+HALO_ROWS = MCU_SIZE
+
+# Default budget for difference strips kept between the two passes (64 MB)
+DEFAULT_MAX_MEMORY = 64 * 1024 * 1024
+
+# Strips queued or finished but not yet consumed, per worker thread
+STRIPS_IN_FLIGHT_PER_WORKER = 2
+
+# Distance from an integer channel sum within which the float32 reference
+# rounding could decide the comparison; such ties are evaluated exactly
+TIE_TOLERANCE = 1e-2
+
+
+def absolute_difference(original: np.ndarray, compressed: np.ndarray) -> np.ndarray:
+    """Per-channel |original - compressed| computed directly in uint8"""
+    diff = np.maximum(original, compressed)
+    diff -= np.minimum(original, compressed)
+    return diff
+
+
+def normalized_levels(diff: np.ndarray, max_diff: int) -> np.ndarray:
+    """
+    Mean normalized error over the last (channel) axis
+
+    Uses the same float32 operations as the reference ELA so results are
+    bit-identical.
+    """
+    return np.mean(diff.astype(np.float32) / np.float32(max_diff), axis=-1)
+
+
+def channel_sum(diff: np.ndarray) -> np.ndarray:
+    """Sum of the three channel differences per pixel (uint16)"""
+    total = diff[..., 0].astype(np.uint16)
+    total += diff[..., 1]
+    total += diff[..., 2]
+    return total
+
+
+def bounded_map(
+    executor: ThreadPoolExecutor,
+    fn: Callable,
+    items: Iterable,
+    max_in_flight: int
+) -> Iterator:
+    """
+    executor.map that submits lazily: results are yielded in order and at
+    most max_in_flight items are submitted but not yet yielded
+    """
+    in_flight = deque()
+    for item in items:
+        if len(in_flight) >= max_in_flight:
+            yield in_flight.popleft().result()
+        in_flight.append(executor.submit(fn, item))
+    while in_flight:
+        yield in_flight.popleft().result()
+
+
+def suspicious_pixels(
+    sums: np.ndarray,
+    diff: np.ndarray,
+    max_diff: int,
+    region_threshold: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Threshold a difference image without normalizing it
+
+    mean(diff / max_diff) > threshold is evaluated as an integer comparison
+    on the channel sum. Only pixels whose sum lands exactly on the boundary
+    are re-checked with the float32 reference arithmetic, so the mask is
+    identical to the float path.
+
+    Args:
+        sums: Per-pixel channel sums from channel_sum()
+        diff: uint8 absolute difference the sums were taken from
+        max_diff: Largest value in diff (> 0)
+        region_threshold: Normalized mean error above which a pixel is suspicious
+
+    Returns:
+        (suspicious_mask, error_levels) where error_levels holds the
+        normalized error of each suspicious pixel in row-major order
+    """
+    # The reference compares float32 values against a float32 threshold
+    boundary = 3 * max_diff * float(np.float32(region_threshold))
+    nearest = round(boundary)
+
+    if abs(nearest - boundary) < TIE_TOLERANCE:
+        mask = sums > nearest
+        ties = sums == nearest
+        if ties.any():
+            mask[ties] = normalized_levels(diff[ties], max_diff) > region_threshold
+    else:
+        mask = sums > boundary
+
+    error_levels = sums[mask].astype(np.float32) / np.float32(3 * max_diff)
+    return mask, error_levels
+
+
+def integer_ela(
+    image: Image.Image,
+    region_threshold: float,
+    quality: int = 95
+) -> Tuple[float, np.ndarray, np.ndarray]:
+    """
+    Full-frame ELA on uint8 differences
+
+    Matches the float32 reference mask exactly and its score to float32
+    precision, without the float32 frame copies or the normalization pass.
+    The channel sum is computed once and feeds the mask, the per-pixel error
+    levels and the score.
+
+    Returns:
+        (ela_score, suspicious_mask, error_levels)
+    """
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=quality)
+    buffer.seek(0)
+
+    diff = absolute_difference(np.asarray(image), np.asarray(Image.open(buffer)))
+
+    max_diff = int(diff.max())
+    if max_diff == 0:
+        return 0.0, np.zeros(diff.shape[:2], dtype=bool), np.zeros(0, dtype=np.float32)
+
+    sums = channel_sum(diff)
+    mask, error_levels = suspicious_pixels(sums, diff, max_diff, region_threshold)
+    ela_score = int(sums.sum(dtype=np.int64)) / (diff.size * max_diff)
+
+    return float(ela_score), mask, error_levels
+
+
+class TiledELA:
+    """
+    Strip-based Error Level Analysis
+
+    Produces the same ELA score and suspicious mask as recompressing the
+    whole frame at once, while only ever holding a few strips in memory.
+    JPEG encoding works on independent MCUs, so a strip aligned to the MCU
+    grid and padded with one MCU of halo decodes to identical pixels.
+
+    Pass 1 finds the global maximum error and the error sum; pass 2 turns
+    each strip into its part of the mask. Strips are kept between passes
+    while they fit in max_memory and recompressed otherwise; only a few
+    strips per worker are in flight beyond that.
+    """
+
+    def __init__(
+        self,
+        quality: int = 95,
+        strip_rows: int = 256,
+        workers: int = None,
+        max_memory: int = DEFAULT_MAX_MEMORY
+    ):
+        """
+        Initialize tiled ELA engine
+
+        Args:
+            quality: JPEG quality used for recompression
+            strip_rows: Rows per strip (rounded up to a multiple of 16)
+            workers: Threads used for strips (default: CPU count)
+            max_memory: Bytes of difference strips kept between passes
+        """
+        self.quality = quality
+        self.strip_rows = -(-strip_rows // MCU_SIZE) * MCU_SIZE
+        self.workers = workers or os.cpu_count() or 1
+        self.max_memory = max_memory
+
+    def run(
+        self,
+        image: Image.Image,
+        region_threshold: float
+    ) -> Tuple[float, np.ndarray, np.ndarray]:
+        """
+        Run ELA on an RGB image
+
+        Args:
+            image: RGB image
+            region_threshold: Normalized per-pixel error above which a pixel
+                              is marked suspicious
+
+        Returns:
+            (ela_score, suspicious_mask, error_levels) where error_levels
+            holds the normalized error of each suspicious pixel in row-major
+            order
+        """
+        width, height = image.size
+        strips = [
+            (y0, min(y0 + self.strip_rows, height))
+            for y0 in range(0, height, self.strip_rows)
+        ]
+
+        max_diff = 0
+        total = 0
+        kept = {}
+        kept_bytes = 0
+
+        max_in_flight = self.workers * STRIPS_IN_FLIGHT_PER_WORKER
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            # Pass 1: global maximum and sum of the absolute difference;
+            # submitted lazily (unlike executor.map) so finished strips do
+            # not pile up beyond max_memory
+            diffs = bounded_map(
+                executor, lambda strip: self._strip_diff(image, *strip), strips, max_in_flight
+            )
+            for strip, (diff, sums) in zip(strips, diffs):
+                max_diff = max(max_diff, int(diff.max()))
+                total += int(sums.sum(dtype=np.int64))
+                strip_bytes = diff.nbytes + sums.nbytes
+                if kept_bytes + strip_bytes <= self.max_memory:
+                    kept[strip] = (diff, sums)
+                    kept_bytes += strip_bytes
+
+            mask = np.zeros((height, width), dtype=bool)
+            if max_diff == 0:
+                return 0.0, mask, np.zeros(0, dtype=np.float32)
+
+            # Pass 2: threshold each strip exactly like the full-frame path
+            def fill_mask(strip):
+                y0, y1 = strip
+                diff, sums = kept.pop(strip, None) or self._strip_diff(image, y0, y1)
+                mask[y0:y1], levels = suspicious_pixels(sums, diff, max_diff, region_threshold)
+                return levels
+
+            error_levels = np.concatenate(list(bounded_map(executor, fill_mask, strips, max_in_flight)))
+
+        ela_score = total / (width * height * 3 * max_diff)
+        return float(ela_score), mask, error_levels
+
+    def _strip_diff(self, image: Image.Image, y0: int, y1: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Recompress one strip (plus halo) and return its difference and channel sums"""
+        width, height = image.size
+        top = max(0, y0 - HALO_ROWS)
+        bottom = min(height, y1 + HALO_ROWS)
+
+        crop = image.crop((0, top, width, bottom))
+        buffer = io.BytesIO()
+        crop.save(buffer, format='JPEG', quality=self.quality)
+        buffer.seek(0)
+
+        rows = slice(y0 - top, y1 - top)
+        original = np.asarray(crop)[rows]
+        compressed = np.asarray(Image.open(buffer))[rows]
+
+        diff = absolute_difference(original, compressed)
+        return diff, channel_sum(diff)
@@ -0,0 +1,117 @@
+"""
+Folder Manifest - Change tracking for incremental batch analysis
+Remembers size, mtime, hash and the last report record of every image
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from forensic_analyzer import hash_file
+
+
+# Bump when the manifest layout changes; older manifests are discarded
+MANIFEST_FORMAT = 1
+
+
+class FolderManifest:
+    """
+    JSON manifest of the images already analyzed in a folder
+
+    A file is unchanged when its size and mtime match the manifest. When
+    only the mtime moved (copied or touched files) the content hash decides,
+    so rewriting identical bytes does not trigger a new analysis. The whole
+    manifest is discarded when the analysis settings differ from the ones it
+    was written with.
+    """
+
+    def __init__(self, path: str, settings: Dict):
+        """
+        Load a manifest (or start an empty one)
+
+        Args:
+            path: Manifest file, normally next to the batch report
+            settings: Analysis settings (threshold, mode, analyzer version)
+                      the stored records are valid for
+        """
+        self.path = Path(path)
+        self.settings = settings
+        self.entries: Dict[str, Dict] = {}
+        self._stats: Dict[str, Tuple[int, int]] = {}
+
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text())
+            except (OSError, ValueError):
+                data = {}
+            if data.get('format') == MANIFEST_FORMAT and data.get('settings') == settings:
+                self.entries = data['entries']
+
+    def changed_files(self, image_files: List[Path]) -> Tuple[List[Path], Dict[str, Dict], List[str]]:
+        """
+        Compare image files against the manifest
+
+        Returns:
+            (changed, unchanged_records, removed) where changed are new or
+            modified files, unchanged_records maps the path of every other
+            file to its stored report record, and removed lists manifest
+            paths that are no longer in image_files
+        """
+        changed = []
+        unchanged = {}
+
+        for image_path in image_files:
+            key = str(image_path)
+            try:
+                stat = os.stat(image_path)
+            except OSError:
+                continue
+            self._stats[key] = (stat.st_size, stat.st_mtime_ns)
+
+            entry = self.entries.get(key)
+            if entry is None or entry['size'] != stat.st_size:
+                changed.append(image_path)
+            elif entry['mtime_ns'] == stat.st_mtime_ns:
+                unchanged[key] = entry['record']
+            elif entry.get('hash') and entry['hash'] == hash_file(image_path):
+                entry['mtime_ns'] = stat.st_mtime_ns
+                unchanged[key] = entry['record']
+            else:
+                changed.append(image_path)
+
+        present = {str(image_path) for image_path in image_files}
+        removed = [key for key in self.entries if key not in present]
+        return changed, unchanged, removed
+
+    def record(self, image_path: Path, file_hash: Optional[str], record: Dict):
+        """
+        Store the report record of a freshly analyzed file
+
+        Size and mtime are the ones seen by changed_files(), taken before
+        the analysis, so a file modified mid-analysis is picked up again.
+        """
+        key = str(image_path)
+        size, mtime_ns = self._stats[key]
+        self.entries[key] = {
+            'size': size,
+            'mtime_ns': mtime_ns,
+            'hash': file_hash,
+            'record': record
+        }
+
+    def prune(self, removed: List[str]):
+        """Forget files that disappeared from the folder"""
+        for key in removed:
+            self.entries.pop(key, None)
+
+    def save(self):
+        """Write the manifest atomically"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        tmp_path.write_text(json.dumps({
+            'format': MANIFEST_FORMAT,
+            'settings': self.settings,
+            'entries': self.entries
+        }))
+        os.replace(tmp_path, self.path)
@@ -3,17 +3,48 @@ Forensic Detective - Image Authenticity Analyzer
 Detects tampering, extracts metadata, ensures legal validity
 """
 
-import hashlib
+import io
 import json
+import mmap
+import struct
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Optional, Tuple, List
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, field
 
 import piexif
 from PIL import Image
 import numpy as np
 
+from digests import FileDigests, digest_buffer, digest_file
+from ela_engine import TiledELA, integer_ela
+from region_labeler import SuspiciousRegion, label_regions, DEFAULT_MIN_REGION_AREA
+from result_cache import ResultCache
+from stage_timing import StageClock, TimingHook, NULL_CLOCK
+
+
+# Bump whenever a change alters analysis output; cached results are keyed on it
+ANALYZER_VERSION = '1.4.0'
+
+# Files at or above this size are memory-mapped instead of read into memory
+MMAP_THRESHOLD_BYTES = 16 * 1024 * 1024
+
+# Bytes read from the start of a file in metadata-only triage; covers the
+# JPEG APP segments (EXIF is limited to 64 KB) and the frame header
+TRIAGE_HEADER_BYTES = 256 * 1024
+
+# Images with at least this many pixels use the tiled, bounded-memory ELA
+TILED_ELA_MIN_PIXELS = 16_000_000
+
+# Depends on the clock, not the file: a result rejected for it is never cached
+FUTURE_TIMESTAMP_REASON = "Timestamp is in the future"
+
+
+def hash_file(path) -> str:
+    """SHA-256 of a file in the 'sha256:<hex>' form used in results"""
+    return digest_file(path).file_hash
+
 
 @dataclass
 class GPSCoordinates:
@@ -36,6 +67,7 @@ class CameraInfo:
     iso: Optional[int] = None
     aperture: Optional[float] = None
     shutter_speed: Optional[str] = None
+    serial: Optional[str] = None  # Body serial number, identifies the device
 
 
 @dataclass
@@ -59,6 +91,34 @@ class TamperingAnalysis:
     suspicious_regions: List[Tuple[int, int, int, int]]  # (x, y, width, height)
     is_tampered: bool
     confidence: float
+    regions: List[SuspiciousRegion] = field(default_factory=list)
+
+
+def _timestamps_to_dict(result: Dict, timestamp: TimestampInfo) -> Dict:
+    """Convert datetime objects in an asdict() result to ISO format strings"""
+    if timestamp.original:
+        result['timestamp']['original'] = timestamp.original.isoformat()
+    if timestamp.modified:
+        result['timestamp']['modified'] = timestamp.modified.isoformat()
+    if timestamp.digitized:
+        result['timestamp']['digitized'] = timestamp.digitized.isoformat()
+    return result
+
+
+@dataclass
+class TriageResult:
+    """Metadata-only triage result (pixels are never decoded)"""
+    is_authentic: bool  # Provisional: ELA has not run
+    file_size: int
+    image_dimensions: Tuple[int, int]
+    gps: GPSCoordinates
+    camera: CameraInfo
+    timestamp: TimestampInfo
+    rejection_reason: Optional[str] = None
+    
+    def to_dict(self) -> Dict:
+        """Convert to dictionary for JSON serialization"""
+        return _timestamps_to_dict(asdict(self), self.timestamp)
 
 
 @dataclass
@@ -73,18 +133,38 @@ class ForensicResult:
     timestamp: TimestampInfo
     tampering: TamperingAnalysis
     rejection_reason: Optional[str] = None
+    skipped_checks: List[str] = field(default_factory=list)  # e.g. ['ela'] after a metadata rejection
+    timings: Optional[Dict[str, int]] = None  # Nanoseconds per stage (record_timings)
+    digests: Optional[FileDigests] = None  # SHA-256/MD5 for upload and fraud checks
     
     def to_dict(self) -> Dict:
         """Convert to dictionary for JSON serialization"""
-        result = asdict(self)
-        # Convert datetime objects to ISO format strings
-        if self.timestamp.original:
-            result['timestamp']['original'] = self.timestamp.original.isoformat()
-        if self.timestamp.modified:
-            result['timestamp']['modified'] = self.timestamp.modified.isoformat()
-        if self.timestamp.digitized:
-            result['timestamp']['digitized'] = self.timestamp.digitized.isoformat()
-        return result
+        return _timestamps_to_dict(asdict(self), self.timestamp)
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ForensicResult':
+        """Rebuild a result from the dictionary produced by to_dict()"""
+        timestamp = {
+            key: datetime.fromisoformat(value) if value else None
+            for key, value in data['timestamp'].items()
+        }
+        tampering = dict(data['tampering'])
+        tampering['suspicious_regions'] = [
+            tuple(region) for region in tampering['suspicious_regions']
+        ]
+        tampering['regions'] = [
+            SuspiciousRegion(**region) for region in tampering.get('regions', [])
+        ]
+        
+        return cls(**{
+            **data,
+            'digests': FileDigests(**data['digests']) if data.get('digests') else None,
+            'image_dimensions': tuple(data['image_dimensions']),
+            'gps': GPSCoordinates(**data['gps']),
+            'camera': CameraInfo(**data['camera']),
+            'timestamp': TimestampInfo(**timestamp),
+            'tampering': TamperingAnalysis(**tampering)
+        })
 
 
 class ForensicAnalyzer:
@@ -93,7 +173,19 @@ class ForensicAnalyzer:
     Validates image authenticity using multiple techniques
     """
     
-    def __init__(self, ela_threshold: float = 0.20):
+    def __init__(
+        self,
+        ela_threshold: float = 0.20,
+        single_read: bool = True,
+        mmap_threshold: int = MMAP_THRESHOLD_BYTES,
+        cache: Optional[ResultCache] = None,
+        tiled_ela_min_pixels: int = TILED_ELA_MIN_PIXELS,
+        min_region_area: int = DEFAULT_MIN_REGION_AREA,
+        ela_kernel: str = 'integer',
+        fail_fast: bool = True,
+        record_timings: bool = False,
+        hooks: Optional[List[TimingHook]] = None
+    ):
         """
         Initialize forensic analyzer
         
@@ -102,15 +194,48 @@ class ForensicAnalyzer:
                           Default 0.20 accounts for modern smartphone processing (HDR, scene optimization)
                           Lower values (0.10-0.15) for stricter validation
                           Higher values (0.25-0.30) for more lenient validation
+            single_read: Read each file once and share the buffer between
+                         hashing, EXIF parsing and decoding
+            mmap_threshold: File size (bytes) from which the single-read buffer
+                            is memory-mapped instead of loaded into memory
+            cache: Optional result cache; a hit skips decoding and ELA
+            tiled_ela_min_pixels: Pixel count from which ELA runs strip by strip
+                                  on a thread pool with bounded memory
+            min_region_area: Smallest suspicious region (pixels) that is reported
+            ela_kernel: 'integer' for the uint8 kernel with fused reductions,
+                        'float' for the float32 reference implementation
+            fail_fast: Run the metadata checks before ELA and skip decoding
+                       and ELA for images they already reject
+            record_timings: Attach per-stage timings (ns) to each ForensicResult
+            hooks: TimingHooks that receive the per-stage timings of every image
         """
+        if ela_kernel not in ('integer', 'float'):
+            raise ValueError(f"Unknown ELA kernel: {ela_kernel}")
+        
         self.ela_threshold = ela_threshold
+        self.single_read = single_read
+        self.mmap_threshold = mmap_threshold
+        self.cache = cache
+        self.tiled_ela_min_pixels = tiled_ela_min_pixels
+        self.tiled_ela = TiledELA()
+        self.min_region_area = min_region_area
+        self.ela_kernel = ela_kernel
+        self.fail_fast = fail_fast
+        self.record_timings = record_timings
+        self.hooks = list(hooks or [])
     
-    def analyze_image(self, image_path: str) -> ForensicResult:
+    def analyze_image(
+        self,
+        image_path: str,
+        digests: Optional[FileDigests] = None
+    ) -> ForensicResult:
         """
         Perform complete forensic analysis on an image
         
         Args:
             image_path: Path to the image file
+            digests: Digests of the file's current contents, if the caller
+                     already computed them; hashing is then skipped
             
         Returns:
             ForensicResult with all analysis data
@@ -120,57 +245,237 @@ class ForensicAnalyzer:
         if not path.exists():
             return self._create_rejection_result("File not found")
         
+        # Timing costs one perf_counter_ns call per stage, and nothing when off
+        clock = StageClock() if self.record_timings or self.hooks else NULL_CLOCK
+        
         try:
-            # Calculate file hash
-            file_hash = self._calculate_hash(path)
-            file_size = path.stat().st_size
+            if self.single_read:
+                # Read once: hash, EXIF and decode all work on the same buffer
+                with self._read_buffer(path) as buffer:
+                    clock.lap('read')
+                    digests = digests or digest_buffer(buffer)
+                    file_hash = digests.file_hash
+                    clock.lap('hash')
+                    result = self._get_cached_result(file_hash)
+                    if result is None:
+                        image = Image.open(self._buffer_stream(buffer))
+                        clock.lap('open')
+                        exif_data = self._extract_exif_from_buffer(buffer, image)
+                        result = self._analyze_opened_image(
+                            image, file_hash, len(buffer), exif_data, clock
+                        )
+                        result.digests = digests
+                        self._store_result(file_hash, result)
+            else:
+                # Calculate file digests
+                digests = digests or digest_file(path)
+                file_hash = digests.file_hash
+                clock.lap('hash')
+                result = self._get_cached_result(file_hash)
+                if result is None:
+                    file_size = path.stat().st_size
+                    
+                    # Open image
+                    image = Image.open(path)
+                    clock.lap('open')
+                    
+                    # Extract EXIF data
+                    exif_data = self._extract_exif(image)
+                    
+                    result = self._analyze_opened_image(
+                        image, file_hash, file_size, exif_data, clock
+                    )
+                    result.digests = digests
+                    self._store_result(file_hash, result)
+            
+        except Exception as e:
+            return self._create_rejection_result(f"Analysis error: {str(e)}")
+        
+        # Hooks run outside the try block so their errors are not rejections
+        return self._finish_timing(result, image_path, clock)
+    
+    def triage_image(self, image_path: str) -> TriageResult:
+        """
+        Metadata-only triage of an image
+        
+        Reads only the file header, parses EXIF with piexif and runs the
+        timestamp checks. Pixels are never decoded and the file is not
+        hashed, so this is cheap enough to sweep a whole backlog before the
+        full analysis.
+        
+        Args:
+            image_path: Path to the image file
             
-            # Open image
-            image = Image.open(path)
-            dimensions = image.size
+        Returns:
+            TriageResult with metadata and a provisional verdict
+        """
+        path = Path(image_path)
+        
+        if not path.exists():
+            return self._create_triage_rejection("File not found")
+        
+        try:
+            file_size = path.stat().st_size
+            with open(path, 'rb') as f:
+                header = f.read(TRIAGE_HEADER_BYTES)
             
-            # Extract EXIF data
-            exif_data = self._extract_exif(image)
+            try:
+                # PIL parses the frame header lazily; no pixel data is read
+                image = Image.open(io.BytesIO(header))
+                exif_data = self._extract_exif_from_buffer(header, image)
+            except Exception:
+                if len(header) == file_size:
+                    raise
+                # Unusually large APP segments: fall back to parsing from disk
+                image = Image.open(path)
+                exif_data = self._extract_exif(image)
             
-            # Extract GPS coordinates
             gps = self._extract_gps(exif_data)
-            
-            # Extract camera info
             camera = self._extract_camera_info(exif_data)
-            
-            # Extract timestamps
             timestamp = self._extract_timestamps(exif_data)
             
-            # Perform ELA tampering detection
-            tampering = self._detect_tampering(image)
+            is_authentic, rejection_reason = self._validate_metadata(gps, timestamp)
             
-            # Validate authenticity
-            is_authentic, rejection_reason = self._validate_authenticity(
-                gps, timestamp, tampering
-            )
-            
-            return ForensicResult(
+            return TriageResult(
                 is_authentic=is_authentic,
-                file_hash=file_hash,
                 file_size=file_size,
-                image_dimensions=dimensions,
+                image_dimensions=image.size,
                 gps=gps,
                 camera=camera,
                 timestamp=timestamp,
-                tampering=tampering,
                 rejection_reason=rejection_reason
             )
             
         except Exception as e:
-            return self._create_rejection_result(f"Analysis error: {str(e)}")
+            return self._create_triage_rejection(f"Triage error: {str(e)}")
+    
+    def _analyze_opened_image(
+        self,
+        image: Image.Image,
+        file_hash: str,
+        file_size: int,
+        exif_data: Dict,
+        clock=NULL_CLOCK
+    ) -> ForensicResult:
+        """Run metadata extraction, ELA and validation on an opened image"""
+        dimensions = image.size
+        
+        # Extract GPS coordinates
+        gps = self._extract_gps(exif_data)
+        
+        # Extract camera info
+        camera = self._extract_camera_info(exif_data)
+        
+        # Extract timestamps
+        timestamp = self._extract_timestamps(exif_data)
+        clock.lap('exif')
+        
+        skipped_checks = []
+        
+        if self.fail_fast:
+            # Cheap metadata checks first; ELA only if the image can still pass
+            is_authentic, rejection_reason = self._validate_metadata(gps, timestamp)
+            clock.lap('validation')
+        else:
+            is_authentic = True
+        
+        if is_authentic:
+            # Decode up front so decoding and ELA are timed separately
+            image.load()
+            clock.lap('decode')
+            
+            # Perform ELA tampering detection
+            tampering = self._detect_tampering(image)
+            clock.lap('ela')
+            
+            # Validate authenticity
+            is_authentic, rejection_reason = self._validate_authenticity(
+                gps, timestamp, tampering
+            )
+            clock.lap('validation')
+        else:
+            tampering = self._empty_tampering()
+            skipped_checks.append('ela')
+        
+        return ForensicResult(
+            is_authentic=is_authentic,
+            file_hash=file_hash,
+            file_size=file_size,
+            image_dimensions=dimensions,
+            gps=gps,
+            camera=camera,
+            timestamp=timestamp,
+            tampering=tampering,
+            rejection_reason=rejection_reason,
+            skipped_checks=skipped_checks
+        )
+    
+    def _finish_timing(self, result: ForensicResult, image_path: str, clock) -> ForensicResult:
+        """Attach the stage timings to the result and pass them to the hooks"""
+        if clock.timings is None:
+            return result
+        
+        if self.record_timings:
+            result.timings = clock.timings
+        for hook in self.hooks:
+            hook.on_timings(str(image_path), clock.timings)
+        return result
+    
+    @property
+    def cache_config(self) -> str:
+        """Fingerprint of the settings besides the ELA threshold that change results"""
+        return (
+            f"fail_fast={self.fail_fast};min_region_area={self.min_region_area};"
+            f"ela_kernel={self.ela_kernel};tiled_ela_min_pixels={self.tiled_ela_min_pixels}"
+        )
+    
+    def _store_result(self, file_hash: str, result: ForensicResult):
+        """Add a fresh result (without timings) to the cache"""
+        if self.cache is not None and result.rejection_reason != FUTURE_TIMESTAMP_REASON:
+            self.cache.put(file_hash, self.ela_threshold, result.to_dict(), self.cache_config)
+    
+    def _get_cached_result(self, file_hash: str) -> Optional[ForensicResult]:
+        """Return the cached result for this file hash, if any"""
+        if self.cache is None:
+            return None
+        
+        cached = self.cache.get(file_hash, self.ela_threshold, self.cache_config)
+        if cached is None:
+            return None
+        return ForensicResult.from_dict(cached)
+    
+    @contextmanager
+    def _read_buffer(self, path: Path):
+        """
+        Read the whole file into a single buffer
+        
+        Small files are read into bytes; large files are memory-mapped so the
+        page cache is shared instead of copied. The buffer is only valid
+        inside the context.
+        """
+        file_size = path.stat().st_size
+        
+        if file_size == 0 or file_size < self.mmap_threshold:
+            yield path.read_bytes()
+            return
+        
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                yield mapped
+            finally:
+                mapped.close()
+    
+    def _buffer_stream(self, buffer):
+        """Return a seekable file-like view over a read buffer"""
+        if isinstance(buffer, mmap.mmap):
+            buffer.seek(0)
+            return buffer
+        return io.BytesIO(buffer)
     
     def _calculate_hash(self, path: Path) -> str:
         """Calculate SHA-256 hash of file"""
-        sha256 = hashlib.sha256()
-        with open(path, 'rb') as f:
-            for chunk in iter(lambda: f.read(4096), b''):
-                sha256.update(chunk)
-        return f"sha256:{sha256.hexdigest()}"
+        return hash_file(path)
     
     def _extract_exif(self, image: Image.Image) -> Dict:
         """Extract EXIF data from image"""
@@ -180,6 +485,47 @@ class ForensicAnalyzer:
         except:
             return {}
     
+    def _extract_exif_from_buffer(self, buffer, image: Optional[Image.Image] = None) -> Dict:
+        """
+        Extract EXIF data directly from the raw file buffer
+        
+        For JPEG files only the APP1 segment is sliced out of the header, so
+        the compressed scan data is never copied. Other formats fall back to
+        the EXIF block PIL found while opening the image.
+        """
+        segment = self._find_exif_segment(buffer)
+        if segment is None:
+            if image is not None:
+                return self._extract_exif(image)
+            return {}
+        
+        try:
+            return piexif.load(segment)
+        except:
+            return {}
+    
+    def _find_exif_segment(self, buffer) -> Optional[bytes]:
+        """Locate the EXIF APP1 payload in a JPEG header without touching pixel data"""
+        if buffer[0:2] != b'\xff\xd8':
+            return None
+        
+        head = 2
+        size = len(buffer)
+        while head + 4 <= size:
+            marker = buffer[head:head + 2]
+            if marker[0:1] != b'\xff' or marker == b'\xff\xda':
+                # Malformed header or start of scan: no EXIF before pixel data
+                return None
+            length = struct.unpack('>H', buffer[head + 2:head + 4])[0]
+            if head + 2 + length > size:
+                # Segment runs past the end of the buffer (truncated header)
+                return None
+            if marker == b'\xff\xe1' and buffer[head + 4:head + 10] == b'Exif\x00\x00':
+                return buffer[head + 4:head + 2 + length]
+            head += length + 2
+        
+        return None
+    
     def _extract_gps(self, exif_data: Dict) -> GPSCoordinates:
         """Extract GPS coordinates from EXIF"""
         gps_data = exif_data.get('GPS', {})
@@ -238,7 +584,8 @@ class ForensicAnalyzer:
             lens=exif_ifd.get(piexif.ExifIFD.LensModel, b'').decode('utf-8', errors='ignore').strip(),
             iso=exif_ifd.get(piexif.ExifIFD.ISOSpeedRatings),
             aperture=self._parse_aperture(exif_ifd.get(piexif.ExifIFD.FNumber)),
-            shutter_speed=self._parse_shutter_speed(exif_ifd.get(piexif.ExifIFD.ExposureTime))
+            shutter_speed=self._parse_shutter_speed(exif_ifd.get(piexif.ExifIFD.ExposureTime)),
+            serial=exif_ifd.get(piexif.ExifIFD.BodySerialNumber, b'').decode('utf-8', errors='ignore').strip()
         )
     
     def _parse_aperture(self, f_number) -> Optional[float]:
@@ -287,8 +634,51 @@ class ForensicAnalyzer:
         if image.mode != 'RGB':
             image = image.convert('RGB')
         
+        # Find suspicious regions (areas with high difference)
+        # Use a higher threshold for region detection (2x the ELA threshold)
+        region_threshold = self.ela_threshold * 2
+        
+        # Very large images go through the strip-based engine to bound memory
+        if image.width * image.height >= self.tiled_ela_min_pixels:
+            ela_score, suspicious_mask, error_levels = self.tiled_ela.run(image, region_threshold)
+        elif self.ela_kernel == 'integer':
+            ela_score, suspicious_mask, error_levels = integer_ela(image, region_threshold)
+        else:
+            ela_score, suspicious_mask, error_levels = self._full_frame_ela(image, region_threshold)
+        
+        # Label connected suspicious regions
+        regions = label_regions(suspicious_mask, error_levels, self.min_region_area)
+        suspicious_regions = [region.bbox() for region in regions]
+        
+        # Determine if image is tampered
+        # Only flag as tampered if BOTH conditions are met:
+        # 1. ELA score is high
+        # 2. There are suspicious regions
+        is_tampered = ela_score > self.ela_threshold and len(suspicious_regions) > 0
+        confidence = min(ela_score / self.ela_threshold, 1.0) if is_tampered else 1.0 - ela_score
+        
+        return TamperingAnalysis(
+            ela_score=ela_score,
+            suspicious_regions=suspicious_regions,
+            is_tampered=is_tampered,
+            confidence=confidence,
+            regions=regions
+        )
+    
+    def _full_frame_ela(
+        self,
+        image: Image.Image,
+        region_threshold: float
+    ) -> Tuple[float, np.ndarray, np.ndarray]:
+        """
+        Recompress the whole frame at once (float32 reference kernel)
+        
+        Returns:
+            (ela_score, suspicious_mask, error_levels) where error_levels
+            holds the normalized error of each suspicious pixel in row-major
+            order
+        """
         # Save at quality 95
-        import io
         buffer = io.BytesIO()
         image.save(buffer, format='JPEG', quality=95)
         buffer.seek(0)
@@ -310,44 +700,10 @@ class ForensicAnalyzer:
         # Calculate ELA score (average difference)
         ela_score = float(np.mean(diff))
         
-        # Find suspicious regions (areas with high difference)
-        # Use a higher threshold for region detection (2x the ELA threshold)
-        region_threshold = self.ela_threshold * 2
-        suspicious_mask = np.mean(diff, axis=2) > region_threshold
-        
-        # Find bounding boxes of suspicious regions
-        suspicious_regions = self._find_suspicious_regions(suspicious_mask)
-        
-        # Determine if image is tampered
-        # Only flag as tampered if BOTH conditions are met:
-        # 1. ELA score is high
-        # 2. There are suspicious regions
-        is_tampered = ela_score > self.ela_threshold and len(suspicious_regions) > 0
-        confidence = min(ela_score / self.ela_threshold, 1.0) if is_tampered else 1.0 - ela_score
-        
-        return TamperingAnalysis(
-            ela_score=ela_score,
-            suspicious_regions=suspicious_regions,
-            is_tampered=is_tampered,
-            confidence=confidence
-        )
-    
-    def _find_suspicious_regions(self, mask: np.ndarray) -> List[Tuple[int, int, int, int]]:
-        """Find bounding boxes of suspicious regions in the mask"""
-        # Simple implementation - can be improved with connected components
-        regions = []
-        
-        # Find rows and columns with suspicious pixels
-        rows = np.any(mask, axis=1)
-        cols = np.any(mask, axis=0)
-        
-        if np.any(rows) and np.any(cols):
-            y_min, y_max = np.where(rows)[0][[0, -1]]
-            x_min, x_max = np.where(cols)[0][[0, -1]]
-            
-            regions.append((int(x_min), int(y_min), int(x_max - x_min), int(y_max - y_min)))
+        levels = np.mean(diff, axis=2)
+        suspicious_mask = levels > region_threshold
         
-        return regions
+        return ela_score, suspicious_mask, levels[suspicious_mask]
     
     def _validate_authenticity(
         self,
@@ -365,13 +721,26 @@ class ForensicAnalyzer:
         if tampering.is_tampered:
             return False, f"Image tampering detected (ELA score: {tampering.ela_score:.3f})"
         
+        return self._validate_metadata(gps, timestamp)
+    
+    def _validate_metadata(
+        self,
+        gps: GPSCoordinates,
+        timestamp: TimestampInfo
+    ) -> Tuple[bool, Optional[str]]:
+        """
+        Validate the checks that only need EXIF metadata
+        
+        Returns:
+            (is_authentic, rejection_reason)
+        """
         # Check timestamp consistency
         if not timestamp.is_consistent():
             return False, "Inconsistent timestamps detected"
         
         # Check if timestamp is in the future
         if timestamp.original and timestamp.original > datetime.now():
-            return False, "Timestamp is in the future"
+            return False, FUTURE_TIMESTAMP_REASON
         
         # All checks passed
         return True, None
@@ -386,12 +755,28 @@ class ForensicAnalyzer:
             gps=GPSCoordinates(),
             camera=CameraInfo(),
             timestamp=TimestampInfo(),
-            tampering=TamperingAnalysis(
-                ela_score=0.0,
-                suspicious_regions=[],
-                is_tampered=False,
-                confidence=0.0
-            ),
+            tampering=self._empty_tampering(),
+            rejection_reason=reason
+        )
+    
+    def _empty_tampering(self) -> TamperingAnalysis:
+        """Tampering analysis placeholder for when ELA did not run"""
+        return TamperingAnalysis(
+            ela_score=0.0,
+            suspicious_regions=[],
+            is_tampered=False,
+            confidence=0.0
+        )
+    
+    def _create_triage_rejection(self, reason: str) -> TriageResult:
+        """Create a triage rejection result"""
+        return TriageResult(
+            is_authentic=False,
+            file_size=0,
+            image_dimensions=(0, 0),
+            gps=GPSCoordinates(),
+            camera=CameraInfo(),
+            timestamp=TimestampInfo(),
             rejection_reason=reason
         )
 
@@ -0,0 +1,155 @@
+"""
+Region Labeler - Connected-component analysis of ELA suspicious masks
+Run-length based, 8-connected, numpy only
+"""
+
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+
+
+# Regions smaller than one 8x8 JPEG block are treated as compression noise
+DEFAULT_MIN_REGION_AREA = 64
+
+
+@dataclass
+class SuspiciousRegion:
+    """Connected region of suspicious pixels"""
+    x: int
+    y: int
+    width: int
+    height: int
+    area: int
+    mean_error: float  # Mean normalized error level (0.0-1.0)
+
+    def bbox(self):
+        """Bounding box as (x, y, width, height)"""
+        return (self.x, self.y, self.width, self.height)
+
+
+def label_regions(
+    mask: np.ndarray,
+    error_levels: Optional[np.ndarray] = None,
+    min_area: int = DEFAULT_MIN_REGION_AREA
+) -> List[SuspiciousRegion]:
+    """
+    Find 8-connected regions in a boolean mask
+
+    The mask is encoded as horizontal runs in a single vectorized pass.
+    Runs on adjacent rows that touch are linked, the run graph is merged
+    with a vectorized union-find, and per-region statistics are reduced
+    with bincount. Cost is O(pixels) for run extraction plus
+    O(runs log runs) for the merge.
+
+    Args:
+        mask: 2-D boolean mask
+        error_levels: Error level of every True pixel in row-major order
+                      (mask pixels only); used for mean_error
+        min_area: Regions with fewer pixels are dropped
+
+    Returns:
+        Regions in row-major order of their first pixel
+    """
+    height, width = mask.shape
+    if height == 0 or width == 0:
+        return []
+
+    # 1. Run-length encode the flattened mask: transitions mark run edges,
+    # and runs that wrap from one row's last column to the next row's first
+    # column are split at the row boundary
+    flat = mask.ravel()
+    transitions = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    row_breaks = np.arange(width, flat.size, width)
+    row_breaks = row_breaks[flat[row_breaks - 1] & flat[row_breaks]]
+    run_starts = np.insert(transitions, np.searchsorted(transitions, row_breaks), row_breaks)
+    run_starts = np.concatenate(([0], run_starts))
+    run_is_set = flat[run_starts]
+    run_ends = np.concatenate((run_starts[1:], [flat.size]))
+    run_starts = run_starts[run_is_set]
+    run_ends = run_ends[run_is_set]
+
+    run_count = run_starts.size
+    if run_count == 0:
+        return []
+
+    run_rows = run_starts // width
+    run_x0 = run_starts - run_rows * width
+    run_x1 = run_ends - run_rows * width  # exclusive
+    run_lengths = run_x1 - run_x0
+
+    # Re-key runs with one column of virtual padding so runs on different
+    # rows can never compare as touching
+    stride = width + 1
+    run_starts = run_rows * stride + run_x0
+    run_ends = run_rows * stride + run_x1
+
+    # 2. Link runs to the touching runs on the row above (8-connectivity):
+    # a run above with start <= x1 and end >= x0 is adjacent. Runs on a row
+    # are sorted and disjoint, so the matches form a contiguous index range.
+    upper_first = np.searchsorted(run_ends, run_starts - stride, side='left')
+    upper_last = np.searchsorted(run_starts, run_ends - stride, side='right')
+    link_counts = np.maximum(upper_last - upper_first, 0)
+
+    total_links = int(link_counts.sum())
+    lower = np.repeat(np.arange(run_count), link_counts)
+    offsets = np.arange(total_links) - np.repeat(np.cumsum(link_counts) - link_counts, link_counts)
+    upper = np.repeat(upper_first, link_counts) + offsets
+
+    # 3. Vectorized union-find: hook larger roots onto smaller ones, then
+    # compress paths until every run points at its root
+    parent = np.arange(run_count)
+    while lower.size:
+        root_a = parent[lower]
+        root_b = parent[upper]
+        pending = root_a != root_b
+        if not pending.any():
+            break
+        lower, upper = lower[pending], upper[pending]
+        root_a, root_b = root_a[pending], root_b[pending]
+        np.minimum.at(parent, np.maximum(root_a, root_b), np.minimum(root_a, root_b))
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+
+    # 4. Per-region statistics
+    is_root = parent == np.arange(run_count)
+    region_ids = np.cumsum(is_root) - 1
+    run_region = region_ids[parent]
+    region_count = int(is_root.sum())
+
+    area = np.bincount(run_region, weights=run_lengths, minlength=region_count)
+
+    x_min = np.full(region_count, width)
+    x_max = np.full(region_count, -1)
+    y_min = np.full(region_count, height)
+    y_max = np.full(region_count, -1)
+    np.minimum.at(x_min, run_region, run_x0)
+    np.maximum.at(x_max, run_region, run_x1 - 1)
+    np.minimum.at(y_min, run_region, run_rows)
+    np.maximum.at(y_max, run_region, run_rows)
+
+    if error_levels is not None:
+        # Error levels are stored run after run, so each run's total is a
+        # segmented sum; labels never need to be expanded back to pixels
+        run_offsets = np.cumsum(run_lengths) - run_lengths
+        run_error = np.add.reduceat(error_levels, run_offsets)
+        error_sum = np.bincount(run_region, weights=run_error, minlength=region_count)
+        mean_error = error_sum / area
+    else:
+        mean_error = np.zeros(region_count)
+
+    keep = np.flatnonzero(area >= min_area)
+    return [
+        SuspiciousRegion(
+            x=int(x_min[i]),
+            y=int(y_min[i]),
+            width=int(x_max[i] - x_min[i] + 1),
+            height=int(y_max[i] - y_min[i] + 1),
+            area=int(area[i]),
+            mean_error=float(mean_error[i])
+        )
+        for i in keep
+    ]
@@ -0,0 +1,204 @@
+"""
+Report Writer - Streaming JSONL reports for batch analysis
+One line per image, flushed as soon as it is written, so memory stays
+constant and an interrupted run can be resumed; finished reports are also
+converted to the older single-document JSON layout
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+
+class ReportStats:
+    """Running summary counters of a batch report"""
+
+    def __init__(self):
+        self.total = 0
+        self.authentic = 0
+        self.rejected = 0
+        self.errors = 0
+        self.with_gps = 0
+        self.with_camera = 0
+        self.reasons: Dict[str, int] = {}
+
+    def add(self, record: Dict):
+        """Count one per-image record"""
+        self.total += 1
+        if 'error' in record:
+            self.errors += 1
+            return
+
+        if record['authentic']:
+            self.authentic += 1
+        else:
+            self.rejected += 1
+            reason = record.get('rejection_reason')
+            if reason:
+                self.reasons[reason] = self.reasons.get(reason, 0) + 1
+
+        self.with_gps += bool(record.get('has_gps'))
+        self.with_camera += bool(record.get('has_camera_info'))
+
+    def to_dict(self) -> Dict:
+        return {
+            'total_images': self.total,
+            'authentic': self.authentic,
+            'rejected': self.rejected,
+            'errors': self.errors,
+            'with_gps': self.with_gps,
+            'with_camera_info': self.with_camera,
+            'rejection_reasons': self.reasons
+        }
+
+
+class JsonlReportWriter:
+    """
+    Append-only JSONL batch report
+
+    The first line is a header with the run settings, followed by one
+    'result' line per image in input order and a closing 'summary' line.
+    Every line is flushed when written, so after a crash the file holds
+    every finished image; resume() picks the run up from there.
+    """
+
+    def __init__(self, path: str, header: Dict):
+        """
+        Args:
+            path: Report file
+            header: Run settings; a partial report is only resumed when its
+                    header matches
+        """
+        self.path = Path(path)
+        self.header = {'type': 'header', **header}
+        self.stats = ReportStats()
+        self.last_path: Optional[str] = None
+        self._file = None
+
+    def start(self):
+        """Begin a new report, replacing any existing file"""
+        if self._file is not None:
+            # Handle opened by resume() on a report that is not continued
+            self._file.close()
+        self.stats = ReportStats()
+        self.last_path = None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'w')
+        self._write_line(self.header)
+
+    def resume(self) -> int:
+        """
+        Continue a partially written report
+
+        Reads the existing file once, rebuilds the counters from its result
+        lines and truncates anything after the last complete record (a torn
+        final line or an old summary). Starts a new report when there is no
+        file or its header does not match.
+
+        Returns:
+            Number of records already in the report
+        """
+        valid_bytes, completed = self._scan()
+        if valid_bytes == 0:
+            self.start()
+            return 0
+
+        os.truncate(self.path, valid_bytes)
+        self._file = open(self.path, 'a')
+        return completed
+
+    def write(self, record: Dict):
+        """Append one per-image record"""
+        self.stats.add(record)
+        self.last_path = record.get('path')
+        self._write_line({'type': 'result', **record})
+
+    def close(self):
+        """Write the summary line and close the report"""
+        if self._file is None:
+            return
+        self._write_line({'type': 'summary', **self.stats.to_dict()})
+        self._file.close()
+        self._file = None
+
+    def _write_line(self, data: Dict):
+        self._file.write(json.dumps(data) + '\n')
+        self._file.flush()
+
+    def _scan(self):
+        """Return (bytes of the reusable prefix, records in it)"""
+        if not self.path.exists():
+            return 0, 0
+
+        valid_bytes = 0
+        completed = 0
+        with open(self.path, 'rb') as f:
+            for number, line in enumerate(f):
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    data = json.loads(line)
+                except ValueError:
+                    break
+
+                if number == 0:
+                    if data != self.header:
+                        return 0, 0
+                elif data.get('type') == 'result':
+                    record = {k: v for k, v in data.items() if k != 'type'}
+                    self.stats.add(record)
+                    self.last_path = record.get('path')
+                    completed += 1
+                else:
+                    break
+                valid_bytes += len(line)
+
+        return valid_bytes, completed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self._file is not None:
+            # Leave the partial report resumable: no summary line
+            self._file.close()
+            self._file = None
+
+
+def read_report(path: str) -> Iterator[Dict]:
+    """Yield the per-image records of a JSONL report"""
+    with open(path) as f:
+        for line in f:
+            data = json.loads(line)
+            if data.pop('type', None) == 'result':
+                yield data
+
+
+def write_json_report(path: str, json_path: str, fields: Dict):
+    """
+    Convert a JSONL report into the single JSON document written before
+    the JSONL format ({...fields, 'results': [...]})
+
+    Records are copied one at a time, so memory stays constant; the file
+    is replaced atomically.
+
+    Args:
+        path: JSONL report
+        json_path: JSON report to write
+        fields: Top-level fields written before 'results' (settings and totals)
+    """
+    json_path = Path(json_path)
+    tmp_path = json_path.with_name(json_path.name + '.tmp')
+    with open(tmp_path, 'w') as f:
+        f.write('{\n')
+        for key, value in fields.items():
+            f.write(f'  {json.dumps(key)}: {json.dumps(value)},\n')
+        f.write('  "results": [')
+        for number, record in enumerate(read_report(path)):
+            f.write(',\n    ' if number else '\n    ')
+            f.write(json.dumps(record))
+        f.write('\n  ]\n}\n')
+    os.replace(tmp_path, json_path)
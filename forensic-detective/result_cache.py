@@ -0,0 +1,146 @@
+"""
+Result Cache - Content-addressed store for forensic analysis results
+Keyed by file SHA-256, ELA threshold, analyzer version and analyzer configuration
+"""
+
+import json
+import sqlite3
+from pathlib import Path
+from typing import Dict, Optional
+
+
+# Default size budget for cached result JSON (256 MB)
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Number of writes between size checks; eviction is amortized over these
+EVICT_CHECK_INTERVAL = 64
+
+
+class ResultCache:
+    """
+    On-disk SQLite cache of ForensicResult dictionaries
+
+    The same photo arriving through a different case or a re-run of a batch
+    is answered from the cache after hashing, without decoding or ELA.
+    Entries are evicted least-recently-used first once the stored JSON
+    exceeds max_bytes. Safe to share between processes (WAL mode).
+    """
+
+    # Logical access clock shared by every process using the database
+    _NEXT_TICK = 'SELECT COALESCE(MAX(last_access), 0) + 1 FROM results'
+
+    def __init__(
+        self,
+        db_path: str,
+        analyzer_version: str,
+        max_bytes: int = DEFAULT_MAX_BYTES
+    ):
+        """
+        Initialize result cache
+
+        Args:
+            db_path: Path to the SQLite database file (created if missing)
+            analyzer_version: Version of the analyzer producing the results;
+                              entries from other versions are never returned
+            max_bytes: Size budget for stored results
+        """
+        self.db_path = str(db_path)
+        self.analyzer_version = analyzer_version
+        self.max_bytes = max_bytes
+        self._writes_since_check = 0
+
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        columns = [row[1] for row in self.conn.execute('PRAGMA table_info(results)')]
+        if columns and 'config' not in columns:
+            # Entries from before the configuration was part of the key
+            # cannot be attributed to a configuration; it is only a cache
+            self.conn.execute('DROP TABLE results')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS results (
+                file_hash TEXT NOT NULL,
+                ela_threshold REAL NOT NULL,
+                analyzer_version TEXT NOT NULL,
+                config TEXT NOT NULL,
+                result TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access INTEGER NOT NULL,
+                PRIMARY KEY (file_hash, ela_threshold, analyzer_version, config)
+            )
+        ''')
+        self.conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_results_last_access ON results (last_access)'
+        )
+
+    def get(self, file_hash: str, ela_threshold: float, config: str = '') -> Optional[Dict]:
+        """
+        Look up a cached result
+
+        Args:
+            file_hash: Hash of the analyzed file
+            ela_threshold: ELA threshold of the analysis
+            config: Fingerprint of the other analyzer settings affecting results
+
+        Returns:
+            The stored result dictionary, or None on a miss
+        """
+        key = (file_hash, ela_threshold, self.analyzer_version, config)
+        row = self.conn.execute(
+            'SELECT result FROM results '
+            'WHERE file_hash = ? AND ela_threshold = ? AND analyzer_version = ? AND config = ?',
+            key
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        self.conn.execute(
+            f'UPDATE results SET last_access = ({self._NEXT_TICK}) '
+            'WHERE file_hash = ? AND ela_threshold = ? AND analyzer_version = ? AND config = ?',
+            key
+        )
+        return json.loads(row[0])
+
+    def put(self, file_hash: str, ela_threshold: float, result: Dict, config: str = ''):
+        """Store a result dictionary and evict old entries if over budget"""
+        payload = json.dumps(result)
+        self.conn.execute(
+            'INSERT OR REPLACE INTO results '
+            '(file_hash, ela_threshold, analyzer_version, config, result, size, last_access) '
+            f'VALUES (?, ?, ?, ?, ?, ?, ({self._NEXT_TICK}))',
+            (file_hash, ela_threshold, self.analyzer_version, config, payload, len(payload))
+        )
+
+        self._writes_since_check += 1
+        if self._writes_since_check >= EVICT_CHECK_INTERVAL:
+            self.evict()
+
+    def evict(self):
+        """Drop least-recently-used entries until the cache fits in max_bytes"""
+        self._writes_since_check = 0
+
+        total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # Keep the most recently used entries whose running size fits the budget
+        self.conn.execute('''
+            DELETE FROM results WHERE rowid IN (
+                SELECT rowid FROM (
+                    SELECT rowid, SUM(size) OVER (
+                        ORDER BY last_access DESC, rowid DESC
+                    ) AS running
+                    FROM results
+                ) WHERE running > ?
+            )
+        ''', (self.max_bytes,))
+
+    def __len__(self) -> int:
+        return self.conn.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def close(self):
+        """Run a final eviction pass and close the database"""
+        self.evict()
+        self.conn.close()
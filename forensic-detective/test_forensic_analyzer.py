@@ -2,19 +2,35 @@
 Unit tests for Forensic Analyzer
 """
 
+import hashlib
 import pytest
 from pathlib import Path
 from PIL import Image
+import numpy as np
 import piexif
+import json
 from datetime import datetime
 
 from forensic_analyzer import (
     ForensicAnalyzer,
+    ForensicResult,
     GPSCoordinates,
     CameraInfo,
     TimestampInfo,
-    TamperingAnalysis
+    TamperingAnalysis,
+    ANALYZER_VERSION
 )
+from result_cache import ResultCache
+from batch_analyze import analyze_folder, iter_analysis, manifest_path_for
+from report_writer import JsonlReportWriter, read_report
+from benchmark import generate_corpus, run_benchmark
+from stage_timing import STAGES, TimingHook, LatencyHistogram
+from aws_uploader import BLOB_PREFIX, EvidenceUploader
+from bulk_uploader import BulkUploader, UploadManifest
+from digests import FileDigests, digest_buffer, digest_file
+import ela_engine
+from ela_engine import STRIPS_IN_FLIGHT_PER_WORKER, TiledELA, integer_ela
+from region_labeler import SuspiciousRegion, label_regions
 
 
 class TestForensicAnalyzer:
@@ -164,5 +180,1120 @@ class TestForensicAnalyzer:
         assert "tampering" in reason.lower()
 
 
+class TestSingleReadPipeline:
+    """Test suite for the single-read analysis pipeline"""
+    
+    @pytest.fixture
+    def exif_image_path(self, tmp_path):
+        """Create a test image with camera and GPS EXIF"""
+        exif_bytes = piexif.dump({
+            "0th": {piexif.ImageIFD.Make: b"TestCamera Inc.", piexif.ImageIFD.Model: b"TestCam 3000"},
+            "Exif": {
+                piexif.ExifIFD.DateTimeOriginal: b"2026:01:01 10:00:00",
+                piexif.ExifIFD.DateTimeDigitized: b"2026:01:01 10:00:00",
+                piexif.ExifIFD.BodySerialNumber: b"SN-0042"
+            },
+            "GPS": {
+                piexif.GPSIFD.GPSLatitude: ((34, 1), (36, 1), (13, 1)),
+                piexif.GPSIFD.GPSLatitudeRef: b'S',
+                piexif.GPSIFD.GPSLongitude: ((58, 1), (22, 1), (54, 1)),
+                piexif.GPSIFD.GPSLongitudeRef: b'W'
+            }
+        })
+        img = Image.new('RGB', (640, 480), color='green')
+        img_path = tmp_path / "exif_image.jpg"
+        img.save(img_path, 'JPEG', quality=95, exif=exif_bytes)
+        return str(img_path)
+    
+    def test_matches_legacy_pipeline(self, exif_image_path):
+        """Single-read results are identical to the two-read pipeline"""
+        single = ForensicAnalyzer(ela_threshold=0.15).analyze_image(exif_image_path)
+        legacy = ForensicAnalyzer(ela_threshold=0.15, single_read=False).analyze_image(exif_image_path)
+        
+        assert single.to_dict() == legacy.to_dict()
+        assert single.camera.make == "TestCamera Inc."
+        assert single.camera.serial == "SN-0042"
+        assert single.gps.is_valid()
+    
+    def test_memory_mapped_buffer(self, exif_image_path):
+        """Files above the mmap threshold are analyzed from a memory map"""
+        mapped = ForensicAnalyzer(ela_threshold=0.15, mmap_threshold=0).analyze_image(exif_image_path)
+        legacy = ForensicAnalyzer(ela_threshold=0.15, single_read=False).analyze_image(exif_image_path)
+        
+        assert mapped.to_dict() == legacy.to_dict()
+    
+    def test_hash_buffer_matches_file_hash(self, exif_image_path):
+        """Buffer hashing matches chunked file hashing"""
+        analyzer = ForensicAnalyzer()
+        path = Path(exif_image_path)
+        
+        assert digest_buffer(path.read_bytes()) == digest_file(path)
+        assert digest_file(path, mmap_threshold=0) == digest_file(path)
+        assert digest_file(path).file_hash == analyzer._calculate_hash(path)
+    
+    def test_digests_match_hashlib(self, exif_image_path):
+        """One pass yields the same SHA-256 and MD5 as separate hashes"""
+        data = Path(exif_image_path).read_bytes()
+        digests = digest_file(exif_image_path)
+        
+        assert digests.sha256 == hashlib.sha256(data).hexdigest()
+        assert digests.md5 == hashlib.md5(data).hexdigest()
+        assert digests.size == len(data)
+    
+    def test_supplied_digests_skip_hashing(self, exif_image_path, monkeypatch):
+        """Digests passed by the caller are reused, not recomputed"""
+        digests = digest_file(exif_image_path)
+        monkeypatch.setattr(
+            'forensic_analyzer.digest_buffer',
+            lambda buffer: pytest.fail("file hashed twice")
+        )
+        
+        result = ForensicAnalyzer().analyze_image(exif_image_path, digests=digests)
+        
+        assert result.file_hash == digests.file_hash
+        assert result.digests == digests
+    
+    def test_exif_segment_not_found(self):
+        """Non-JPEG buffers have no EXIF segment"""
+        analyzer = ForensicAnalyzer()
+        
+        assert analyzer._find_exif_segment(b'\x89PNG\r\n\x1a\n') is None
+        assert analyzer._extract_exif_from_buffer(b'') == {}
+
+
+class TestTiledELA:
+    """Test suite for the strip-based ELA engine"""
+    
+    @pytest.fixture
+    def noisy_image(self):
+        """Create an image with a flat half and a noisy half, odd dimensions"""
+        rng = np.random.default_rng(0)
+        pixels = (rng.random((517, 389, 3)) * 255).astype(np.uint8)
+        pixels[:250] = 120
+        return Image.fromarray(pixels)
+    
+    @pytest.mark.parametrize("strip_rows", [16, 64, 256])
+    def test_matches_full_frame_ela(self, noisy_image, strip_rows):
+        """Strips produce the same mask and score as a full-frame recompression"""
+        analyzer = ForensicAnalyzer(ela_threshold=0.15)
+        full_score, full_mask, full_levels = analyzer._full_frame_ela(noisy_image, 0.30)
+        
+        # A tiny memory budget forces the recompute path for most strips
+        engine = TiledELA(strip_rows=strip_rows, workers=2, max_memory=100_000)
+        tiled_score, tiled_mask, tiled_levels = engine.run(noisy_image, 0.30)
+        
+        assert np.array_equal(tiled_mask, full_mask)
+        assert np.allclose(tiled_levels, full_levels, rtol=1e-6)
+        assert tiled_score == pytest.approx(full_score, rel=1e-6)
+    
+    def test_strips_in_flight_bounded(self, noisy_image, monkeypatch):
+        """Only a few strips per worker are submitted ahead of the one being consumed"""
+        in_flight = []
+        peak = []
+        
+        class CountingExecutor(ela_engine.ThreadPoolExecutor):
+            def submit(self, fn, *args, **kwargs):
+                future = super().submit(fn, *args, **kwargs)
+                result = future.result
+                def consume(*result_args):
+                    in_flight.remove(future)
+                    return result(*result_args)
+                future.result = consume
+                in_flight.append(future)
+                peak.append(len(in_flight))
+                return future
+        monkeypatch.setattr(ela_engine, 'ThreadPoolExecutor', CountingExecutor)
+        
+        engine = TiledELA(strip_rows=16, workers=2, max_memory=0)
+        engine.run(noisy_image, 0.30)
+        
+        # 33 strips, each submitted once per pass
+        assert len(peak) == 2 * 33
+        assert max(peak) == 2 * STRIPS_IN_FLIGHT_PER_WORKER
+    
+    def test_large_images_use_tiled_engine(self, noisy_image):
+        """Images above the pixel threshold are analyzed strip by strip"""
+        full = ForensicAnalyzer(ela_threshold=0.15, ela_kernel='float')._detect_tampering(noisy_image)
+        tiled = ForensicAnalyzer(ela_threshold=0.15, tiled_ela_min_pixels=0)._detect_tampering(noisy_image)
+        
+        assert tiled.suspicious_regions == full.suspicious_regions
+        assert [r.area for r in tiled.regions] == [r.area for r in full.regions]
+        assert tiled.is_tampered == full.is_tampered
+        assert tiled.ela_score == pytest.approx(full.ela_score, rel=1e-6)
+
+
+class TestIntegerELA:
+    """Test suite for the integer-arithmetic ELA kernel"""
+    
+    @pytest.mark.parametrize("region_threshold", [0.1, 0.2, 0.3, 0.4, 0.6])
+    def test_matches_float_kernel(self, region_threshold):
+        """Integer kernel reproduces the float32 mask, including exact ties"""
+        rng = np.random.default_rng(1)
+        pixels = (rng.random((240, 320, 3)) * 255).astype(np.uint8)
+        pixels[:, :160] = 90
+        image = Image.fromarray(pixels)
+        
+        analyzer = ForensicAnalyzer(ela_kernel='float')
+        float_score, float_mask, float_levels = analyzer._full_frame_ela(image, region_threshold)
+        int_score, int_mask, int_levels = integer_ela(image, region_threshold)
+        
+        assert np.array_equal(int_mask, float_mask)
+        assert np.allclose(int_levels, float_levels, rtol=1e-6)
+        assert int_score == pytest.approx(float_score, rel=1e-6)
+    
+    def test_unknown_kernel_rejected(self):
+        """Only the integer and float kernels are accepted"""
+        with pytest.raises(ValueError):
+            ForensicAnalyzer(ela_kernel='simd')
+
+
+class TestRegionLabeler:
+    """Test suite for connected-component region labeling"""
+    
+    def test_separate_regions(self):
+        """Disjoint blobs become separate regions with their own stats"""
+        mask = np.zeros((40, 60), dtype=bool)
+        mask[2:12, 3:13] = True
+        mask[20:30, 40:55] = True
+        levels = np.where(mask[mask], 0.5, 0.0)
+        levels[100:] = 0.75  # Every pixel of the second blob
+        
+        regions = label_regions(mask, levels, min_area=1)
+        
+        assert regions == [
+            SuspiciousRegion(x=3, y=2, width=10, height=10, area=100, mean_error=0.5),
+            SuspiciousRegion(x=40, y=20, width=15, height=10, area=150, mean_error=0.75)
+        ]
+    
+    def test_diagonal_and_u_shapes_merge(self):
+        """8-connected diagonals and U shapes form a single region"""
+        mask = np.zeros((10, 10), dtype=bool)
+        mask[0, 0] = mask[1, 1] = mask[2, 2] = True
+        mask[4:9, 4] = mask[4:9, 8] = True
+        mask[8, 4:9] = True
+        mask[3, 3] = True  # Joins the diagonal to the U
+        
+        regions = label_regions(mask, min_area=1)
+        
+        assert len(regions) == 1
+        assert regions[0].bbox() == (0, 0, 9, 9)
+        assert regions[0].area == int(mask.sum())
+    
+    def test_small_regions_dropped(self):
+        """Regions below the minimum area are filtered out"""
+        mask = np.zeros((50, 50), dtype=bool)
+        mask[0, 0] = True
+        mask[10:20, 10:20] = True
+        
+        regions = label_regions(mask, min_area=64)
+        
+        assert [region.bbox() for region in regions] == [(10, 10, 10, 10)]
+    
+    def test_empty_mask(self):
+        """An empty mask has no regions"""
+        assert label_regions(np.zeros((8, 8), dtype=bool)) == []
+
+
+class TestMetadataTriage:
+    """Test suite for metadata-only triage"""
+    
+    def _save(self, tmp_path, name, original=b"2026:01:01 10:00:00"):
+        """Save a JPEG with camera info and the given original timestamp"""
+        exif_bytes = piexif.dump({
+            "0th": {piexif.ImageIFD.Make: b"TestCamera Inc."},
+            "Exif": {
+                piexif.ExifIFD.DateTimeOriginal: original,
+                piexif.ExifIFD.DateTimeDigitized: original
+            }
+        })
+        img_path = tmp_path / name
+        Image.new('RGB', (320, 200), color='gray').save(img_path, 'JPEG', exif=exif_bytes)
+        return str(img_path)
+    
+    def test_matches_full_analysis_metadata(self, tmp_path):
+        """Triage extracts the same metadata as the full analysis"""
+        image_path = self._save(tmp_path, "triage.jpg")
+        analyzer = ForensicAnalyzer()
+        triage = analyzer.triage_image(image_path)
+        full = analyzer.analyze_image(image_path)
+        
+        assert triage.is_authentic
+        assert triage.image_dimensions == full.image_dimensions
+        assert triage.camera == full.camera
+        assert triage.timestamp == full.timestamp
+        assert triage.file_size == full.file_size
+    
+    def test_pixels_not_decoded(self, tmp_path, monkeypatch):
+        """Triage never decodes pixel data"""
+        image_path = self._save(tmp_path, "nodecode.jpg")
+        
+        def fail(*args, **kwargs):
+            raise AssertionError("pixels should not be decoded")
+        monkeypatch.setattr(Image.Image, 'load', fail)
+        
+        assert ForensicAnalyzer().triage_image(image_path).camera.make == "TestCamera Inc."
+    
+    def test_future_timestamp_rejected(self, tmp_path):
+        """Future timestamps fail triage"""
+        image_path = self._save(tmp_path, "future.jpg", original=b"2099:01:01 10:00:00")
+        result = ForensicAnalyzer().triage_image(image_path)
+        
+        assert not result.is_authentic
+        assert "future" in result.rejection_reason.lower()
+    
+    def test_file_not_found(self):
+        """Missing files are rejected"""
+        result = ForensicAnalyzer().triage_image("nonexistent.jpg")
+        
+        assert not result.is_authentic
+        assert "File not found" in result.rejection_reason
+
+
+class TestFailFast:
+    """Test suite for cheap-checks-first evaluation order"""
+    
+    def _save(self, tmp_path, name, original):
+        """Save a JPEG with the given original timestamp"""
+        exif_bytes = piexif.dump({
+            "Exif": {
+                piexif.ExifIFD.DateTimeOriginal: original,
+                piexif.ExifIFD.DateTimeDigitized: original
+            }
+        })
+        pixels = np.random.default_rng(0).integers(0, 256, (200, 320, 3), dtype=np.uint8)
+        img_path = tmp_path / name
+        Image.fromarray(pixels).save(img_path, 'JPEG', exif=exif_bytes)
+        return str(img_path)
+    
+    def test_metadata_rejection_skips_ela(self, tmp_path, monkeypatch):
+        """ELA never runs for images the metadata checks already reject"""
+        image_path = self._save(tmp_path, "future.jpg", b"2099:01:01 10:00:00")
+        
+        def fail(*args, **kwargs):
+            raise AssertionError("ELA should be skipped")
+        monkeypatch.setattr(ForensicAnalyzer, '_detect_tampering', fail)
+        
+        result = ForensicAnalyzer().analyze_image(image_path)
+        
+        assert not result.is_authentic
+        assert "future" in result.rejection_reason.lower()
+        assert result.skipped_checks == ['ela']
+        assert ForensicResult.from_dict(result.to_dict()) == result
+    
+    def test_passing_metadata_runs_ela(self, tmp_path):
+        """Images with valid metadata still get the full analysis"""
+        image_path = self._save(tmp_path, "valid.jpg", b"2026:01:01 10:00:00")
+        result = ForensicAnalyzer().analyze_image(image_path)
+        
+        assert result.skipped_checks == []
+        assert result.tampering.ela_score > 0
+    
+    def test_fail_fast_disabled(self, tmp_path):
+        """With fail_fast off every check runs"""
+        image_path = self._save(tmp_path, "future.jpg", b"2099:01:01 10:00:00")
+        result = ForensicAnalyzer(fail_fast=False).analyze_image(image_path)
+        
+        assert not result.is_authentic
+        assert result.skipped_checks == []
+        assert result.tampering.ela_score > 0
+
+
+class TestResultCache:
+    """Test suite for the content-addressed result cache"""
+    
+    @pytest.fixture
+    def sample_image_path(self, tmp_path):
+        """Create a sample test image"""
+        img = Image.new('RGB', (320, 240), color='red')
+        img_path = tmp_path / "cached_image.jpg"
+        img.save(img_path, 'JPEG', quality=95)
+        return str(img_path)
+    
+    @pytest.fixture
+    def cache(self, tmp_path):
+        """Create a cache in a temporary directory"""
+        cache = ResultCache(str(tmp_path / "cache.db"), ANALYZER_VERSION)
+        yield cache
+        cache.close()
+    
+    def test_result_round_trip(self, sample_image_path):
+        """from_dict() rebuilds the result produced by to_dict()"""
+        result = ForensicAnalyzer().analyze_image(sample_image_path)
+        
+        assert ForensicResult.from_dict(result.to_dict()) == result
+    
+    def test_cache_hit_skips_analysis(self, cache, sample_image_path, monkeypatch):
+        """A cached file is answered without decoding or ELA"""
+        analyzer = ForensicAnalyzer(ela_threshold=0.15, cache=cache)
+        first = analyzer.analyze_image(sample_image_path)
+        
+        def fail(*args, **kwargs):
+            raise AssertionError("ELA should not run on a cache hit")
+        monkeypatch.setattr(analyzer, '_detect_tampering', fail)
+        
+        second = analyzer.analyze_image(sample_image_path)
+        assert second.to_dict() == first.to_dict()
+    
+    def test_cache_keyed_on_threshold(self, cache, sample_image_path):
+        """Results for another ELA threshold are not reused"""
+        ForensicAnalyzer(ela_threshold=0.15, cache=cache).analyze_image(sample_image_path)
+        file_hash = ForensicAnalyzer()._calculate_hash(Path(sample_image_path))
+        
+        config = ForensicAnalyzer().cache_config
+        assert cache.get(file_hash, 0.15, config) is not None
+        assert cache.get(file_hash, 0.30, config) is None
+    
+    def test_cache_keyed_on_config(self, cache, tmp_path, monkeypatch):
+        """A fail-fast rejection is not served to a full-analysis run"""
+        img_path = tmp_path / "no_metadata.jpg"
+        Image.new('RGB', (320, 240), color='blue').save(img_path, 'JPEG')
+        
+        fast = ForensicAnalyzer(fail_fast=True, cache=cache).analyze_image(str(img_path))
+        full = ForensicAnalyzer(fail_fast=False, cache=cache).analyze_image(str(img_path))
+        
+        assert fast.skipped_checks == ['ela']
+        assert full.skipped_checks == []
+        assert len(cache) == 2
+        assert ForensicAnalyzer(min_region_area=1).cache_config != ForensicAnalyzer().cache_config
+    
+    def test_future_timestamp_rejection_not_cached(self, cache, tmp_path):
+        """A rejection that only holds until the clock catches up is re-checked"""
+        original = b"2099:01:01 10:00:00"
+        exif_bytes = piexif.dump({
+            "Exif": {
+                piexif.ExifIFD.DateTimeOriginal: original,
+                piexif.ExifIFD.DateTimeDigitized: original
+            }
+        })
+        img_path = tmp_path / "future.jpg"
+        Image.new('RGB', (320, 240), color='red').save(img_path, 'JPEG', exif=exif_bytes)
+        
+        result = ForensicAnalyzer(cache=cache).analyze_image(str(img_path))
+        
+        assert "future" in result.rejection_reason.lower()
+        assert len(cache) == 0
+    
+    def test_cache_without_config_column_rebuilt(self, tmp_path):
+        """A cache database from before the config key is dropped, not misread"""
+        import sqlite3
+        db = tmp_path / "old.db"
+        conn = sqlite3.connect(db)
+        conn.execute(
+            'CREATE TABLE results (file_hash TEXT, ela_threshold REAL, analyzer_version TEXT, '
+            'result TEXT, size INTEGER, last_access INTEGER)'
+        )
+        conn.execute("INSERT INTO results VALUES ('sha256:a', 0.2, ?, '{}', 2, 1)", (ANALYZER_VERSION,))
+        conn.commit()
+        conn.close()
+        
+        cache = ResultCache(str(db), ANALYZER_VERSION)
+        assert len(cache) == 0
+        cache.put("sha256:a", 0.2, {"ok": True}, "cfg")
+        assert cache.get("sha256:a", 0.2, "cfg") == {"ok": True}
+        cache.close()
+    
+    def test_lru_eviction(self, tmp_path):
+        """Least recently used entries are evicted once over budget"""
+        cache = ResultCache(str(tmp_path / "small.db"), ANALYZER_VERSION, max_bytes=100)
+        cache.put("sha256:a", 0.2, {"payload": "x" * 30})
+        cache.put("sha256:b", 0.2, {"payload": "x" * 30})
+        cache.get("sha256:a", 0.2)
+        cache.put("sha256:c", 0.2, {"payload": "x" * 30})
+        cache.evict()
+        
+        assert cache.get("sha256:a", 0.2) is not None
+        assert cache.get("sha256:b", 0.2) is None
+        assert cache.get("sha256:c", 0.2) is not None
+        cache.close()
+
+
+class TestIncrementalBatch:
+    """Test suite for manifest-based incremental folder analysis"""
+    
+    @pytest.fixture
+    def folder(self, tmp_path):
+        """Folder with two images"""
+        folder = tmp_path / "photos"
+        folder.mkdir()
+        for name, color in (("a.jpg", 'red'), ("b.jpg", 'green')):
+            Image.new('RGB', (64, 64), color=color).save(folder / name, 'JPEG')
+        return folder
+    
+    def test_unchanged_files_not_reanalyzed(self, folder, tmp_path, monkeypatch):
+        """A second run reuses every record from the manifest"""
+        report_path = tmp_path / "report.jsonl"
+        analyze_folder(folder, incremental=True, report_path=report_path)
+        first = list(read_report(report_path))
+        assert manifest_path_for(report_path).exists()
+        
+        def fail(*args, **kwargs):
+            raise AssertionError("unchanged image analyzed again")
+        monkeypatch.setattr(ForensicAnalyzer, 'analyze_image', fail)
+        
+        analyze_folder(folder, incremental=True, report_path=report_path)
+        assert list(read_report(report_path)) == first
+    
+    def test_only_changed_files_analyzed(self, folder, tmp_path, monkeypatch):
+        """New and modified files are analyzed and merged with the rest"""
+        report_path = tmp_path / "report.jsonl"
+        analyze_folder(folder, incremental=True, report_path=report_path)
+        
+        Image.new('RGB', (32, 32), color='blue').save(folder / "b.jpg", 'JPEG')
+        Image.new('RGB', (48, 48), color='white').save(folder / "c.jpg", 'JPEG')
+        (folder / "a.jpg").touch()  # Same bytes, new mtime
+        
+        analyzed = []
+        original = ForensicAnalyzer.analyze_image
+        def spy(self, image_path):
+            analyzed.append(Path(image_path).name)
+            return original(self, image_path)
+        monkeypatch.setattr(ForensicAnalyzer, 'analyze_image', spy)
+        
+        analyze_folder(folder, incremental=True, report_path=report_path)
+        results = list(read_report(report_path))
+        
+        assert analyzed == ["b.jpg", "c.jpg"]
+        assert [r['filename'] for r in results] == ["a.jpg", "b.jpg", "c.jpg"]
+        assert results[1]['dimensions'] == "32x32"
+    
+    def test_removed_files_dropped(self, folder, tmp_path):
+        """Deleted files disappear from the merged report"""
+        report_path = tmp_path / "report.jsonl"
+        analyze_folder(folder, incremental=True, report_path=report_path)
+        (folder / "b.jpg").unlink()
+        
+        stats = analyze_folder(folder, incremental=True, report_path=report_path)
+        
+        assert [r['filename'] for r in read_report(report_path)] == ["a.jpg"]
+        assert stats.total == 1
+    
+    def test_threshold_change_invalidates_manifest(self, folder, tmp_path, monkeypatch):
+        """Records from a different ELA threshold are not reused"""
+        report_path = tmp_path / "report.jsonl"
+        analyze_folder(folder, incremental=True, report_path=report_path)
+        
+        calls = []
+        original = ForensicAnalyzer.analyze_image
+        def spy(self, image_path):
+            calls.append(image_path)
+            return original(self, image_path)
+        monkeypatch.setattr(ForensicAnalyzer, 'analyze_image', spy)
+        
+        analyze_folder(folder, 0.3, incremental=True, report_path=report_path)
+        
+        assert len(calls) == 2
+    
+    def test_resumed_records_kept_in_manifest(self, folder, tmp_path, monkeypatch):
+        """Images finished before an interruption are not analyzed again later"""
+        report_path = tmp_path / "report.jsonl"
+        analyze_folder(folder, incremental=True, report_path=report_path)
+        
+        # Simulate a crash after the first image: the manifest is saved at the end
+        manifest_path_for(report_path).unlink()
+        lines = report_path.read_text().splitlines(keepends=True)
+        report_path.write_text(''.join(lines[:2]))
+        
+        analyzed = []
+        original = ForensicAnalyzer.analyze_image
+        def spy(self, image_path):
+            analyzed.append(Path(image_path).name)
+            return original(self, image_path)
+        monkeypatch.setattr(ForensicAnalyzer, 'analyze_image', spy)
+        
+        analyze_folder(folder, incremental=True, report_path=report_path, resume=True)
+        assert analyzed == ["b.jpg"]
+        
+        analyze_folder(folder, incremental=True, report_path=report_path)
+        assert analyzed == ["b.jpg"]
+        assert [r['filename'] for r in read_report(report_path)] == ["a.jpg", "b.jpg"]
+
+
+class TestStreamingReport:
+    """Test suite for the streaming JSONL batch report"""
+    
+    HEADER = {'folder': 'photos', 'ela_threshold': 0.2}
+    
+    def _record(self, name, authentic=True):
+        return {
+            'filename': name,
+            'path': f"photos/{name}",
+            'authentic': authentic,
+            'has_gps': False,
+            'has_camera_info': True,
+            'rejection_reason': None if authentic else "Tampered"
+        }
+    
+    def test_counters_and_summary(self, tmp_path):
+        """Summary line carries the running counters"""
+        report_path = tmp_path / "report.jsonl"
+        with JsonlReportWriter(report_path, self.HEADER) as writer:
+            writer.start()
+            writer.write(self._record("a.jpg"))
+            writer.write(self._record("b.jpg", authentic=False))
+            writer.write({'filename': "c.jpg", 'path': "photos/c.jpg", 'error': "boom"})
+        
+        summary = json.loads(report_path.read_text().splitlines()[-1])
+        
+        assert summary['type'] == 'summary'
+        assert (summary['authentic'], summary['rejected'], summary['errors']) == (1, 1, 1)
+        assert summary['rejection_reasons'] == {"Tampered": 1}
+        assert [r['filename'] for r in read_report(report_path)] == ["a.jpg", "b.jpg", "c.jpg"]
+    
+    def test_resume_after_torn_write(self, tmp_path):
+        """A crash mid-line keeps every complete record and counter"""
+        report_path = tmp_path / "report.jsonl"
+        writer = JsonlReportWriter(report_path, self.HEADER)
+        writer.start()
+        writer.write(self._record("a.jpg"))
+        writer.write(self._record("b.jpg", authentic=False))
+        writer._file.write('{"type": "result", "filen')  # Interrupted here
+        writer._file.close()
+        
+        writer = JsonlReportWriter(report_path, self.HEADER)
+        assert writer.resume() == 2
+        assert writer.last_path == "photos/b.jpg"
+        writer.write(self._record("c.jpg"))
+        writer.close()
+        
+        assert [r['filename'] for r in read_report(report_path)] == ["a.jpg", "b.jpg", "c.jpg"]
+        assert (writer.stats.authentic, writer.stats.rejected) == (2, 1)
+    
+    def test_resume_with_other_settings_starts_over(self, tmp_path):
+        """A report written with different settings is not resumed"""
+        report_path = tmp_path / "report.jsonl"
+        with JsonlReportWriter(report_path, self.HEADER) as writer:
+            writer.start()
+            writer.write(self._record("a.jpg"))
+        
+        writer = JsonlReportWriter(report_path, {**self.HEADER, 'ela_threshold': 0.3})
+        assert writer.resume() == 0
+        writer.close()
+        
+        assert list(read_report(report_path)) == []
+    
+    def test_start_after_resume_closes_handle(self, tmp_path):
+        """Starting over after resume() does not leak its append handle"""
+        report_path = tmp_path / "report.jsonl"
+        with JsonlReportWriter(report_path, self.HEADER) as writer:
+            writer.start()
+            writer.write(self._record("a.jpg"))
+        
+        writer = JsonlReportWriter(report_path, self.HEADER)
+        assert writer.resume() == 1
+        resumed = writer._file
+        writer.start()
+        writer.close()
+        
+        assert resumed.closed
+        assert list(read_report(report_path)) == []
+    
+    def test_analyze_folder_resume_mismatch(self, tmp_path):
+        """A partial report of other files is replaced, not appended to"""
+        folder = tmp_path / "photos"
+        folder.mkdir()
+        for name in ("a.jpg", "b.jpg"):
+            Image.new('RGB', (32, 32), color='red').save(folder / name, 'JPEG')
+        report_path = tmp_path / "report.jsonl"
+        analyze_folder(folder, report_path=report_path)
+        
+        # A partial report whose last record is not the folder's second file
+        lines = report_path.read_text().splitlines(keepends=True)
+        report_path.write_text(lines[0] + lines[2])
+        
+        stats = analyze_folder(folder, report_path=report_path, resume=True)
+        
+        assert stats.total == 2
+        assert [r['filename'] for r in read_report(report_path)] == ["a.jpg", "b.jpg"]
+        assert len(report_path.read_text().splitlines()) == 4
+    
+    def test_analyze_folder_resume(self, tmp_path, monkeypatch):
+        """Resumed batch runs only analyze images missing from the report"""
+        folder = tmp_path / "photos"
+        folder.mkdir()
+        for name in ("a.jpg", "b.jpg", "c.jpg"):
+            Image.new('RGB', (32, 32), color='red').save(folder / name, 'JPEG')
+        report_path = tmp_path / "report.jsonl"
+        analyze_folder(folder, report_path=report_path)
+        
+        # Simulate a crash after the second image
+        lines = report_path.read_text().splitlines(keepends=True)
+        report_path.write_text(''.join(lines[:3]))
+        
+        analyzed = []
+        original = ForensicAnalyzer.analyze_image
+        def spy(self, image_path):
+            analyzed.append(Path(image_path).name)
+            return original(self, image_path)
+        monkeypatch.setattr(ForensicAnalyzer, 'analyze_image', spy)
+        
+        stats = analyze_folder(folder, report_path=report_path, resume=True)
+        
+        assert analyzed == ["c.jpg"]
+        assert stats.total == 3
+        assert [r['filename'] for r in read_report(report_path)] == ["a.jpg", "b.jpg", "c.jpg"]
+    
+    def test_json_report_written(self, tmp_path):
+        """The finished run is also written in the single-document JSON layout"""
+        folder = tmp_path / "photos"
+        folder.mkdir()
+        for name in ("a.jpg", "b.jpg"):
+            Image.new('RGB', (32, 32), color='red').save(folder / name, 'JPEG')
+        report_path = tmp_path / "report.jsonl"
+        
+        stats = analyze_folder(folder, report_path=report_path)
+        report = json.loads((tmp_path / "report.json").read_text())
+        
+        assert report['folder'] == str(folder)
+        assert report['ela_threshold'] == 0.2
+        assert (report['total_images'], report['authentic'], report['errors']) == (2, stats.authentic, 0)
+        assert report['results'] == list(read_report(report_path))
+        
+        (tmp_path / "report.json").unlink()
+        analyze_folder(folder, report_path=report_path, json_report=False)
+        assert not (tmp_path / "report.json").exists()
+
+
+class TestParallelBatch:
+    """Test suite for process-pool batch analysis"""
+    
+    @pytest.fixture
+    def corpus(self, tmp_path):
+        """Images of mixed sizes, so workers finish out of order"""
+        return generate_corpus(tmp_path / "photos", 24, resolutions=[(640, 480), (64, 48), (320, 240)], workers=1)
+    
+    def test_results_in_input_order(self, corpus):
+        """Pool results stream back in input order and equal the serial ones"""
+        serial = list(iter_analysis(corpus, workers=1))
+        pooled = list(iter_analysis(corpus, workers=3))
+        
+        assert [result.file_hash for result, _ in pooled] == [digest_file(path).file_hash for path in corpus]
+        assert [error for _, error in pooled] == [error for _, error in serial] == [None] * len(corpus)
+        assert [self._without_timings(result) for result, _ in pooled] == \
+            [self._without_timings(result) for result, _ in serial]
+    
+    def _without_timings(self, result):
+        """Result fields that do not depend on how fast the run was"""
+        return {key: value for key, value in result.to_dict().items() if key != 'timings'}
+    
+    def test_report_matches_serial(self, corpus, tmp_path):
+        """analyze_folder with workers writes the serial run's report"""
+        folder = Path(corpus[0]).parent
+        analyze_folder(folder, report_path=tmp_path / "serial.jsonl")
+        analyze_folder(folder, workers=3, report_path=tmp_path / "pooled.jsonl")
+        
+        assert list(read_report(tmp_path / "pooled.jsonl")) == list(read_report(tmp_path / "serial.jsonl"))
+
+
+class TestBenchmark:
+    """Test suite for the benchmark corpus generator and runner"""
+    
+    def test_corpus_variants(self, tmp_path):
+        """Every EXIF variant and the spliced variant are generated"""
+        paths = generate_corpus(tmp_path, 20, resolutions=[(64, 48)], workers=1)
+        names = [Path(path).name for path in paths]
+        
+        assert len(names) == 20
+        for variant in ('full', 'no_gps', 'no_camera', 'bad_timestamp', 'none'):
+            assert any(f"_{variant}" in name for name in names)
+        assert sum('_tampered' in name for name in names) == 5
+        
+        future = ForensicAnalyzer().analyze_image(paths[3])  # bad_timestamp
+        assert "future" in future.rejection_reason.lower()
+    
+    def test_corpus_is_deterministic(self, tmp_path):
+        """The same seed produces the same images"""
+        first = generate_corpus(tmp_path / "a", 3, resolutions=[(64, 48)], workers=1)
+        second = generate_corpus(tmp_path / "b", 3, resolutions=[(64, 48)], workers=1)
+        
+        for a, b in zip(first, second):
+            assert np.array_equal(np.asarray(Image.open(a)), np.asarray(Image.open(b)))
+    
+    def test_runner_reports_stages(self, tmp_path):
+        """The runner times every stage of every image"""
+        generate_corpus(tmp_path, 5, resolutions=[(64, 48)], workers=1)
+        report = run_benchmark(tmp_path)
+        
+        assert report['images'] == 5
+        assert set(report['stages']) == {*STAGES, 'other', 'total'}
+        assert report['stages']['hash']['total_ms'] > 0
+        assert report['images_per_sec'] > 0
+
+
+class TestStageTiming:
+    """Test suite for per-stage timings and timing hooks"""
+    
+    @pytest.fixture
+    def image_path(self, tmp_path):
+        """Image with valid metadata so every stage runs"""
+        return generate_corpus(tmp_path, 1, resolutions=[(64, 48)], workers=1)[0]
+    
+    def test_timings_disabled_by_default(self, image_path):
+        """No timings are recorded unless requested"""
+        assert ForensicAnalyzer().analyze_image(image_path).timings is None
+    
+    def test_all_stages_timed(self, image_path):
+        """Every pipeline stage is recorded in nanoseconds"""
+        result = ForensicAnalyzer(record_timings=True).analyze_image(image_path)
+        
+        assert result.skipped_checks == []
+        assert set(result.timings) == set(STAGES)
+        assert all(isinstance(ns, int) and ns >= 0 for ns in result.timings.values())
+    
+    def test_hooks_receive_timings(self, image_path):
+        """Hooks get the timings without them being attached to the result"""
+        class Collector(TimingHook):
+            def __init__(self):
+                self.calls = []
+            
+            def on_timings(self, image_path, timings):
+                self.calls.append((image_path, timings))
+        
+        collector = Collector()
+        result = ForensicAnalyzer(hooks=[collector]).analyze_image(image_path)
+        
+        assert result.timings is None
+        assert [path for path, _ in collector.calls] == [image_path]
+        assert 'ela' in collector.calls[0][1]
+    
+    def test_hook_errors_propagate(self, image_path):
+        """A failing hook raises instead of rejecting the image"""
+        class Broken(TimingHook):
+            def on_timings(self, image_path, timings):
+                raise RuntimeError("metrics down")
+        
+        with pytest.raises(RuntimeError):
+            ForensicAnalyzer(hooks=[Broken()]).analyze_image(image_path)
+    
+    def test_cached_results_not_stored_with_timings(self, image_path, tmp_path):
+        """Timings describe the current call, never a cached one"""
+        cache = ResultCache(tmp_path / "cache.db", ANALYZER_VERSION)
+        analyzer = ForensicAnalyzer(cache=cache, record_timings=True)
+        analyzer.analyze_image(image_path)
+        
+        cached = analyzer.analyze_image(image_path)
+        
+        assert set(cached.timings) == {'read', 'hash'}
+    
+    def test_histogram_percentiles(self):
+        """Histogram percentiles are within the bucket resolution"""
+        histogram = LatencyHistogram()
+        for value in range(1, 10001):
+            histogram.add(value * 1000)
+        
+        assert histogram.percentile(50) == pytest.approx(5_000_000, rel=0.02)
+        assert histogram.percentile(99) == pytest.approx(9_900_000, rel=0.02)
+        assert LatencyHistogram().percentile(50) is None
+
+
+class TestEvidenceUploader:
+    """Test suite for evidence uploads against a local S3 stand-in (moto)"""
+    
+    @pytest.fixture
+    def s3(self, monkeypatch):
+        """Mocked S3 with an Object Lock bucket and a plain bucket"""
+        moto = pytest.importorskip("moto")
+        import boto3
+        for name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"):
+            monkeypatch.setenv(name, "testing")
+        with moto.mock_aws():
+            client = boto3.client("s3", region_name="us-east-1")
+            client.create_bucket(Bucket="locked-evidence", ObjectLockEnabledForBucket=True)
+            client.create_bucket(Bucket="plain-evidence")
+            yield client
+    
+    @pytest.fixture
+    def evidence(self, tmp_path):
+        """Image and an authentic result for it"""
+        image_path = tmp_path / "evidence.jpg"
+        Image.new('RGB', (64, 64), color='gray').save(image_path, 'JPEG')
+        result = ForensicAnalyzer().analyze_image(str(image_path))
+        result.is_authentic = True
+        result.rejection_reason = None
+        return str(image_path), result
+    
+    def _key(self, url):
+        return url.split('/', 3)[3]
+    
+    def test_object_lock_set_inline(self, s3, evidence):
+        """Both objects are locked by their PUT; no retention calls are made"""
+        retention_calls = []
+        s3.meta.events.register(
+            'before-call.s3.PutObjectRetention',
+            lambda **kwargs: retention_calls.append(kwargs)
+        )
+        uploader = EvidenceUploader("locked-evidence", s3_client=s3)
+        
+        upload = uploader.upload_evidence(*evidence, case_id="CASE-1", inspector_id="INS-1")
+        
+        for url in (upload['image_url'], upload['report_url']):
+            head = s3.head_object(Bucket="locked-evidence", Key=self._key(url))
+            assert head['ObjectLockMode'] == 'COMPLIANCE'
+        assert retention_calls == []
+        assert uploader.dynamodb is None
+        
+        report = json.loads(s3.get_object(
+            Bucket="locked-evidence", Key=self._key(upload['report_url'])
+        )['Body'].read())
+        assert report['case_metadata']['image_s3_url'] == upload['image_url']
+    
+    def test_bucket_without_object_lock(self, s3, evidence):
+        """Uploads fall back to unlocked PUTs when the bucket has no Object Lock"""
+        uploader = EvidenceUploader("plain-evidence", s3_client=s3)
+        
+        upload = uploader.upload_evidence(*evidence, case_id="CASE-1", inspector_id="INS-1")
+        
+        assert not uploader.object_lock_enabled
+        head = s3.head_object(Bucket="plain-evidence", Key=self._key(upload['image_url']))
+        assert head['Metadata']['file-hash'] == evidence[1].file_hash
+    
+    def test_upload_verified_by_analysis_digests(self, s3, evidence):
+        """The image PUT carries the checksums computed during analysis"""
+        puts = []
+        s3.meta.events.register(
+            'provide-client-params.s3.PutObject',
+            lambda params, **kwargs: puts.append(dict(params))
+        )
+        uploader = EvidenceUploader("plain-evidence", s3_client=s3)
+        digests = evidence[1].digests
+        
+        upload = uploader.upload_evidence(*evidence, case_id="CASE-1", inspector_id="INS-1")
+        
+        image_put = next(p for p in puts if p['Key'] == self._key(upload['image_url']))
+        assert image_put['ContentMD5'] == digests.content_md5
+        assert image_put['ChecksumSHA256'] == digests.checksum_sha256
+        head = s3.head_object(Bucket="plain-evidence", Key=self._key(upload['image_url']))
+        assert head['ETag'] == digests.etag
+    
+    def test_content_addressed_dedupe(self, s3, evidence):
+        """The same image in two cases is stored once, with a pointer per case"""
+        puts = []
+        s3.meta.events.register(
+            'provide-client-params.s3.PutObject',
+            lambda params, **kwargs: puts.append(params['Key'])
+        )
+        uploader = EvidenceUploader("locked-evidence", s3_client=s3, content_addressed=True)
+        digests = evidence[1].digests
+        
+        first = uploader.upload_evidence(*evidence, case_id="CASE-1", inspector_id="INS-1")
+        second = uploader.upload_evidence(*evidence, case_id="CASE-2", inspector_id="INS-2")
+        
+        blob_key = self._key(first['image_url'])
+        assert blob_key.endswith(digests.sha256)
+        assert second['image_url'] == first['image_url']
+        assert (first['deduplicated'], second['deduplicated']) == (False, True)
+        assert puts.count(blob_key) == 1
+        
+        manifest = json.loads(s3.get_object(
+            Bucket="locked-evidence", Key=self._key(second['manifest_url'])
+        )['Body'].read())
+        assert manifest['case_id'] == "CASE-2"
+        assert manifest['image_s3_url'] == first['image_url']
+        assert manifest['report_s3_url'] == second['report_url']
+        assert manifest['digests']['sha256'] == digests.sha256
+        head = s3.head_object(Bucket="locked-evidence", Key=self._key(second['manifest_url']))
+        assert head['ObjectLockMode'] == 'COMPLIANCE'
+    
+    def test_reused_blob_retention_extended(self, s3, evidence, monkeypatch):
+        """A reused blob stays locked until the new case's retention ends"""
+        uploader = EvidenceUploader("locked-evidence", s3_client=s3, content_addressed=True)
+        first = uploader.upload_evidence(*evidence, case_id="CASE-1", inspector_id="INS-1")
+        blob_key = self._key(first['image_url'])
+        first_until = s3.head_object(Bucket="locked-evidence", Key=blob_key)['ObjectLockRetainUntilDate']
+        
+        # The second case is uploaded a year later
+        later = datetime(first_until.year + 1, 6, 1)
+        monkeypatch.setattr(uploader, '_object_lock_args', lambda: {
+            'ObjectLockMode': 'COMPLIANCE',
+            'ObjectLockRetainUntilDate': later
+        })
+        second = uploader.upload_evidence(*evidence, case_id="CASE-2", inspector_id="INS-2")
+        
+        assert second['deduplicated'] and second['image_url'] == first['image_url']
+        head = s3.head_object(Bucket="locked-evidence", Key=blob_key)
+        assert head['ObjectLockMode'] == 'COMPLIANCE'
+        assert head['ObjectLockRetainUntilDate'].replace(tzinfo=None) == later
+    
+    def test_unextendable_blob_copied_per_case(self, s3, evidence, monkeypatch):
+        """When the blob's retention cannot be extended the case gets its own copy"""
+        from botocore.exceptions import ClientError
+        uploader = EvidenceUploader("locked-evidence", s3_client=s3, content_addressed=True)
+        first = uploader.upload_evidence(*evidence, case_id="CASE-1", inspector_id="INS-1")
+        
+        def refuse(**kwargs):
+            raise ClientError({'Error': {'Code': 'AccessDenied', 'Message': 'Access Denied'}}, 'PutObjectRetention')
+        monkeypatch.setattr(s3, 'put_object_retention', refuse)
+        monkeypatch.setattr(uploader, '_object_lock_args', lambda: {
+            'ObjectLockMode': 'COMPLIANCE',
+            'ObjectLockRetainUntilDate': datetime(2100, 1, 1)
+        })
+        second = uploader.upload_evidence(*evidence, case_id="CASE-2", inspector_id="INS-2")
+        
+        copy_key = self._key(second['image_url'])
+        assert not second['deduplicated']
+        assert copy_key.startswith("evidence/CASE-2/") and copy_key != self._key(first['image_url'])
+        head = s3.head_object(Bucket="locked-evidence", Key=copy_key)
+        assert head['ObjectLockRetainUntilDate'].replace(tzinfo=None) == datetime(2100, 1, 1)
+        report = json.loads(s3.get_object(
+            Bucket="locked-evidence", Key=self._key(second['report_url'])
+        )['Body'].read())
+        assert report['case_metadata']['image_s3_url'] == second['image_url']
+    
+    def test_failed_image_put_writes_no_report(self, s3, evidence):
+        """A locked report is only written once the image is stored"""
+        from botocore.exceptions import ClientError
+        def fail_image(params, **kwargs):
+            if '/original' in params['Key']:
+                raise ClientError({'Error': {'Code': 'InternalError', 'Message': 'Internal Error'}}, 'PutObject')
+        s3.meta.events.register('provide-client-params.s3.PutObject', fail_image)
+        uploader = EvidenceUploader("locked-evidence", s3_client=s3)
+        
+        with pytest.raises(ClientError):
+            uploader.upload_evidence(*evidence, case_id="CASE-1", inspector_id="INS-1")
+        
+        assert s3.list_objects_v2(Bucket="locked-evidence").get('KeyCount') == 0
+    
+    def test_failed_blob_put_writes_no_pointer(self, s3, evidence):
+        """Neither the report nor the manifest is written when the blob PUT fails"""
+        from botocore.exceptions import ClientError
+        def fail_blob(params, **kwargs):
+            if params['Key'].startswith(BLOB_PREFIX):
+                raise ClientError({'Error': {'Code': 'InternalError', 'Message': 'Internal Error'}}, 'PutObject')
+        s3.meta.events.register('provide-client-params.s3.PutObject', fail_blob)
+        uploader = EvidenceUploader("locked-evidence", s3_client=s3, content_addressed=True)
+        
+        with pytest.raises(ClientError):
+            uploader.upload_evidence(*evidence, case_id="CASE-1", inspector_id="INS-1")
+        
+        assert s3.list_objects_v2(Bucket="locked-evidence").get('KeyCount') == 0
+        
+        # A retry once S3 recovers stores the blob before its pointers
+        s3.meta.events.unregister('provide-client-params.s3.PutObject', fail_blob)
+        upload = uploader.upload_evidence(*evidence, case_id="CASE-1", inspector_id="INS-1")
+        assert not upload['deduplicated']
+        assert s3.head_object(Bucket="locked-evidence", Key=self._key(upload['image_url']))
+    
+    def test_rejected_image_not_uploaded(self, s3, evidence):
+        """Rejected results are never uploaded"""
+        image_path, result = evidence
+        result.is_authentic = False
+        result.rejection_reason = "Tampering detected"
+        
+        with pytest.raises(ValueError):
+            EvidenceUploader("locked-evidence", s3_client=s3).upload_evidence(
+                image_path, result, case_id="CASE-1", inspector_id="INS-1"
+            )
+
+
+class TestBulkUploader:
+    """Test suite for resumable bulk folder uploads against moto"""
+    
+    @pytest.fixture
+    def s3(self, monkeypatch):
+        """Mocked S3 with an Object Lock bucket"""
+        moto = pytest.importorskip("moto")
+        import boto3
+        for name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"):
+            monkeypatch.setenv(name, "testing")
+        with moto.mock_aws():
+            client = boto3.client("s3", region_name="us-east-1")
+            client.create_bucket(Bucket="evidence", ObjectLockEnabledForBucket=True)
+            yield client
+    
+    @pytest.fixture
+    def folder(self, tmp_path):
+        """Three authentic images and one with a future timestamp"""
+        folder = tmp_path / "photos"
+        generate_corpus(folder, 4, resolutions=[(64, 48)], workers=1)
+        return folder
+    
+    def _bulk(self, s3, tmp_path, **kwargs):
+        return BulkUploader(
+            EvidenceUploader("evidence", s3_client=s3),
+            manifest_path=tmp_path / "manifest.jsonl",
+            sleep=lambda seconds: None,
+            **kwargs
+        )
+    
+    def _object_count(self, s3):
+        return s3.list_objects_v2(Bucket="evidence").get('KeyCount', 0)
+    
+    def test_upload_and_resume(self, s3, folder, tmp_path):
+        """A second run skips everything already in the manifest"""
+        outcomes = list(self._bulk(s3, tmp_path, workers=2).upload_folder(folder, "CASE-1", "INS-1"))
+        
+        assert [o.status for o in outcomes] == ['uploaded'] * 3 + ['rejected']
+        assert self._object_count(s3) == 6  # Image and report per upload
+        
+        manifest = UploadManifest(tmp_path / "manifest.jsonl")
+        assert manifest.get("CASE-1", outcomes[0].file_hash)['s3_url'] == outcomes[0].s3_url
+        
+        again = list(self._bulk(s3, tmp_path).upload_folder(folder, "CASE-1", "INS-1"))
+        
+        assert [o.status for o in again] == ['skipped'] * 3 + ['rejected']
+        assert self._object_count(s3) == 6
+    
+    def test_same_file_other_case_uploaded(self, s3, folder, tmp_path):
+        """The manifest is keyed by case as well as file hash"""
+        list(self._bulk(s3, tmp_path).upload_folder(folder, "CASE-1", "INS-1"))
+        outcomes = list(self._bulk(s3, tmp_path).upload_folder(folder, "CASE-2", "INS-1"))
+        
+        assert [o.status for o in outcomes][:3] == ['uploaded'] * 3
+    
+    def test_transient_errors_retried(self, s3, folder, tmp_path):
+        """Failed uploads are retried with backoff"""
+        delays = []
+        bulk = self._bulk(s3, tmp_path)
+        bulk.sleep = delays.append
+        
+        upload = bulk.uploader.upload_evidence
+        failures = iter([ConnectionError("link down")] * 2)
+        def flaky(**kwargs):
+            error = next(failures, None)
+            if error:
+                raise error
+            return upload(**kwargs)
+        bulk.uploader.upload_evidence = flaky
+        
+        outcome = next(bulk.upload_images([sorted(folder.iterdir())[0]], "CASE-1", "INS-1"))
+        
+        assert outcome.status == 'uploaded'
+        assert outcome.attempts == 3
+        assert len(delays) == 2
+        assert all(0 <= delay <= bulk.backoff_max for delay in delays)
+    
+    def test_exhausted_retries_not_recorded(self, s3, folder, tmp_path):
+        """Images that never upload fail and are retried on the next run"""
+        bulk = self._bulk(s3, tmp_path, max_attempts=2)
+        def down(**kwargs):
+            raise ConnectionError("link down")
+        bulk.uploader.upload_evidence = down
+        image = sorted(folder.iterdir())[0]
+        
+        outcome = next(bulk.upload_images([image], "CASE-1", "INS-1"))
+        
+        assert outcome.status == 'failed'
+        assert outcome.attempts == 2
+        assert next(self._bulk(s3, tmp_path).upload_images([image], "CASE-1", "INS-1")).status == 'uploaded'
+    
+    def test_retry_reuses_keys(self, s3, folder, tmp_path):
+        """A retry after a partial upload writes the same keys, leaving no orphans"""
+        bulk = self._bulk(s3, tmp_path)
+        upload = bulk.uploader.upload_evidence
+        timestamps = []
+        def partial(**kwargs):
+            timestamps.append(kwargs['timestamp'])
+            result = upload(**kwargs)
+            if len(timestamps) == 1:
+                raise ConnectionError("lost the response")
+            return result
+        bulk.uploader.upload_evidence = partial
+        
+        outcome = next(bulk.upload_images([sorted(folder.iterdir())[0]], "CASE-1", "INS-1"))
+        
+        assert outcome.attempts == 2
+        assert timestamps[0] == timestamps[1]
+        assert self._object_count(s3) == 2
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
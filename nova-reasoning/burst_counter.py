@@ -0,0 +1,182 @@
+"""
+Burst Counter - Sliding-window claim counts per key, in constant time.
+
+Each key (an inspector, a camera, a grid cell...) has a ring of time
+buckets holding the key's running total at the start of each bucket. The
+number of claims in the last N buckets is the current total minus the
+total at the start of the window: one subtraction, however busy the key.
+
+Counts have bucket granularity: a window of N buckets covers the current
+bucket and the N - 1 before it. Windows longer than the retention are cut
+to the retention.
+
+State can be saved as a JSON snapshot and reloaded, so counts survive
+restarts without replaying the claim history.
+"""
+
+import json
+import math
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+DEFAULT_BUCKET_SECONDS = 3600
+DEFAULT_BUCKETS = 48
+
+
+class _Ring:
+    """Running total of one key and its value at the start of each retained bucket."""
+
+    __slots__ = ('total', 'last', 'starts', 'last_case')
+
+    def __init__(self, buckets: int):
+        self.total = 0
+        self.last: Optional[int] = None  # Newest bucket with a recorded start
+        self.starts = array('q', bytes(8 * buckets))
+        self.last_case: Optional[str] = None
+
+
+class BurstCounter:
+    """
+    Claims per key in sliding time windows.
+
+    Example:
+        counter = BurstCounter()
+        counter.add('inspector:INS-123', time.time(), 'CASE-001')
+        counter.count('inspector:INS-123', hours=24)  # -> 1
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        bucket_seconds: int = DEFAULT_BUCKET_SECONDS,
+        buckets: int = DEFAULT_BUCKETS
+    ):
+        """
+        Create a counter, restoring the snapshot at path if there is one.
+
+        Args:
+            path: Snapshot file written by snapshot(); None keeps the counts
+                  in memory only
+            bucket_seconds: Width of a time bucket
+            buckets: Buckets retained per key (retention = buckets x width)
+        """
+        self.path = Path(path) if path is not None else None
+        self.bucket_seconds = bucket_seconds
+        self.buckets = buckets
+        self._rings: Dict[str, _Ring] = {}
+        self._lock = threading.Lock()
+        self.restored = False
+
+        if self.path is not None and self.path.exists():
+            self._restore(json.loads(self.path.read_text()))
+            self.restored = True
+
+    def __len__(self) -> int:
+        return len(self._rings)
+
+    def keys(self) -> List[str]:
+        """Every counted key."""
+        with self._lock:
+            return list(self._rings)
+
+    def add(self, key: str, timestamp: float, case_id: Optional[str] = None):
+        """
+        Count a claim.
+
+        Args:
+            key: Counted entity, e.g. 'inspector:INS-123'
+            timestamp: UNIX time of the claim
+            case_id: Case of the claim; consecutive claims of one case on
+                     the same key (e.g. several photos) count once
+        """
+        bucket = self._bucket(timestamp)
+        with self._lock:
+            ring = self._rings.get(key)
+            if ring is None:
+                ring = self._rings[key] = _Ring(self.buckets)
+            elif case_id is not None and case_id == ring.last_case:
+                return
+            ring.last_case = case_id
+
+            if ring.last is None or bucket > ring.last:
+                self._advance(ring, bucket)
+            elif bucket < ring.last:
+                # Late claim: it is not in windows that start after its bucket
+                first = max(bucket + 1, ring.last - self.buckets + 1)
+                for later in range(first, ring.last + 1):
+                    ring.starts[later % self.buckets] += 1
+            ring.total += 1
+
+    def count(self, key: str, hours: float = 24, now: Optional[float] = None) -> int:
+        """
+        Claims of a key in the last hours (bucket granularity).
+
+        Args:
+            key: Counted entity
+            hours: Window length
+            now: UNIX time the window ends at (default: now)
+        """
+        bucket = self._bucket(time.time() if now is None else now)
+        width = min(max(1, math.ceil(hours * 3600 / self.bucket_seconds)), self.buckets)
+        first = bucket - width + 1
+
+        with self._lock:
+            ring = self._rings.get(key)
+            if ring is None or ring.last is None or first > ring.last:
+                return 0
+            oldest = ring.last - self.buckets + 1
+            if bucket >= ring.last:
+                end = ring.total
+            elif bucket + 1 >= oldest:
+                # Window ends before the newest claims: total at its end
+                end = ring.starts[(bucket + 1) % self.buckets]
+            else:
+                return 0
+            return end - ring.starts[max(first, oldest) % self.buckets]
+
+    def snapshot(self):
+        """Write the counts to the snapshot file (atomically)."""
+        if self.path is None:
+            return
+        with self._lock:
+            state = {
+                'bucket_seconds': self.bucket_seconds,
+                'buckets': self.buckets,
+                'keys': {
+                    key: [ring.total, ring.last, ring.starts.tolist(), ring.last_case]
+                    for key, ring in self._rings.items()
+                }
+            }
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp = self.path.with_suffix('.tmp')
+        temp.write_text(json.dumps(state))
+        temp.replace(self.path)
+
+    def _bucket(self, timestamp: float) -> int:
+        return math.floor(timestamp / self.bucket_seconds)
+
+    def _advance(self, ring: _Ring, bucket: int):
+        """Record the running total as the start of the buckets up to bucket."""
+        first = bucket - self.buckets + 1 if ring.last is None else max(ring.last + 1, bucket - self.buckets + 1)
+        for newer in range(first, bucket + 1):
+            ring.starts[newer % self.buckets] = ring.total
+        ring.last = bucket
+
+    def _restore(self, state: Dict):
+        if state['bucket_seconds'] != self.bucket_seconds or state['buckets'] != self.buckets:
+            raise ValueError(
+                f"Snapshot {self.path} uses {state['buckets']} buckets of {state['bucket_seconds']}s, "
+                f"not {self.buckets} of {self.bucket_seconds}s"
+            )
+        for key, (total, last, starts, last_case) in state['keys'].items():
+            ring = _Ring(self.buckets)
+            ring.total = total
+            ring.last = last
+            ring.starts = array('q', starts)
+            ring.last_case = last_case
+            self._rings[key] = ring
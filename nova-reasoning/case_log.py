@@ -0,0 +1,72 @@
+"""
+Case Log - Append-only case ID table shared by the local indexes.
+
+Indexes store a compact case number per image; this file maps the numbers
+back to case IDs (one JSON string per line, line number = case number).
+"""
+
+import json
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+
+class CaseLog:
+    """Case IDs numbered in order of first appearance, persisted as JSONL."""
+
+    def __init__(self, path: Optional[Path]):
+        """
+        Args:
+            path: JSONL file; None keeps the table in memory only
+        """
+        self.path = Path(path) if path is not None else None
+        self.case_ids: List[str] = []
+        self._file = None
+        if self.path is None:
+            self._numbers = {}
+            return
+
+        if self.path.exists():
+            lines = self.path.read_text().split('\n')
+            # The last element is '' or a torn line from an interrupted insert
+            self.case_ids = json.loads('[' + ','.join(lines[:-1]) + ']')
+            with open(self.path, 'ab') as f:
+                f.truncate(sum(len(line.encode()) + 1 for line in lines[:-1]))
+        self._numbers = {case_id: number for number, case_id in enumerate(self.case_ids)}
+        self._file = open(self.path, 'a')
+
+    def numbers(self, case_ids: Iterable[str]) -> List[int]:
+        """
+        Case numbers of case_ids, registering new IDs.
+
+        New IDs are written before returning, so a persisted case number
+        always has its name.
+        """
+        numbers = []
+        new_ids = []
+        for case_id in case_ids:
+            number = self._numbers.get(case_id)
+            if number is None:
+                number = len(self.case_ids)
+                self._numbers[case_id] = number
+                self.case_ids.append(case_id)
+                new_ids.append(case_id)
+            numbers.append(number)
+
+        if new_ids and self._file is not None:
+            self._file.write(''.join(json.dumps(case_id) + '\n' for case_id in new_ids))
+            self._file.flush()
+        return numbers
+
+    def unique(self, numbers: Iterable[int]) -> List[str]:
+        """Case IDs of numbers, first occurrence order, without repeats."""
+        case_ids = []
+        seen = set()
+        for number in numbers:
+            if number not in seen:
+                seen.add(number)
+                case_ids.append(self.case_ids[number])
+        return case_ids
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
@@ -4,6 +4,8 @@ CLI for Nova Reasoning Layer.
 Commands:
 - analyze: Perform complete case analysis
 - fraud-check: Check for fraud indicators
+- fraud-backfill: Fraud check a batch of past claims
+- fraud-rescore: Re-score the metadata rules of many claims
 - ocr: Extract text from images
 - report: Generate PDF/JSON reports
 """
@@ -16,6 +18,7 @@ from rich.panel import Panel
 from typing import Optional
 from nova_analyzer import NovaAnalyzer
 from fraud_detector import FraudDetector
+from hash_store import SQLiteHashStore
 from report_generator import ReportGenerator
 
 console = Console()
@@ -77,8 +80,13 @@ def analyze(case_id: str, forensic_report: str, yolo_report: str, image: str, mo
 @click.option('--image', required=True, help='S3 URL of the image')
 @click.option('--forensic-report', required=True, help='Path or S3 URL to forensic report JSON')
 @click.option('--check-duplicates', is_flag=True, help='Check for duplicate images')
+@click.option('--hash-index', help='Local perceptual hash index directory for near-duplicate search')
+@click.option('--embedding-index', help='Local embedding index directory for cropped/re-shot photo search')
+@click.option('--geo-index', help='Local case location index directory for location patterns')
+@click.option('--history-db', help='SQLite fraud history database to use instead of DynamoDB')
+@click.option('--burst-snapshot', help='Snapshot file of the inspector/camera/location claim counters')
 @click.option('--output', help='Output file path for JSON report')
-def fraud_check(case_id: str, image: str, forensic_report: str, check_duplicates: bool, output: Optional[str]):
+def fraud_check(case_id: str, image: str, forensic_report: str, check_duplicates: bool, hash_index: Optional[str], embedding_index: Optional[str], geo_index: Optional[str], history_db: Optional[str], burst_snapshot: Optional[str], output: Optional[str]):
     """Check for fraud indicators."""
     
     console.print(f"\n[bold cyan]Fraud check for case: {case_id}[/bold cyan]\n")
@@ -88,14 +96,22 @@ def fraud_check(case_id: str, image: str, forensic_report: str, check_duplicates
         forensic_data = _load_json(forensic_report)
         
         # Initialize detector
-        detector = FraudDetector()
+        detector = FraudDetector(
+            hash_index_path=hash_index,
+            embedding_index_path=embedding_index,
+            geo_index_path=geo_index,
+            hash_store=SQLiteHashStore(history_db) if history_db else None,
+            burst_snapshot_path=burst_snapshot
+        )
         
         # Check fraud
         with console.status("[bold green]Analyzing for fraud..."):
             result = detector.check_image(
                 image_url=image,
-                metadata=forensic_data.get('metadata', {}),
-                case_id=case_id
+                # The forensic report carries camera, gps, timestamp and case_metadata at the top level
+                metadata=forensic_data.get('metadata', forensic_data),
+                case_id=case_id,
+                digests=forensic_data.get('digests')
             )
         
         # Display results
@@ -114,6 +130,79 @@ def fraud_check(case_id: str, image: str, forensic_report: str, check_duplicates
                 json.dump(result.dict(), f, indent=2)
             console.print(f"\n[green]✓[/green] Report saved to: {output}")
         
+        # Write the buffered hash records
+        detector.close()
+        
+    except Exception as e:
+        console.print(f"[red]✗ Error:[/red] {str(e)}")
+        raise click.Abort()
+
+
+@cli.command()
+@click.option('--cases', required=True, help='JSONL file, one {case_id, image_url, metadata, digests} per line')
+@click.option('--output', required=True, help='Output JSONL file with one fraud result per case')
+@click.option('--workers', default=8, show_default=True, help='Images downloaded and fingerprinted concurrently')
+@click.option('--hash-index', help='Local perceptual hash index directory for near-duplicate search')
+@click.option('--embedding-index', help='Local embedding index directory for cropped/re-shot photo search')
+@click.option('--geo-index', help='Local case location index directory for location patterns')
+@click.option('--history-db', help='SQLite fraud history database to use instead of DynamoDB')
+@click.option('--burst-snapshot', help='Snapshot file of the inspector/camera/location claim counters')
+def fraud_backfill(cases: str, output: str, workers: int, hash_index: Optional[str], embedding_index: Optional[str], geo_index: Optional[str], history_db: Optional[str], burst_snapshot: Optional[str]):
+    """Fraud check a batch of past claims."""
+    
+    console.print(f"\n[bold cyan]Fraud backfill: {cases}[/bold cyan]\n")
+    
+    try:
+        with open(cases) as f:
+            claims = [json.loads(line) for line in f if line.strip()]
+        
+        suspicious = 0
+        with FraudDetector(
+            hash_index_path=hash_index,
+            embedding_index_path=embedding_index,
+            geo_index_path=geo_index,
+            hash_store=SQLiteHashStore(history_db) if history_db else None,
+            burst_snapshot_path=burst_snapshot
+        ) as detector, open(output, 'w') as out:
+            with console.status(f"[bold green]Checking {len(claims)} claims..."):
+                for claim, result in zip(claims, detector.check_images(claims, workers=workers)):
+                    suspicious += result.is_suspicious
+                    out.write(json.dumps({'case_id': claim['case_id'], **result.dict()}) + '\n')
+        
+        console.print(f"[green]✓[/green] Checked {len(claims)} claims, {suspicious} suspicious")
+        console.print(f"[green]✓[/green] Results saved to: {output}")
+        
+    except Exception as e:
+        console.print(f"[red]✗ Error:[/red] {str(e)}")
+        raise click.Abort()
+
+
+@cli.command()
+@click.option('--cases', required=True, help='JSONL file, one {case_id, metadata, similar_cases, pattern_score} per line')
+@click.option('--output', required=True, help='Output JSONL file with one fraud result per case')
+def fraud_rescore(cases: str, output: str):
+    """Re-score the metadata rules of many claims (no images or history lookups)."""
+    
+    console.print(f"\n[bold cyan]Fraud re-score: {cases}[/bold cyan]\n")
+    
+    try:
+        with open(cases) as f:
+            claims = [json.loads(line) for line in f if line.strip()]
+        
+        suspicious = 0
+        with FraudDetector(hash_store=SQLiteHashStore(':memory:')) as detector, open(output, 'w') as out:
+            results = detector.score_batch(
+                [claim.get('metadata', {}) for claim in claims],
+                duplicates=[claim.get('similar_cases', []) for claim in claims],
+                pattern_scores=[claim.get('pattern_score', 0.0) for claim in claims]
+            )
+            for claim, result in zip(claims, results):
+                suspicious += result.is_suspicious
+                out.write(json.dumps({'case_id': claim['case_id'], **result.dict()}) + '\n')
+        
+        console.print(f"[green]✓[/green] Scored {len(claims)} claims, {suspicious} suspicious")
+        console.print(f"[green]✓[/green] Results saved to: {output}")
+        
     except Exception as e:
         console.print(f"[red]✗ Error:[/red] {str(e)}")
         raise click.Abort()
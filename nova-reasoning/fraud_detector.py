@@ -8,14 +8,55 @@ Detects:
 - Timestamp inconsistencies
 """
 
+import base64
 import boto3
 import numpy as np
-from typing import Dict, List, Optional, Tuple
+from botocore.exceptions import ClientError
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
 from datetime import datetime, timedelta
 from pydantic import BaseModel
 import hashlib
 import json
 
+from burst_counter import BurstCounter
+from geo_index import GeoIndex, cell_of
+from hamming_index import HammingIndex
+from hash_store import DynamoHashStore, HashStore
+from image_embedding import EMBEDDING_DIM, compute_embedding
+from ivf_index import IVFIndex
+from metadata_table import MetadataTable
+from perceptual_hash import HASH_BITS, PerceptualHashes, compute_hashes
+
+
+# Location pattern: other cases claimed within this radius and window
+PATTERN_RADIUS_M = 100
+PATTERN_WINDOW = timedelta(days=30)
+# Nearby cases at which the location pattern score saturates
+PATTERN_CASES_FOR_MAX_SCORE = 4
+
+# Bursts: other claims with the same inspector, camera device or grid cell in this window
+BURST_WINDOW_HOURS = 24
+# Fewest claims in the burst window at which each burst score saturates
+INSPECTOR_CLAIMS_FOR_MAX_SCORE = 20
+CAMERA_CLAIMS_FOR_MAX_SCORE = 20
+CELL_CLAIMS_FOR_MAX_SCORE = PATTERN_CASES_FOR_MAX_SCORE
+# Busier fleets saturate at a multiple of their normal volume instead: the
+# percentile of the window counts over the active keys of the same kind
+BURST_NORMAL_PERCENTILE = 95
+BURST_MULTIPLE_FOR_MAX_SCORE = 3
+# Active keys of a kind needed before their counts are taken as normal volume
+BURST_CALIBRATION_MIN_KEYS = 10
+
+
+def _plain_sha256(value: Optional[str]) -> Optional[str]:
+    """Lowercase hex of a SHA-256 given as hex or 'sha256:<hex>'."""
+    if not value:
+        return None
+    value = value.strip().lower()
+    return value[len('sha256:'):] if value.startswith('sha256:') else value
+
 
 class FraudResult(BaseModel):
     """Fraud detection result."""
@@ -26,6 +67,13 @@ class FraudResult(BaseModel):
     confidence: float
 
 
+class ImageFingerprint(NamedTuple):
+    """Everything a fraud check derives from the image bytes."""
+    hashes: PerceptualHashes
+    file_hash: str  # SHA-256 hex
+    embedding: Optional[np.ndarray]
+
+
 class FraudDetector:
     """
     Fraud detection using vector similarity and pattern analysis.
@@ -41,7 +89,13 @@ class FraudDetector:
         self,
         region: str = 'us-east-1',
         profile: Optional[str] = None,
-        similarity_threshold: float = 0.95
+        similarity_threshold: float = 0.95,
+        hash_index_path: Optional[str] = None,
+        embedding_index_path: Optional[str] = None,
+        embedding_top_k: int = 10,
+        geo_index_path: Optional[str] = None,
+        hash_store: Optional[HashStore] = None,
+        burst_snapshot_path: Optional[str] = None
     ):
         """
         Initialize fraud detector.
@@ -49,21 +103,58 @@ class FraudDetector:
         Args:
             region: AWS region
             profile: AWS profile name
-            similarity_threshold: Threshold for duplicate detection (0-1)
+            similarity_threshold: Similarity above which two images are
+                                  duplicates (0-1): share of matching perceptual
+                                  hash bits, and cosine similarity of embeddings
+            hash_index_path: Directory of a local Hamming index of pHashes;
+                             when set, near-duplicates are searched locally
+                             instead of with an exact DynamoDB query
+            embedding_index_path: Directory of a local embedding ANN index;
+                                  when set, cropped or re-shot photos are also
+                                  matched by color/texture descriptors
+            embedding_top_k: Most similar images considered per embedding query
+            geo_index_path: Directory of the local index of case coordinates
+                            used for location patterns (default: in memory,
+                            rebuilt from the recent fraud history on the
+                            first pattern check)
+            hash_store: Backend of the fraud history (default: the
+                        omni-inspector-fraud-detection DynamoDB table), e.g.
+                        a SQLiteHashStore for edge sites and offline runs
+            burst_snapshot_path: Snapshot file of the per inspector, camera and
+                                 grid cell claim counters, written on close
+                                 (default: counters rebuilt from the history
+                                 on the first pattern check)
         """
         session = boto3.Session(profile_name=profile) if profile else boto3.Session()
         self.s3 = session.client('s3', region_name=region)
         self.dynamodb = session.resource('dynamodb', region_name=region)
         self.similarity_threshold = similarity_threshold
         
-        # DynamoDB table for storing image hashes and vectors
+        # Fraud history: DynamoDB table for storing image hashes unless another backend is given
         self.table_name = 'omni-inspector-fraud-detection'
+        if hash_store is None:
+            hash_store = DynamoHashStore(self.dynamodb.Table(self.table_name))
+        self.hash_store = hash_store
+        
+        self.hash_index = HammingIndex(hash_index_path) if hash_index_path else None
+        self.embedding_index = (
+            IVFIndex(embedding_index_path, EMBEDDING_DIM) if embedding_index_path else None
+        )
+        self.embedding_top_k = embedding_top_k
+        self.geo_index = GeoIndex(geo_index_path)
+        self.bursts = BurstCounter(burst_snapshot_path)
+        self._burst_limits: Tuple[Optional[int], Dict[str, float]] = (None, {})
+        # Replayed from the history when first needed, so detectors that
+        # never check patterns (e.g. duplicate checks) make no history query
+        self._replay_locations = geo_index_path is None
+        self._replay_bursts = not self.bursts.restored
     
     def check_image(
         self,
         image_url: str,
         metadata: Dict,
-        case_id: str
+        case_id: str,
+        digests: Optional[Dict] = None
     ) -> FraudResult:
         """
         Comprehensive fraud check on an image.
@@ -72,17 +163,243 @@ class FraudDetector:
             image_url: S3 URL of image
             metadata: Forensic metadata from Phase 1
             case_id: Case identifier
+            digests: File digests from the Phase 1 report (reused as the file hash)
         
         Returns:
             FraudResult with fraud score and reasons
         """
+        fingerprint = self._fingerprint(image_url, digests)
+        return self._score(fingerprint, image_url, metadata, case_id)
+    
+    def check_images(
+        self,
+        cases: Iterable[Dict],
+        workers: int = 8,
+        use_mirror: bool = True
+    ) -> Iterator[FraudResult]:
+        """
+        Fraud check many images, e.g. a backfill of past claims.
+        
+        Downloading and fingerprinting run on a thread pool; lookups and
+        stores run in input order, so results are the same as calling
+        check_image once per case. Hash records are written in batches.
+        
+        Args:
+            cases: Dicts of check_image arguments (image_url, metadata,
+                   case_id and optionally digests)
+            workers: Images downloaded and fingerprinted concurrently
+            use_mirror: Copy the hash table into memory first, so lookups
+                        make no DynamoDB round trip
+        
+        Yields:
+            FraudResult per case, in input order
+        """
+        if use_mirror:
+            self.hash_store.load_mirror()
+        
+        max_in_flight = max(1, workers) * 2
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            in_flight = deque()
+            
+            def finish():
+                case, future = in_flight.popleft()
+                return self._score(future.result(), case['image_url'], case.get('metadata', {}), case['case_id'])
+            
+            for case in cases:
+                if len(in_flight) >= max_in_flight:
+                    yield finish()
+                in_flight.append((
+                    case,
+                    executor.submit(self._fingerprint, case['image_url'], case.get('digests'))
+                ))
+            while in_flight:
+                yield finish()
+        
+        self.hash_store.flush()
+    
+    def score_batch(
+        self,
+        metadatas: Union[Sequence[Dict], MetadataTable],
+        duplicates: Optional[Sequence[List[str]]] = None,
+        pattern_scores: Optional[Sequence[float]] = None,
+        now: Optional[datetime] = None
+    ) -> Iterator[FraudResult]:
+        """
+        Score many claims at once, e.g. a nightly re-score of every claim.
+        
+        The metadata is loaded into a MetadataTable (or given as one, e.g.
+        saved by an earlier run) and every rule runs as one vectorized
+        expression over all claims. Results equal check_image's for the same
+        metadata, duplicates and pattern scores; nothing is looked up or
+        stored, so without duplicates and pattern_scores those checks count
+        as clean.
+        
+        Args:
+            metadatas: Forensic metadata per claim, or their MetadataTable
+            duplicates: Similar case IDs per claim (e.g. from an earlier check)
+            pattern_scores: Pattern score per claim (0-1)
+            now: Time timestamps are validated against (default: now)
+        
+        Yields:
+            FraudResult per claim, in input order
+        """
+        table = metadatas if isinstance(metadatas, MetadataTable) else MetadataTable.from_metadata(metadatas)
+        count = len(table)
+        duplicates = duplicates if duplicates is not None else [[]] * count
+        patterns = np.zeros(count) if pattern_scores is None else np.asarray(pattern_scores, dtype=np.float64)
+        
+        # Same rules, weights and order of additions as _score
+        fraud_scores = np.zeros(count)
+        has_duplicates = np.array([bool(cases) for cases in duplicates], dtype=bool)
+        fraud_scores += np.where(has_duplicates, 0.8, 0.0)
+        
+        metadata_scores = table.manipulation_scores()
+        manipulated = metadata_scores > 0.5
+        fraud_scores += np.where(manipulated, metadata_scores * 0.5, 0.0)
+        
+        timestamps = table.timestamp_rules(now)
+        fraud_scores += np.where(timestamps.future | timestamps.too_old | timestamps.invalid, 0.3, 0.0)
+        
+        gps = table.gps_rules()
+        fraud_scores += np.where(gps.invalid_latitude | gps.invalid_longitude | gps.null_island, 0.2, 0.0)
+        
+        patterned = patterns > 0.5
+        fraud_scores += np.where(patterned, patterns * 0.3, 0.0)
+        
+        fraud_scores = np.minimum(fraud_scores, 1.0)
+        
+        # Findings per claim as a bitmask, in _score's reason order; reason
+        # lists are only built for claims with a finding
+        findings = [
+            has_duplicates, manipulated,
+            timestamps.future, timestamps.too_old, timestamps.invalid,
+            gps.invalid_latitude, gps.invalid_longitude, gps.null_island,
+            patterned
+        ]
+        codes = np.zeros(count, dtype=np.int64)
+        for bit, found in enumerate(findings):
+            codes |= found.astype(np.int64) << bit
+        
+        static_reasons = [
+            (1 << 2, "Timestamp is in the future"),
+            (1 << 3, "Timestamp is more than 1 year old"),
+            (1 << 4, "Invalid timestamp format"),
+            (1 << 5, "Invalid latitude"),
+            (1 << 6, "Invalid longitude"),
+            (1 << 7, "GPS coordinates at null island (suspicious)")
+        ]
+        clean = ["No fraud indicators detected"]
+        
+        for i, (score, code) in enumerate(zip(fraud_scores.tolist(), codes.tolist())):
+            if code:
+                reasons = []
+                if code & 1:
+                    reasons.append(f"Image matches {len(duplicates[i])} previous cases (recycled photo)")
+                if code & 2:
+                    reasons.append(f"Metadata manipulation detected (score: {float(metadata_scores[i]):.2f})")
+                reasons.extend(reason for bit, reason in static_reasons if code & bit)
+                if code & 1 << 8:
+                    reasons.append(f"Suspicious pattern detected (score: {float(patterns[i]):.2f})")
+            else:
+                # FraudResult copies its lists, so the default can be shared
+                reasons = clean
+            
+            yield FraudResult(
+                is_suspicious=score > 0.5,
+                fraud_score=score,
+                reasons=reasons,
+                similar_cases=duplicates[i],
+                confidence=0.85 if score > 0.7 else 0.6
+            )
+    
+    def close(self):
+        """Write buffered hash records and close the local indexes."""
+        self.hash_store.close()
+        if not self._replay_bursts:
+            # Counters never rebuilt from the history would snapshot as complete
+            self.bursts.snapshot()
+        for index in (self.hash_index, self.embedding_index, self.geo_index):
+            if index is not None:
+                index.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+    
+    def _fingerprint(self, image_url: str, digests: Optional[Dict] = None) -> ImageFingerprint:
+        """
+        Compute the hashes and embedding of an image.
+        
+        The file hash comes from the Phase 1 digests or the object's stored
+        checksum. When the fraud history already holds that exact file, its
+        perceptual hashes are reused and the image is not downloaded. With an
+        embedding index the image is always downloaded, so the object is not
+        looked up first.
+        """
+        if self.embedding_index is None:
+            file_hash = self._known_file_hash(image_url, digests)
+            hashes = self._stored_hashes(file_hash) if file_hash is not None else None
+            if hashes is not None:
+                return ImageFingerprint(hashes, file_hash, None)
+        else:
+            file_hash = _plain_sha256(digests.get('sha256') if digests else None)
+        
+        image_data = self._download_image(image_url)
+        hashes, file_hash = self._calculate_perceptual_hash(image_data, {'sha256': file_hash})
+        return ImageFingerprint(hashes, file_hash, self._calculate_embedding(image_data))
+    
+    def _known_file_hash(self, image_url: str, digests: Optional[Dict] = None) -> Optional[str]:
+        """
+        SHA-256 of an image without downloading it, if known.
+        
+        Sources: the Phase 1 digests, the S3 SHA-256 checksum of a single-part
+        upload, or the file-hash metadata written by EvidenceUploader. Always
+        plain lowercase hex, the form stored in the fraud history.
+        """
+        if digests and digests.get('sha256'):
+            return _plain_sha256(digests['sha256'])
+        
+        bucket, key = self._split_s3_url(image_url)
+        try:
+            head = self.s3.head_object(Bucket=bucket, Key=key, ChecksumMode='ENABLED')
+        except ClientError:
+            return None
+        
+        checksum = head.get('ChecksumSHA256')
+        # Multipart checksums ("...-N") cover the parts, not the file
+        if checksum and '-' not in checksum and head.get('ChecksumType', 'FULL_OBJECT') == 'FULL_OBJECT':
+            return base64.b64decode(checksum).hex()
+        # EvidenceUploader writes 'sha256:<hex>'
+        return _plain_sha256(head.get('Metadata', {}).get('file-hash'))
+    
+    def _stored_hashes(self, file_hash: str) -> Optional[PerceptualHashes]:
+        """Perceptual hashes recorded for the same file, if any."""
+        for item in self.hash_store.find_file(file_hash):
+            if item.get('dhash') is not None:
+                return PerceptualHashes(
+                    phash=int(item['phash']),
+                    dhash=int(item['dhash']),
+                    ahash=int(item['ahash'])
+                )
+        return None
+    
+    def _score(
+        self,
+        fingerprint: ImageFingerprint,
+        image_url: str,
+        metadata: Dict,
+        case_id: str
+    ) -> FraudResult:
+        """Run every check on a fingerprinted image and store it."""
         reasons = []
         fraud_score = 0.0
         similar_cases = []
+        hashes, file_hash, embedding = fingerprint
         
-        # 1. Check for duplicate images (perceptual hash)
-        image_hash = self._calculate_perceptual_hash(image_url)
-        duplicates = self._find_duplicates(image_hash)
+        # 1. Check for duplicate images (perceptual hash, embedding)
+        duplicates = self._find_duplicates(hashes, embedding=embedding, file_hash=file_hash)
         
         if duplicates:
             reasons.append(f"Image matches {len(duplicates)} previous cases (recycled photo)")
@@ -117,7 +434,7 @@ class FraudDetector:
         fraud_score = min(fraud_score, 1.0)
         
         # Store image hash for future comparisons
-        self._store_image_hash(image_hash, case_id, image_url)
+        self._store_image_hash(hashes, case_id, image_url, file_hash, embedding, metadata)
         
         return FraudResult(
             is_suspicious=fraud_score > 0.5,
@@ -127,43 +444,108 @@ class FraudDetector:
             confidence=0.85 if fraud_score > 0.7 else 0.6
         )
     
-    def _calculate_perceptual_hash(self, image_url: str) -> str:
+    def _download_image(self, image_url: str) -> bytes:
+        """Download an image from S3."""
+        bucket, key = self._split_s3_url(image_url)
+        response = self.s3.get_object(Bucket=bucket, Key=key)
+        return response['Body'].read()
+    
+    def _split_s3_url(self, image_url: str) -> Tuple[str, str]:
+        """(bucket, key) of an s3:// URL."""
+        parts = image_url.replace('s3://', '').split('/', 1)
+        return parts[0], parts[1] if len(parts) > 1 else ''
+    
+    def _calculate_perceptual_hash(
+        self,
+        image_data: bytes,
+        digests: Optional[Dict] = None
+    ) -> Tuple[PerceptualHashes, str]:
         """
-        Calculate perceptual hash (pHash) for image similarity.
+        Calculate perceptual hashes (pHash, dHash, aHash) for image similarity.
+        
+        Perceptual hashes are resistant to minor modifications (resize,
+        compression, etc.) but will match similar images.
         
-        pHash is resistant to minor modifications (resize, compression, etc.)
-        but will match similar images.
+        Returns:
+            (perceptual hashes, SHA-256 of the file)
         """
-        # Download image
-        parts = image_url.replace('s3://', '').split('/', 1)
-        bucket = parts[0]
-        key = parts[1] if len(parts) > 1 else ''
+        # Phase 1 already hashed the file; reuse it when available
+        if digests and digests.get('sha256'):
+            file_hash = _plain_sha256(digests['sha256'])
+        else:
+            file_hash = hashlib.sha256(image_data).hexdigest()
         
-        response = self.s3.get_object(Bucket=bucket, Key=key)
-        image_data = response['Body'].read()
+        return compute_hashes(image_data), file_hash
+    
+    def _calculate_embedding(self, image_data: bytes) -> Optional[np.ndarray]:
+        """
+        Calculate the color/texture embedding, if an embedding index is used.
         
-        # Calculate SHA-256 hash (simple version)
-        # In production, use actual perceptual hashing (imagehash library)
-        return hashlib.sha256(image_data).hexdigest()
+        Unlike perceptual hashes, the descriptors survive cropping and small
+        changes of viewpoint.
+        """
+        if self.embedding_index is None:
+            return None
+        return compute_embedding(image_data)
     
-    def _find_duplicates(self, image_hash: str) -> List[str]:
+    def _find_duplicates(
+        self,
+        hashes: PerceptualHashes,
+        threshold: Optional[float] = None,
+        embedding: Optional[np.ndarray] = None,
+        file_hash: Optional[str] = None
+    ) -> List[str]:
         """
         Find duplicate images in database.
         
+        Perceptual hash matches come first; with the file's SHA-256, exact
+        copies recorded before perceptual hashing follow; with an embedding,
+        the top-k images at or above threshold cosine similarity are added.
+        
         Returns list of case IDs with similar images.
         """
-        try:
-            table = self.dynamodb.Table(self.table_name)
-            response = table.query(
-                IndexName='ImageHashIndex',
-                KeyConditionExpression='image_hash = :hash',
-                ExpressionAttributeValues={':hash': image_hash}
-            )
-            
-            return [item['case_id'] for item in response.get('Items', [])]
-        except Exception:
-            # Table might not exist yet
-            return []
+        threshold = self.similarity_threshold if threshold is None else threshold
+        duplicates = self._find_hash_duplicates(hashes, threshold)
+        
+        if file_hash is not None:
+            # Legacy records hold only the file's SHA-256 in image_hash
+            duplicates += [
+                item['case_id'] for item in self.hash_store.find_file(file_hash)
+                if item.get('phash') is None and item['case_id'] not in duplicates
+            ]
+        
+        if embedding is not None and self.embedding_index is not None:
+            matches = self.embedding_index.query(embedding, self.embedding_top_k, threshold)
+            duplicates += [case for case, _ in matches if case not in duplicates]
+        
+        return duplicates
+    
+    def _find_hash_duplicates(self, hashes: PerceptualHashes, threshold: float) -> List[str]:
+        """
+        Case IDs with a perceptual hash at least threshold similar.
+        
+        With a local hash index, every pHash within the threshold's bit
+        distance matches. Otherwise DynamoDB candidates share the pHash
+        exactly and are confirmed when all three hashes together are at
+        least threshold similar.
+        """
+        if self.hash_index is not None:
+            max_distance = int(round((1.0 - threshold) * HASH_BITS, 6))
+            return self.hash_index.query(hashes.phash, max_distance)
+        
+        duplicates = []
+        for item in self.hash_store.find(hashes.hex()):
+            if item.get('dhash') is not None:
+                stored = PerceptualHashes(
+                    phash=int(item['phash']),
+                    dhash=int(item['dhash']),
+                    ahash=int(item['ahash'])
+                )
+                if hashes.similarity(stored) < threshold:
+                    continue
+            duplicates.append(item['case_id'])
+        
+        return duplicates
     
     def _check_metadata_manipulation(self, metadata: Dict) -> float:
         """
@@ -251,38 +633,186 @@ class FraudDetector:
         
         Detects:
         - Multiple claims from same GPS location
-        - Same camera used in multiple claims
+        - Same camera device used in multiple claims
         - Temporal patterns (many claims in short time)
         
         Returns pattern score (0-1).
         """
+        self._load_recent_history()
         score = 0.0
         
-        # This would query DynamoDB for similar cases
-        # For now, return 0 (no pattern detected)
-        
-        # TODO: Implement pattern analysis
-        # - Query cases with similar GPS (within 100m)
-        # - Query cases with same camera make/model
-        # - Query cases from same inspector in last 24h
+        # Other cases claimed within 100m in the pattern window
+        coordinates = self._gps_coordinates(metadata)
+        if coordinates is not None:
+            since = (datetime.now() - PATTERN_WINDOW).timestamp()
+            nearby = [
+                other for other, _ in self.geo_index.query(*coordinates, PATTERN_RADIUS_M, since=since)
+                if other != case_id
+            ]
+            score = max(score, min(len(nearby) / PATTERN_CASES_FOR_MAX_SCORE, 1.0))
+        
+        # Bursts of claims by the same inspector, camera device or grid cell
+        keys = self._burst_keys(metadata)
+        if keys:
+            now = datetime.now().timestamp()
+            saturation = self._burst_saturation(now)
+            for key in keys:
+                claims = self.bursts.count(key, BURST_WINDOW_HOURS, now)
+                score = max(score, min(claims / saturation[key.split(':', 1)[0]], 1.0))
         
         return score
     
-    def _store_image_hash(self, image_hash: str, case_id: str, image_url: str):
-        """Store image hash in DynamoDB for future comparisons."""
-        try:
-            table = self.dynamodb.Table(self.table_name)
-            table.put_item(
-                Item={
-                    'case_id': case_id,
-                    'image_hash': image_hash,
-                    'image_url': image_url,
-                    'timestamp': datetime.now().isoformat()
-                }
+    def _burst_saturation(self, now: float) -> Dict[str, float]:
+        """
+        Claims in the burst window at which each kind of burst saturates.
+        
+        At least the *_CLAIMS_FOR_MAX_SCORE minimum, raised to
+        BURST_MULTIPLE_FOR_MAX_SCORE times the normal volume of the kind once
+        enough keys are active. Recalibrated once per counter bucket.
+        """
+        bucket = int(now // self.bursts.bucket_seconds)
+        calibrated, saturation = self._burst_limits
+        if calibrated == bucket:
+            return saturation
+        
+        counts = {'inspector': [], 'camera': [], 'cell': []}
+        for key in self.bursts.keys():
+            claims = self.bursts.count(key, BURST_WINDOW_HOURS, now)
+            if claims:
+                counts[key.split(':', 1)[0]].append(claims)
+        
+        minimum = {
+            'inspector': INSPECTOR_CLAIMS_FOR_MAX_SCORE,
+            'camera': CAMERA_CLAIMS_FOR_MAX_SCORE,
+            'cell': CELL_CLAIMS_FOR_MAX_SCORE
+        }
+        saturation = {}
+        for kind, claims in counts.items():
+            normal = (
+                float(np.percentile(claims, BURST_NORMAL_PERCENTILE))
+                if len(claims) >= BURST_CALIBRATION_MIN_KEYS else 0.0
             )
-        except Exception:
-            # Table might not exist yet, skip
-            pass
+            saturation[kind] = max(minimum[kind], BURST_MULTIPLE_FOR_MAX_SCORE * normal)
+        
+        self._burst_limits = (bucket, saturation)
+        return saturation
+    
+    def _gps_coordinates(self, metadata: Dict) -> Optional[Tuple[float, float]]:
+        """(latitude, longitude) worth indexing, or None when missing or invalid."""
+        gps = metadata.get('gps') or {}
+        lat = gps.get('latitude')
+        lon = gps.get('longitude')
+        
+        if lat is None or lon is None:
+            return None
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            return None
+        # Null island is a missing fix, not a place
+        if abs(lat) < 0.1 and abs(lon) < 0.1:
+            return None
+        return float(lat), float(lon)
+    
+    def _camera(self, metadata: Dict) -> Optional[str]:
+        """Camera make and model as one string, or None without EXIF."""
+        camera = metadata.get('camera') or {}
+        name = ' '.join(part.strip() for part in (camera.get('make'), camera.get('model')) if part and part.strip())
+        return name or None
+    
+    def _camera_serial(self, metadata: Dict) -> Optional[str]:
+        """Body serial number of the camera, or None when the EXIF has none."""
+        serial = (metadata.get('camera') or {}).get('serial') or ''
+        return serial.strip() or None
+    
+    def _inspector_id(self, metadata: Dict) -> Optional[str]:
+        """Inspector of a claim (top level, or case_metadata of a forensic report)."""
+        return metadata.get('inspector_id') or (metadata.get('case_metadata') or {}).get('inspector_id')
+    
+    def _burst_keys(self, metadata: Dict) -> List[str]:
+        """
+        Burst counter keys of a claim: inspector, camera device and grid
+        cell, when known.
+        
+        Cameras are told apart by body serial; make and model alone are
+        shared by a whole fleet, so claims without a serial have no camera key.
+        """
+        keys = []
+        inspector_id = self._inspector_id(metadata)
+        if inspector_id:
+            keys.append(f"inspector:{inspector_id}")
+        serial = self._camera_serial(metadata)
+        if serial:
+            keys.append(f"camera:{(self._camera(metadata) or '').lower()}:{serial}")
+        coordinates = self._gps_coordinates(metadata)
+        if coordinates is not None:
+            keys.append("cell:{}:{}".format(*cell_of(*coordinates)))
+        return keys
+    
+    def _load_recent_history(self):
+        """
+        Replay the recent fraud history into the in-memory geo index and
+        the burst counters (history records carry no inspector), once.
+        
+        Skipped for a persisted geo index and restored counters.
+        """
+        locations, bursts = self._replay_locations, self._replay_bursts
+        if not (locations or bursts):
+            return
+        self._replay_locations = self._replay_bursts = False
+        since = datetime.now() - PATTERN_WINDOW
+        for record in self.hash_store.recent(since.isoformat()):
+            timestamp = datetime.fromisoformat(record['timestamp']).timestamp()
+            latitude, longitude = record.get('latitude'), record.get('longitude')
+            gps = {} if latitude is None or longitude is None else {
+                'latitude': float(latitude), 'longitude': float(longitude)
+            }
+            
+            if locations and gps:
+                self.geo_index.add(gps['latitude'], gps['longitude'], record['case_id'], timestamp)
+            if bursts:
+                camera = {'model': record.get('camera'), 'serial': record.get('camera_serial')}
+                for key in self._burst_keys({'gps': gps, 'camera': camera}):
+                    self.bursts.add(key, timestamp, record['case_id'])
+    
+    def _store_image_hash(
+        self,
+        hashes: PerceptualHashes,
+        case_id: str,
+        image_url: str,
+        file_hash: str,
+        embedding: Optional[np.ndarray] = None,
+        metadata: Optional[Dict] = None
+    ):
+        """Store image hashes in the fraud history (and the local indexes) for future comparisons."""
+        # Replay first, or the history would count this record twice
+        self._load_recent_history()
+        now = datetime.now()
+        coordinates = self._gps_coordinates(metadata or {})
+        if coordinates is not None:
+            self.geo_index.add(*coordinates, case_id, now.timestamp())
+        for key in self._burst_keys(metadata or {}):
+            self.bursts.add(key, now.timestamp(), case_id)
+        if self.hash_index is not None:
+            self.hash_index.add(hashes.phash, case_id)
+        if embedding is not None and self.embedding_index is not None:
+            self.embedding_index.add(embedding, case_id)
+        
+        # The DynamoDB backend buffers records and writes them in batches
+        latitude, longitude = coordinates if coordinates is not None else (None, None)
+        self.hash_store.put({
+            'case_id': case_id,
+            'image_hash': file_hash,
+            'perceptual_hash': hashes.hex(),
+            'phash': hashes.phash,
+            'dhash': hashes.dhash,
+            'ahash': hashes.ahash,
+            'file_hash': file_hash,
+            'image_url': image_url,
+            'timestamp': now.isoformat(),
+            'camera': self._camera(metadata or {}),
+            'camera_serial': self._camera_serial(metadata or {}),
+            'latitude': latitude,
+            'longitude': longitude
+        })
     
     def check_duplicate(
         self,
@@ -299,7 +829,7 @@ class FraudDetector:
         Returns:
             (is_duplicate, list_of_similar_case_ids)
         """
-        image_hash = self._calculate_perceptual_hash(image_url)
-        duplicates = self._find_duplicates(image_hash)
+        hashes, file_hash, embedding = self._fingerprint(image_url)
+        duplicates = self._find_duplicates(hashes, threshold, embedding, file_hash)
         
         return len(duplicates) > 0, duplicates
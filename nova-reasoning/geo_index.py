@@ -0,0 +1,190 @@
+"""
+Geo Index - Radius and time-window queries over case coordinates.
+
+Points are bucketed in a fixed lat/lon grid of CELL_DEGREES cells; a
+radius query visits only the cells overlapping the radius and refines the
+candidates with the haversine distance. Each cell keeps its points in time
+order, so a time window is two binary searches per cell.
+
+Files in the index directory (optional; without one the index lives in
+memory only):
+- points.bin: latitude, longitude, UNIX time and case number per point
+- case_ids.jsonl: case ID of each case number
+"""
+
+import bisect
+import math
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from case_log import CaseLog
+
+
+CELL_DEGREES = 0.001  # ~111 m of latitude
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180
+
+_POINT = np.dtype([('lat', '<f8'), ('lon', '<f8'), ('time', '<f8'), ('case', '<u4')])
+_LON_CELLS = round(360 / CELL_DEGREES)
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in meters (vectorized over numpy arrays)."""
+    lat1, lon1, lat2, lon2 = (np.radians(value) for value in (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def cell_of(lat: float, lon: float) -> Tuple[int, int]:
+    """Grid cell containing a coordinate."""
+    return math.floor(lat / CELL_DEGREES), math.floor(lon / CELL_DEGREES) % _LON_CELLS
+
+
+class GeoIndex:
+    """
+    Coordinates of stored cases, queried by radius and time window.
+
+    Example:
+        index = GeoIndex('geo_index')
+        index.add(40.7128, -74.0060, 'CASE-001', time.time())
+        index.query(40.7130, -74.0061, radius_m=100)  # -> [('CASE-001', 23.1)]
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        """
+        Open or create an index.
+
+        Args:
+            directory: Index directory (created if missing); None keeps the
+                       index in memory only
+        """
+        self._lock = threading.Lock()
+        self._points: List[Tuple[float, float, float, int]] = []
+        # Cell -> (times, point numbers), both in time order
+        self._cells: Dict[Tuple[int, int], Tuple[List[float], List[int]]] = {}
+        self._file = None
+
+        if directory is None:
+            self.cases = CaseLog(None)
+            return
+
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.cases = CaseLog(self.directory / 'case_ids.jsonl')
+
+        path = self.directory / 'points.bin'
+        if path.exists():
+            count = path.stat().st_size // _POINT.itemsize
+            with open(path, 'ab') as f:
+                f.truncate(count * _POINT.itemsize)  # Torn final record
+            for lat, lon, timestamp, case in np.fromfile(path, dtype=_POINT).tolist():
+                self._insert(lat, lon, timestamp, case)
+        self._file = open(path, 'ab')
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def add(self, lat: float, lon: float, case_id: str, timestamp: float):
+        """
+        Insert a point; it is on disk when this returns.
+
+        Args:
+            lat, lon: Coordinates in degrees
+            case_id: Case the point belongs to
+            timestamp: UNIX time of the claim
+        """
+        with self._lock:
+            case = self.cases.numbers([case_id])[0]
+            if self._file is not None:
+                self._file.write(np.array([(lat, lon, timestamp, case)], dtype=_POINT).tobytes())
+                self._file.flush()
+            self._insert(lat, lon, timestamp, case)
+
+    def query(
+        self,
+        lat: float,
+        lon: float,
+        radius_m: float,
+        since: Optional[float] = None,
+        until: Optional[float] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Cases with a point within radius_m of a coordinate.
+
+        Args:
+            lat, lon: Center in degrees
+            radius_m: Radius in meters
+            since, until: Optional UNIX time window (inclusive)
+
+        Returns:
+            (case ID, distance in meters) per case, nearest first
+        """
+        since = -math.inf if since is None else since
+        until = math.inf if until is None else until
+
+        with self._lock:
+            candidates = []
+            for cell in self._cells_within(lat, lon, radius_m):
+                entry = self._cells.get(cell)
+                if entry is None:
+                    continue
+                times, numbers = entry
+                start = bisect.bisect_left(times, since)
+                end = bisect.bisect_right(times, until)
+                candidates.extend(numbers[start:end])
+            points = [self._points[number] for number in candidates]
+
+        if not points:
+            return []
+
+        points = np.array(points)
+        distances = haversine_m(lat, lon, points[:, 0], points[:, 1])
+        order = np.argsort(distances, kind='stable')
+        order = order[distances[order] <= radius_m]
+
+        nearest = {}
+        for i in order.tolist():
+            nearest.setdefault(int(points[i, 3]), float(distances[i]))
+        return [(self.cases.case_ids[case], distance) for case, distance in nearest.items()]
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self.cases.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _insert(self, lat: float, lon: float, timestamp: float, case: int):
+        number = len(self._points)
+        self._points.append((lat, lon, timestamp, case))
+        times, numbers = self._cells.setdefault(cell_of(lat, lon), ([], []))
+        at = bisect.bisect_right(times, timestamp)
+        times.insert(at, timestamp)
+        numbers.insert(at, number)
+
+    def _cells_within(self, lat: float, lon: float, radius_m: float):
+        """Grid cells overlapping the bounding box of a radius."""
+        lat_span = radius_m / METERS_PER_DEGREE
+        # Longitude degrees shrink with latitude; widen the box to match
+        widest = min(math.cos(math.radians(min(abs(lat) + lat_span, 90.0))), 1.0)
+        lon_span = 180.0 if widest < 1e-6 else min(lat_span / widest, 180.0)
+
+        first_row, first_column = cell_of(lat - lat_span, lon - lon_span)
+        last_row = math.floor((lat + lat_span) / CELL_DEGREES)
+        columns = min(math.ceil(2 * lon_span / CELL_DEGREES) + 1, _LON_CELLS)
+
+        for row in range(first_row, last_row + 1):
+            for offset in range(columns):
+                yield row, (first_column + offset) % _LON_CELLS
@@ -0,0 +1,291 @@
+"""
+Hamming Index - Local near-duplicate search over 64-bit perceptual hashes.
+
+Hashes live in a memory-mapped file that grows by appending, so inserts
+are persisted as they happen and a 10M-image history costs 80 MB of page
+cache rather than heap. Radius queries use multi-index hashing: the hash
+is split into bands, and any hash within distance k < BANDS of the query
+matches it exactly in at least one band (pigeonhole), so only the few
+hashes sharing a band value are compared. Larger radii fall back to a
+vectorized popcount scan.
+
+Files in the index directory:
+- hashes.u64: one uint64 per image
+- cases.u32: case number of each image
+- case_ids.jsonl: case ID of each case number
+- bands.json, band*.npy: band tables saved by close(), so opening does
+  not re-sort the history; records added since are re-indexed on open
+
+One writer per index directory; readers opening it later see every
+completed insert.
+"""
+
+import json
+import threading
+from pathlib import Path
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+from case_log import CaseLog
+
+
+BANDS = 4
+BAND_BITS = 64 // BANDS
+_BAND_MASK = np.uint64((1 << BAND_BITS) - 1)
+
+# Inserts kept in a linearly scanned tail before being merged into the band tables
+MERGE_THRESHOLD = 4096
+
+# Hashes compared per step of a full scan; bounds temporary memory
+SCAN_CHUNK = 1 << 20
+
+
+if hasattr(np, 'bitwise_count'):
+    def popcount(values: np.ndarray) -> np.ndarray:
+        """Set bits of each uint64."""
+        return np.bitwise_count(values)
+else:
+    _BYTE_BITS = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def popcount(values: np.ndarray) -> np.ndarray:
+        """Set bits of each uint64 (byte lookup table for numpy < 2.0)."""
+        values = np.ascontiguousarray(values, dtype=np.uint64)
+        return _BYTE_BITS[values.view(np.uint8)].reshape(*values.shape, 8).sum(axis=-1, dtype=np.uint8)
+
+
+def _band(values: np.ndarray, band: int) -> np.ndarray:
+    return ((values >> np.uint64(band * BAND_BITS)) & _BAND_MASK).astype(np.uint16)
+
+
+class HammingIndex:
+    """
+    Persistent radius search over 64-bit hashes, labeled by case ID.
+
+    Example:
+        index = HammingIndex('fraud_index')
+        index.add(hashes.phash, 'CASE-001')
+        index.query(other.phash, max_distance=3)  # -> ['CASE-001']
+    """
+
+    def __init__(self, directory: str):
+        """
+        Open or create an index.
+
+        Args:
+            directory: Index directory (created if missing)
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._hash_path = self.directory / 'hashes.u64'
+        self._case_path = self.directory / 'cases.u32'
+        self._lock = threading.Lock()
+        self.cases = CaseLog(self.directory / 'case_ids.jsonl')
+
+        # Drop a torn trailing record so both files stay aligned
+        count = min(
+            self._hash_path.stat().st_size // 8 if self._hash_path.exists() else 0,
+            self._case_path.stat().st_size // 4 if self._case_path.exists() else 0
+        )
+        for path, width in ((self._hash_path, 8), (self._case_path, 4)):
+            with open(path, 'ab') as f:
+                f.truncate(count * width)
+
+        self._hash_file = open(self._hash_path, 'ab')
+        self._case_file = open(self._case_path, 'ab')
+
+        self._tail_hashes: List[int] = []
+        self._tail_cases: List[int] = []
+        self._bands_saved = False  # Saved band tables match the in-memory ones
+        indexed = self._load_bands(count)
+        self._map(indexed)
+        if indexed < count:
+            # Records appended after the band tables were saved
+            hashes = np.memmap(self._hash_path, dtype='<u8', mode='r', shape=(count,))
+            cases = np.memmap(self._case_path, dtype='<u4', mode='r', shape=(count,))
+            self._tail_hashes = hashes[indexed:].tolist()
+            self._tail_cases = cases[indexed:].tolist()
+            if len(self._tail_hashes) >= MERGE_THRESHOLD:
+                self._merge_tail()
+
+    def __len__(self) -> int:
+        return len(self._hashes) + len(self._tail_hashes)
+
+    def add(self, value: int, case_id: str):
+        """Insert one hash; it is on disk when this returns."""
+        self.add_many([value], [case_id])
+
+    def add_many(self, values: Iterable[int], case_ids: Iterable[str]):
+        """Insert several hashes with one write per file."""
+        values = [int(value) for value in values]
+
+        with self._lock:
+            numbers = self.cases.numbers(case_ids)
+            self._hash_file.write(np.array(values, dtype='<u8').tobytes())
+            self._hash_file.flush()
+            self._case_file.write(np.array(numbers, dtype='<u4').tobytes())
+            self._case_file.flush()
+
+            self._tail_hashes.extend(values)
+            self._tail_cases.extend(numbers)
+            if len(self._tail_hashes) >= MERGE_THRESHOLD:
+                self._merge_tail()
+
+    def search(self, value: int, max_distance: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find every hash within max_distance bits of value.
+
+        Returns:
+            (positions, distances) arrays, nearest first
+        """
+        query = np.uint64(value)
+        with self._lock:
+            hashes = self._hashes
+            band_values = self._band_values
+            band_positions = self._band_positions
+            tail = np.array(self._tail_hashes, dtype=np.uint64)
+
+        if max_distance < BANDS:
+            candidates = np.unique(np.concatenate([
+                positions[np.searchsorted(values, key, 'left'):np.searchsorted(values, key, 'right')]
+                for values, positions, key in zip(
+                    band_values, band_positions, (_band(query, band) for band in range(BANDS))
+                )
+            ]))
+            distances = popcount(hashes[candidates] ^ query)
+            keep = distances <= max_distance
+            positions, distances = candidates[keep].astype(np.int64), distances[keep]
+        else:
+            found_positions, found_distances = [], []
+            for start in range(0, len(hashes), SCAN_CHUNK):
+                distances = popcount(hashes[start:start + SCAN_CHUNK] ^ query)
+                matches = np.flatnonzero(distances <= max_distance)
+                found_positions.append(matches + start)
+                found_distances.append(distances[matches])
+            positions = np.concatenate(found_positions or [np.empty(0, np.int64)])
+            distances = np.concatenate(found_distances or [np.empty(0, np.uint8)])
+
+        # Recent inserts not yet merged into the band tables
+        tail_distances = popcount(tail ^ query)
+        tail_matches = np.flatnonzero(tail_distances <= max_distance)
+        positions = np.concatenate([positions, tail_matches + len(hashes)])
+        distances = np.concatenate([distances, tail_distances[tail_matches]])
+
+        order = np.argsort(distances, kind='stable')
+        return positions[order], distances[order]
+
+    def query(self, value: int, max_distance: int) -> List[str]:
+        """Case IDs with a hash within max_distance bits, nearest first."""
+        positions, _ = self.search(value, max_distance)
+        return self.cases.unique(self._case_numbers_at(positions))
+
+    def close(self):
+        """Save the band tables (unless unchanged) and close the files."""
+        with self._lock:
+            if self._tail_hashes:
+                self._merge_tail()
+            if not self._bands_saved:
+                self._save_bands()
+            self._hash_file.close()
+            self._case_file.close()
+            self.cases.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _case_numbers_at(self, positions: np.ndarray) -> List[int]:
+        mapped = len(self._cases)
+        return [
+            int(self._cases[p]) if p < mapped else self._tail_cases[p - mapped]
+            for p in positions
+        ]
+
+    def _map(self, count: int):
+        """Memory-map the first count records."""
+        if count:
+            self._hashes = np.memmap(self._hash_path, dtype='<u8', mode='r', shape=(count,))
+            self._cases = np.memmap(self._case_path, dtype='<u4', mode='r', shape=(count,))
+        else:
+            self._hashes = self._hashes_empty()
+            self._cases = np.empty(0, dtype=np.uint32)
+
+    def _load_bands(self, count: int) -> int:
+        """
+        Load saved band tables (memory-mapped), or build them.
+
+        Returns:
+            Number of records the band tables cover
+        """
+        meta_path = self.directory / 'bands.json'
+        try:
+            with open(meta_path) as f:
+                indexed = json.load(f)['count']
+            if indexed > count:
+                raise ValueError("band tables newer than the records")
+            self._band_values = [
+                np.load(self.directory / f'band{band}.values.npy', mmap_mode='r') for band in range(BANDS)
+            ]
+            self._band_positions = [
+                np.load(self.directory / f'band{band}.positions.npy', mmap_mode='r') for band in range(BANDS)
+            ]
+            self._bands_saved = True
+            return indexed
+        except (OSError, ValueError, KeyError):
+            hashes = np.memmap(self._hash_path, dtype='<u8', mode='r', shape=(count,)) if count else self._hashes_empty()
+            self._band_values, self._band_positions = self._build_bands(hashes)
+            return count
+
+    def _save_bands(self):
+        """Write the band tables atomically (lock held)."""
+        for band in range(BANDS):
+            for name, table in (('values', self._band_values), ('positions', self._band_positions)):
+                path = self.directory / f'band{band}.{name}.npy'
+                temp = path.with_suffix('.tmp')
+                with open(temp, 'wb') as f:
+                    np.save(f, np.asarray(table[band]))
+                temp.replace(path)
+
+        meta_path = self.directory / 'bands.json'
+        temp = meta_path.with_suffix('.tmp')
+        temp.write_text(json.dumps({'count': len(self._hashes)}))
+        temp.replace(meta_path)
+        self._bands_saved = True
+
+    @staticmethod
+    def _hashes_empty() -> np.ndarray:
+        return np.empty(0, dtype=np.uint64)
+
+    @staticmethod
+    def _build_bands(hashes: np.ndarray):
+        """Per band: band values sorted, and the record position of each."""
+        band_values, band_positions = [], []
+        for band in range(BANDS):
+            values = _band(hashes, band)
+            order = np.argsort(values, kind='stable').astype(np.uint32)
+            band_values.append(values[order])
+            band_positions.append(order)
+        return band_values, band_positions
+
+    def _merge_tail(self):
+        """Map the tail records and merge them into the band tables (lock held)."""
+        start = len(self._hashes)
+        tail = np.array(self._tail_hashes, dtype=np.uint64)
+        tail_positions = np.arange(start, start + len(tail), dtype=np.uint32)
+
+        # New lists, so a search holding the old tables stays consistent
+        band_values, band_positions = [], []
+        for band in range(BANDS):
+            values = _band(tail, band)
+            order = np.argsort(values, kind='stable')
+            at = np.searchsorted(self._band_values[band], values[order], 'right')
+            band_values.append(np.insert(self._band_values[band], at, values[order]))
+            band_positions.append(np.insert(self._band_positions[band], at, tail_positions[order]))
+        self._band_values, self._band_positions = band_values, band_positions
+        self._bands_saved = False
+
+        self._map(start + len(tail))
+        self._tail_hashes = []
+        self._tail_cases = []
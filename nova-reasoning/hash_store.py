@@ -0,0 +1,414 @@
+"""
+Hash Store - Storage backends for fraud detection history.
+
+Every checked image leaves a hash record: case, perceptual hashes, file
+hash, camera, location and time. FraudDetector looks records up by
+perceptual hash to find recycled photos, and replays recent ones to warm
+its pattern indexes.
+
+image_hash holds the SHA-256 of the file, as it always has; the combined
+perceptual hash is stored under perceptual_hash. Records written before
+perceptual hashing carry only image_hash and are found by file.
+
+Backends:
+- DynamoHashStore: the shared DynamoDB table; records are buffered and
+  written with batch_writer (25 items per request), lookups can be served
+  from a local mirror of the table, recent records are queried per month
+  from an index on (record_month, timestamp)
+- SQLiteHashStore: an embedded SQLite database (WAL) for edge sites and
+  offline tests, indexed on every lookup column
+"""
+
+import atexit
+import sqlite3
+import threading
+import weakref
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+DEFAULT_BATCH_SIZE = 100
+
+# Attributes needed to confirm a duplicate; everything the mirror keeps
+MIRROR_ATTRIBUTES = ('case_id', 'image_hash', 'perceptual_hash', 'phash', 'dhash', 'ahash', 'file_hash')
+
+# Dynamo stores not yet closed, flushed at exit; weak, so the exit hook
+# keeps no store alive
+_open_stores: 'weakref.WeakSet[DynamoHashStore]' = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_open_stores():
+    for store in list(_open_stores):
+        store.flush()
+
+# Record attributes, in SQLite column order
+RECORD_ATTRIBUTES = (
+    'case_id', 'image_hash', 'phash', 'dhash', 'ahash', 'file_hash',
+    'image_url', 'timestamp', 'camera', 'latitude', 'longitude', 'camera_serial',
+    'perceptual_hash'
+)
+_HASH_ATTRIBUTES = ('phash', 'dhash', 'ahash')
+
+
+class HashStore:
+    """
+    Interface of a fraud history backend.
+
+    Records are dicts with RECORD_ATTRIBUTES; timestamp is an ISO string,
+    camera (make and model), camera_serial, latitude and longitude may be None.
+    """
+
+    def put(self, item: Dict):
+        """Store a record (backends may buffer it; lookups still see it)."""
+        raise NotImplementedError
+
+    def find(self, perceptual_hash: str) -> List[Dict]:
+        """Records with this perceptual hash (PerceptualHashes.hex())."""
+        raise NotImplementedError
+
+    def find_file(self, file_hash: str) -> List[Dict]:
+        """
+        Records of the file with this SHA-256 (image_hash), including
+        records written before perceptual hashing.
+
+        Backends without an efficient file hash lookup return nothing.
+        """
+        return []
+
+    def recent(self, since: str) -> List[Dict]:
+        """
+        Records stored at or after an ISO timestamp, oldest first.
+
+        Backends without an efficient time query return nothing.
+        """
+        return []
+
+    def load_mirror(self):
+        """Prepare for many lookups (e.g. copy remote records locally)."""
+
+    def flush(self):
+        """Write buffered records."""
+
+    def close(self):
+        self.flush()
+
+
+class DynamoHashStore(HashStore):
+    """
+    Write-behind store of hash records in a DynamoDB table.
+
+    Records reach DynamoDB when batch_size are buffered, on flush() and on
+    close() (also run at interpreter exit); a crash loses at most the
+    buffered records. Failed reads and writes (e.g. a missing table) are
+    reported once and counted, not raised.
+
+    Perceptual hashes are looked up on one global secondary index, file
+    hashes on the table's original image_hash index.
+
+    Records carry a record_month attribute (YYYY-MM of timestamp), so
+    recent() can query a global secondary index partitioned by month and
+    sorted by timestamp: a 30-day window is two queries. Records written
+    before record_month existed are not found by recent().
+    """
+
+    def __init__(
+        self,
+        table,
+        index_name: str = 'PerceptualHashIndex',
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        time_index_name: str = 'RecordMonthIndex',
+        file_index_name: str = 'ImageHashIndex'
+    ):
+        """
+        Args:
+            table: boto3 DynamoDB Table resource
+            index_name: Global secondary index on perceptual_hash
+            batch_size: Records buffered before a batch write
+            time_index_name: Global secondary index on record_month (partition)
+                             and timestamp (sort)
+            file_index_name: Global secondary index on image_hash (file SHA-256)
+        """
+        self.table = table
+        self.index_name = index_name
+        self.file_index_name = file_index_name
+        self.time_index_name = time_index_name
+        self.batch_size = batch_size
+        self.failed = 0  # Records dropped by failed writes
+
+        self._lock = threading.Lock()
+        self._buffer: List[Dict] = []
+        self._mirror: Optional[Dict[str, List[Dict]]] = None
+        self._mirror_files: Dict[str, List[Dict]] = {}
+        self._read_warned = False
+        _open_stores.add(self)
+
+    def put(self, item: Dict):
+        """Buffer a record; writes a batch once batch_size are buffered."""
+        with self._lock:
+            self._buffer.append(item)
+            if self._mirror is not None:
+                self._mirror.setdefault(item.get('perceptual_hash'), []).append(item)
+                self._mirror_files.setdefault(item['image_hash'], []).append(item)
+            if len(self._buffer) < self.batch_size:
+                return
+            batch, self._buffer = self._buffer, []
+        self._write(batch)
+
+    def find(self, perceptual_hash: str) -> List[Dict]:
+        """Records with this perceptual hash, including buffered ones."""
+        with self._lock:
+            if self._mirror is not None:
+                return list(self._mirror.get(perceptual_hash, []))
+            pending = [item for item in self._buffer if item.get('perceptual_hash') == perceptual_hash]
+        return self._query(self.index_name, 'perceptual_hash', perceptual_hash) + pending
+
+    def find_file(self, file_hash: str) -> List[Dict]:
+        """Records of a file (by image_hash), including buffered ones."""
+        with self._lock:
+            if self._mirror is not None:
+                return list(self._mirror_files.get(file_hash, []))
+            pending = [item for item in self._buffer if item['image_hash'] == file_hash]
+        return self._query(self.file_index_name, 'image_hash', file_hash) + pending
+
+    def recent(self, since: str) -> List[Dict]:
+        """
+        Records stored at or after an ISO timestamp, oldest first: one
+        paginated index query per month up to this one, plus buffered records.
+        """
+        with self._lock:
+            pending = [item for item in self._buffer if item['timestamp'] >= since]
+
+        items = []
+        year, month = int(since[:4]), int(since[5:7])
+        current = datetime.now()
+        try:
+            while (year, month) <= (current.year, current.month):
+                query_args = {
+                    'IndexName': self.time_index_name,
+                    # timestamp is a DynamoDB reserved word
+                    'KeyConditionExpression': 'record_month = :month AND #timestamp >= :since',
+                    'ExpressionAttributeNames': {'#timestamp': 'timestamp'},
+                    'ExpressionAttributeValues': {':month': f"{year:04d}-{month:02d}", ':since': since}
+                }
+                while True:
+                    response = self.table.query(**query_args)
+                    items.extend(response.get('Items', []))
+                    if 'LastEvaluatedKey' not in response:
+                        break
+                    query_args['ExclusiveStartKey'] = response['LastEvaluatedKey']
+                year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        except Exception as e:
+            self._warn_read(e)
+
+        return sorted(items + pending, key=lambda item: item['timestamp'])
+
+    def load_mirror(self):
+        """
+        Copy the table's hash records into memory (one paginated scan).
+
+        Later lookups are served locally; records put afterwards are added
+        to the mirror as well.
+        """
+        mirror: Dict[str, List[Dict]] = {}
+        files: Dict[str, List[Dict]] = {}
+        scan_args = {'ProjectionExpression': ', '.join(MIRROR_ATTRIBUTES)}
+        try:
+            while True:
+                response = self.table.scan(**scan_args)
+                for item in response.get('Items', []):
+                    # Records written before perceptual hashing have none
+                    if 'perceptual_hash' in item:
+                        mirror.setdefault(item['perceptual_hash'], []).append(item)
+                    files.setdefault(item['image_hash'], []).append(item)
+                if 'LastEvaluatedKey' not in response:
+                    break
+                scan_args['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        except Exception as e:
+            self._warn_read(e)
+
+        with self._lock:
+            for item in self._buffer:
+                mirror.setdefault(item.get('perceptual_hash'), []).append(item)
+                files.setdefault(item['image_hash'], []).append(item)
+            self._mirror = mirror
+            self._mirror_files = files
+
+    def flush(self):
+        """Write every buffered record."""
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if batch:
+            self._write(batch)
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            _open_stores.discard(self)
+
+    def _query(self, index_name: str, attribute: str, value: str) -> List[Dict]:
+        """Items of an index with this key; nothing when the read fails."""
+        try:
+            response = self.table.query(
+                IndexName=index_name,
+                KeyConditionExpression=f'{attribute} = :value',
+                ExpressionAttributeValues={':value': value}
+            )
+        except Exception as e:
+            self._warn_read(e)
+            return []
+        return response.get('Items', [])
+
+    def _write(self, batch: List[Dict]):
+        try:
+            # One request may not hold two items with the same key; the later
+            # one wins, as with sequential put_item calls
+            keys = [key['AttributeName'] for key in self.table.key_schema]
+            # batch_writer splits into 25-item requests and resends unprocessed items
+            with self.table.batch_writer(overwrite_by_pkeys=keys) as writer:
+                for item in batch:
+                    writer.put_item(Item=self._to_dynamo(item))
+        except Exception as e:
+            # Reported on every failure, unlike reads: each one loses records
+            self.failed += len(batch)
+            print(f"Warning: dropped {len(batch)} hash records, "
+                  f"writing to fraud history table {self.table.name} failed: {e}")
+
+    @staticmethod
+    def _to_dynamo(item: Dict) -> Dict:
+        """DynamoDB takes Decimal, not float, and no empty attributes; adds record_month."""
+        converted = {
+            key: Decimal(str(value)) if isinstance(value, float) else value
+            for key, value in item.items()
+            if value is not None
+        }
+        converted['record_month'] = item['timestamp'][:7]
+        return converted
+
+    def _warn_read(self, error: Exception):
+        """Reported once; lookups fall back to the buffered records."""
+        if not self._read_warned:
+            self._read_warned = True
+            print(f"Warning: reading fraud history table {self.table.name} failed: {error}")
+
+
+def _signed(value: Optional[int]) -> Optional[int]:
+    """64-bit unsigned hash -> SQLite's signed INTEGER."""
+    return value - (1 << 64) if value is not None and value >= 1 << 63 else value
+
+
+def _unsigned(value: Optional[int]) -> Optional[int]:
+    return value + (1 << 64) if value is not None and value < 0 else value
+
+
+class SQLiteHashStore(HashStore):
+    """
+    Hash records in an embedded SQLite database.
+
+    Indexed on perceptual_hash, image_hash, file_hash, case_id, timestamp,
+    camera and location, so every lookup is a B-tree search. Safe to share between
+    processes (WAL mode); records are written immediately.
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Args:
+            db_path: Path to the SQLite database file (created if missing)
+        """
+        self.db_path = str(db_path)
+        self._lock = threading.Lock()
+
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS hash_records (
+                id INTEGER PRIMARY KEY,
+                case_id TEXT NOT NULL,
+                image_hash TEXT NOT NULL,
+                phash INTEGER,
+                dhash INTEGER,
+                ahash INTEGER,
+                file_hash TEXT,
+                image_url TEXT,
+                timestamp TEXT NOT NULL,
+                camera TEXT,
+                latitude REAL,
+                longitude REAL,
+                camera_serial TEXT,
+                perceptual_hash TEXT
+            )
+        ''')
+        columns = [row[1] for row in self.conn.execute('PRAGMA table_info(hash_records)')]
+        if 'camera_serial' not in columns:
+            # Databases created before devices were told apart by serial
+            self.conn.execute('ALTER TABLE hash_records ADD COLUMN camera_serial TEXT')
+        if 'perceptual_hash' not in columns:
+            # Databases that kept the perceptual hash in image_hash: move it
+            # and put the file's SHA-256 back
+            self.conn.execute('ALTER TABLE hash_records ADD COLUMN perceptual_hash TEXT')
+            self.conn.execute(
+                'UPDATE hash_records SET perceptual_hash = image_hash, '
+                'image_hash = COALESCE(file_hash, image_hash) WHERE phash IS NOT NULL'
+            )
+        for name, columns in (
+            ('perceptual_hash', 'perceptual_hash'),
+            ('image_hash', 'image_hash'),
+            ('file_hash', 'file_hash'),
+            ('case_id', 'case_id'),
+            ('timestamp', 'timestamp'),
+            ('camera', 'camera, timestamp'),
+            ('location', 'latitude, longitude'),
+        ):
+            self.conn.execute(
+                f'CREATE INDEX IF NOT EXISTS idx_hash_records_{name} ON hash_records ({columns})'
+            )
+
+    def put(self, item: Dict):
+        row = [item.get(attribute) for attribute in RECORD_ATTRIBUTES]
+        for attribute in _HASH_ATTRIBUTES:
+            position = RECORD_ATTRIBUTES.index(attribute)
+            row[position] = _signed(row[position])
+
+        with self._lock:
+            self.conn.execute(
+                f'INSERT INTO hash_records ({", ".join(RECORD_ATTRIBUTES)}) '
+                f'VALUES ({", ".join("?" * len(RECORD_ATTRIBUTES))})',
+                row
+            )
+
+    def find(self, perceptual_hash: str) -> List[Dict]:
+        return self._select('WHERE perceptual_hash = ?', (perceptual_hash,))
+
+    def find_file(self, file_hash: str) -> List[Dict]:
+        return self._select('WHERE image_hash = ?', (file_hash,))
+
+    def recent(self, since: str) -> List[Dict]:
+        return self._select('WHERE timestamp >= ? ORDER BY timestamp', (since,))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute('SELECT COUNT(*) FROM hash_records').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def _select(self, clause: str, parameters) -> List[Dict]:
+        with self._lock:
+            rows = self.conn.execute(
+                f'SELECT {", ".join(RECORD_ATTRIBUTES)} FROM hash_records {clause}', parameters
+            ).fetchall()
+
+        records = []
+        for row in rows:
+            record = dict(row)
+            for attribute in _HASH_ATTRIBUTES:
+                record[attribute] = _unsigned(record[attribute])
+            records.append(record)
+        return records
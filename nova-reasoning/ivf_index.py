@@ -0,0 +1,273 @@
+"""
+IVF Index - Approximate nearest-neighbour search over unit-length embeddings.
+
+An inverted file index: k-means centroids split the vectors into lists,
+and a query only scores the lists of its nprobe nearest centroids, so the
+work per query stays near nprobe / n_lists of a full scan.
+
+Vectors are appended to a memory-mapped float16 file, so inserts are
+persisted as they happen. The index trains itself once TRAIN_PER_LIST
+vectors per list have arrived; until then every query is an exact scan.
+
+Files in the index directory:
+- vectors.f16: EMBEDDING_DIM float16 values per image
+- cases.u32: case number of each image
+- lists.u16: list of each image (written once trained)
+- centroids.npy: k-means centroids
+- case_ids.jsonl: case ID of each case number
+
+One writer per index directory.
+"""
+
+import threading
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from case_log import CaseLog
+
+
+DEFAULT_LISTS = 1024
+DEFAULT_PROBES = 8
+
+# Vectors per list needed before training (and sampled for it)
+TRAIN_PER_LIST = 40
+KMEANS_ITERATIONS = 10
+
+# Inserts kept in a linearly scanned tail before being merged into the lists
+MERGE_THRESHOLD = 4096
+
+
+def train_centroids(vectors: np.ndarray, n_lists: int, seed: int = 0) -> np.ndarray:
+    """Spherical k-means: unit-length centroids maximizing cosine similarity."""
+    rng = np.random.default_rng(seed)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)]
+
+    for _ in range(KMEANS_ITERATIONS):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        # Empty lists keep their centroid
+        centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+
+    return centroids
+
+
+class IVFIndex:
+    """
+    Persistent top-k cosine search over embeddings, labeled by case ID.
+
+    Example:
+        index = IVFIndex('embedding_index', dim=EMBEDDING_DIM)
+        index.add(embedding, 'CASE-001')
+        index.query(other, k=10, min_similarity=0.95)  # -> [('CASE-001', 0.97)]
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        dim: int,
+        n_lists: int = DEFAULT_LISTS,
+        nprobe: int = DEFAULT_PROBES
+    ):
+        """
+        Open or create an index.
+
+        Args:
+            directory: Index directory (created if missing)
+            dim: Vector length
+            n_lists: Number of k-means lists once trained
+            nprobe: Lists scored per query (higher: better recall, slower)
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        self._vector_path = self.directory / 'vectors.f16'
+        self._case_path = self.directory / 'cases.u32'
+        self._list_path = self.directory / 'lists.u16'
+        self._centroid_path = self.directory / 'centroids.npy'
+        self._lock = threading.Lock()
+        self.cases = CaseLog(self.directory / 'case_ids.jsonl')
+
+        # Drop a torn trailing record so the files stay aligned
+        row_bytes = dim * 2
+        count = min(
+            self._vector_path.stat().st_size // row_bytes if self._vector_path.exists() else 0,
+            self._case_path.stat().st_size // 4 if self._case_path.exists() else 0
+        )
+        for path, width in ((self._vector_path, row_bytes), (self._case_path, 4)):
+            with open(path, 'ab') as f:
+                f.truncate(count * width)
+
+        self._vector_file = open(self._vector_path, 'ab')
+        self._case_file = open(self._case_path, 'ab')
+        self._map(count)
+
+        self.centroids: Optional[np.ndarray] = None
+        if self._centroid_path.exists():
+            self.centroids = np.load(self._centroid_path)
+            self._open_lists(count)
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def __len__(self) -> int:
+        return len(self._vectors)
+
+    def add(self, vector: np.ndarray, case_id: str):
+        """Insert one vector; it is on disk when this returns."""
+        self.add_many(np.asarray(vector)[None, :], [case_id])
+
+    def add_many(self, vectors: np.ndarray, case_ids: Iterable[str]):
+        """Insert several vectors with one write per file."""
+        vectors = np.asarray(vectors, dtype='<f2').reshape(-1, self.dim)
+
+        with self._lock:
+            numbers = self.cases.numbers(case_ids)
+            self._vector_file.write(vectors.tobytes())
+            self._vector_file.flush()
+            self._case_file.write(np.array(numbers, dtype='<u4').tobytes())
+            self._case_file.flush()
+
+            count = len(self._vectors) + len(vectors)
+            self._map(count)
+
+            if self.trained:
+                lists = self._assign(vectors)
+                self._list_file.write(lists.astype('<u2').tobytes())
+                self._list_file.flush()
+                self._tail_lists.extend(lists.tolist())
+                if len(self._tail_lists) >= MERGE_THRESHOLD:
+                    self._merge_tail()
+            elif count >= self.n_lists * TRAIN_PER_LIST:
+                self._train(count)
+
+    def search(self, vector: np.ndarray, k: int, min_similarity: float = -1.0) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate top-k vectors by cosine similarity.
+
+        Returns:
+            (positions, similarities) arrays, most similar first
+        """
+        query = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            vectors = self._vectors
+            if self.trained:
+                probes = np.argsort(self.centroids @ query)[::-1][:self.nprobe]
+                candidates = np.concatenate(
+                    [self._order[self._offsets[p]:self._offsets[p + 1]] for p in probes]
+                    + [np.arange(self._indexed, len(vectors))]
+                ).astype(np.int64)
+            else:
+                candidates = None
+
+        if candidates is None:
+            similarities = self._scan(vectors, query)
+            positions = np.arange(len(vectors))
+        else:
+            candidates.sort()  # Sequential reads from the memory map
+            similarities = vectors[candidates].astype(np.float32) @ query
+            positions = candidates
+
+        keep = np.flatnonzero(similarities >= min_similarity)
+        if len(keep) > k:
+            keep = keep[np.argpartition(similarities[keep], -k)[-k:]]
+        order = keep[np.argsort(similarities[keep])[::-1]]
+        return positions[order], similarities[order]
+
+    def query(self, vector: np.ndarray, k: int = 10, min_similarity: float = -1.0) -> List[Tuple[str, float]]:
+        """(case ID, best similarity) of the top-k matches, most similar first."""
+        positions, similarities = self.search(vector, k, min_similarity)
+        numbers = self._cases[positions].tolist()
+        best = {}
+        for number, similarity in zip(numbers, similarities.tolist()):
+            best.setdefault(number, similarity)
+        return [(self.cases.case_ids[number], similarity) for number, similarity in best.items()]
+
+    def close(self):
+        with self._lock:
+            self._vector_file.close()
+            self._case_file.close()
+            if self.trained:
+                self._list_file.close()
+            self.cases.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _map(self, count: int):
+        if count:
+            self._vectors = np.memmap(self._vector_path, dtype='<f2', mode='r', shape=(count, self.dim))
+            self._cases = np.memmap(self._case_path, dtype='<u4', mode='r', shape=(count,))
+        else:
+            self._vectors = np.empty((0, self.dim), dtype=np.float16)
+            self._cases = np.empty(0, dtype=np.uint32)
+
+    def _scan(self, vectors: np.ndarray, query: np.ndarray, chunk: int = 1 << 16) -> np.ndarray:
+        return np.concatenate(
+            [vectors[start:start + chunk].astype(np.float32) @ query for start in range(0, len(vectors), chunk)]
+            or [np.empty(0, np.float32)]
+        )
+
+    def _assign(self, vectors: np.ndarray, chunk: int = 1 << 16) -> np.ndarray:
+        """Nearest centroid of each vector."""
+        return np.concatenate([
+            np.argmax(vectors[start:start + chunk].astype(np.float32) @ self.centroids.T, axis=1)
+            for start in range(0, len(vectors), chunk)
+        ]).astype(np.uint16)
+
+    def _train(self, count: int):
+        """Train the centroids and assign every stored vector (lock held)."""
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(count, min(count, self.n_lists * TRAIN_PER_LIST), replace=False))
+        centroids = train_centroids(self._vectors[sample], self.n_lists)
+
+        temp = self._centroid_path.with_suffix('.tmp')
+        with open(temp, 'wb') as f:
+            np.save(f, centroids)
+        self.centroids = centroids
+
+        with open(self._list_path, 'wb') as f:
+            f.write(self._assign(self._vectors).astype('<u2').tobytes())
+        # Centroids last: an index with centroids always has complete lists
+        temp.replace(self._centroid_path)
+        self._open_lists(count)
+
+    def _open_lists(self, count: int):
+        """Load the list of every vector and build the inverted lists."""
+        listed = self._list_path.stat().st_size // 2 if self._list_path.exists() else 0
+        self._list_file = open(self._list_path, 'ab')
+        self._list_file.truncate(min(listed, count) * 2)
+        if listed < count:
+            # Vectors persisted before their list entry
+            missing = self._assign(self._vectors[listed:])
+            self._list_file.write(missing.astype('<u2').tobytes())
+            self._list_file.flush()
+
+        lists = np.fromfile(self._list_path, dtype='<u2', count=count)
+        self._order = np.argsort(lists, kind='stable').astype(np.uint32)
+        self._offsets = np.concatenate([[0], np.cumsum(np.bincount(lists, minlength=len(self.centroids)))])
+        self._indexed = count
+        self._tail_lists: List[int] = []
+
+    def _merge_tail(self):
+        """Merge recently inserted vectors into the inverted lists (lock held)."""
+        lists = np.array(self._tail_lists, dtype=np.intp)
+        positions = np.arange(self._indexed, self._indexed + len(lists), dtype=np.uint32)
+        order = np.argsort(lists, kind='stable')
+
+        self._order = np.insert(self._order, self._offsets[lists[order] + 1], positions[order])
+        self._offsets = self._offsets + np.concatenate(
+            [[0], np.cumsum(np.bincount(lists, minlength=len(self.centroids)))]
+        )
+        self._indexed += len(lists)
+        self._tail_lists = []
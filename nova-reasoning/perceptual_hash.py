@@ -0,0 +1,151 @@
+"""
+Perceptual Hash - pHash, dHash and aHash for recycled photo detection.
+
+All three hashes come from one small grayscale decode of the image, so a
+photo that was recompressed, resized or lightly edited keeps (nearly) the
+same 64-bit hashes. Matching is done on Hamming distance.
+
+Hashes:
+- pHash: sign of the low-frequency DCT coefficients against their median
+- dHash: horizontal brightness gradient
+- aHash: brightness against the mean
+"""
+
+from io import BytesIO
+from typing import Union
+
+import numpy as np
+from PIL import Image
+from pydantic import BaseModel
+
+
+HASH_SIZE = 8  # 8x8 = 64 bits per hash
+HASH_BITS = HASH_SIZE * HASH_SIZE
+
+# Side of the grayscale thumbnail every hash is derived from
+SAMPLE_SIZE = HASH_SIZE * 4
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    """Orthonormal DCT-II matrix; C @ x is the DCT of column vector x."""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.sqrt(2.0 / n) * np.cos(np.pi * (2 * i + 1) * k / (2 * n))
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+def _box_matrix(size_in: int, size_out: int) -> np.ndarray:
+    """
+    Area-averaging resample weights; x @ W box-filters x's last axis.
+
+    Each output sample averages the input samples it covers, weighted by
+    the overlap, like PIL's BOX filter.
+    """
+    edges = np.linspace(0, size_in, size_out + 1)
+    starts = np.arange(size_in)[:, None]
+    overlap = np.clip(
+        np.minimum(starts + 1, edges[None, 1:]) - np.maximum(starts, edges[None, :-1]),
+        0, None
+    )
+    return overlap / overlap.sum(axis=0)
+
+
+# Only the top-left HASH_SIZE x HASH_SIZE DCT coefficients are needed
+_DCT_LOW = _dct_matrix(SAMPLE_SIZE)[:HASH_SIZE]
+
+# Thumbnail -> 8 rows (dHash, aHash), and -> 9 columns (dHash) / 8 columns (aHash)
+_ROWS = _box_matrix(SAMPLE_SIZE, HASH_SIZE).T
+_DHASH_COLUMNS = _box_matrix(SAMPLE_SIZE, HASH_SIZE + 1)
+_AHASH_COLUMNS = _box_matrix(SAMPLE_SIZE, HASH_SIZE)
+
+
+class PerceptualHashes(BaseModel):
+    """64-bit perceptual hashes of one image."""
+    phash: int
+    dhash: int
+    ahash: int
+
+    def similarity(self, other: 'PerceptualHashes') -> float:
+        """Share of matching bits (0-1), averaged over the three hashes."""
+        distance = (
+            hamming_distance(self.phash, other.phash)
+            + hamming_distance(self.dhash, other.dhash)
+            + hamming_distance(self.ahash, other.ahash)
+        )
+        return 1.0 - distance / (3 * HASH_BITS)
+
+    def hex(self) -> str:
+        """pHash as 16 hex digits."""
+        return f"{self.phash:016x}"
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two hashes."""
+    return bin(a ^ b).count('1')
+
+
+def load_thumbnail(image: Union[bytes, str, Image.Image]) -> np.ndarray:
+    """
+    Decode an image straight to a SAMPLE_SIZE x SAMPLE_SIZE grayscale array.
+
+    JPEGs are decoded at reduced scale by libjpeg (draft mode), so a
+    12 MP photo costs about as much as a thumbnail.
+    """
+    if isinstance(image, bytes):
+        image = Image.open(BytesIO(image))
+    elif not isinstance(image, Image.Image):
+        image = Image.open(image)
+
+    image.draft('L', (SAMPLE_SIZE * 2, SAMPLE_SIZE * 2))
+    thumbnail = image.convert('L').resize((SAMPLE_SIZE, SAMPLE_SIZE), Image.BOX)
+    return np.asarray(thumbnail, dtype=np.float32)
+
+
+def _pack_bits(bits: np.ndarray) -> np.ndarray:
+    """(..., 64) booleans -> (...) uint64, first bit most significant."""
+    packed = np.packbits(bits.astype(np.uint8), axis=-1)
+    return packed.view('>u8')[..., 0].astype(np.uint64)
+
+
+def hash_thumbnails(thumbnails: np.ndarray):
+    """
+    Hash a stack of thumbnails at once.
+
+    Args:
+        thumbnails: (N, SAMPLE_SIZE, SAMPLE_SIZE) or one (SAMPLE_SIZE, SAMPLE_SIZE) array
+
+    Returns:
+        (phash, dhash, ahash) uint64 arrays of shape (N,) (scalars for one thumbnail)
+    """
+    pixels = np.asarray(thumbnails, dtype=np.float32)
+
+    # pHash: low-frequency DCT block against its median (DC excluded)
+    dct = _DCT_LOW @ pixels @ _DCT_LOW.T
+    flat = dct.reshape(*dct.shape[:-2], HASH_BITS)
+    median = np.median(flat[..., 1:], axis=-1, keepdims=True)
+    phash = _pack_bits(flat > median)
+
+    # dHash and aHash share the row reduction
+    rows = _ROWS @ pixels
+    gradient = rows @ _DHASH_COLUMNS
+    dhash = _pack_bits((gradient[..., 1:] > gradient[..., :-1]).reshape(*rows.shape[:-2], HASH_BITS))
+
+    means = (rows @ _AHASH_COLUMNS).reshape(*rows.shape[:-2], HASH_BITS)
+    ahash = _pack_bits(means > means.mean(axis=-1, keepdims=True))
+
+    return phash, dhash, ahash
+
+
+def compute_hashes(image: Union[bytes, str, Image.Image]) -> PerceptualHashes:
+    """
+    Compute pHash, dHash and aHash of an image.
+
+    Args:
+        image: Encoded image bytes, a file path or a PIL image
+
+    Returns:
+        PerceptualHashes with 64-bit integer hashes
+    """
+    phash, dhash, ahash = hash_thumbnails(load_thumbnail(image))
+    return PerceptualHashes(phash=int(phash), dhash=int(dhash), ahash=int(ahash))
@@ -0,0 +1,949 @@
+"""
+Tests for the fraud detection history, indexes and scoring
+"""
+
+import gc
+import hashlib
+import io
+import random
+import sqlite3
+import time
+import weakref
+from datetime import datetime, timedelta, timezone
+
+import boto3
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw, ImageFilter
+
+import hash_store
+from burst_counter import BurstCounter
+from fraud_detector import CAMERA_CLAIMS_FOR_MAX_SCORE, FraudDetector, ImageFingerprint
+from geo_index import GeoIndex, haversine_m
+from hamming_index import HammingIndex
+from hash_store import DynamoHashStore, SQLiteHashStore
+from image_embedding import EMBEDDING_DIM, compute_embedding
+from ivf_index import IVFIndex, TRAIN_PER_LIST
+from metadata_table import MetadataTable
+from perceptual_hash import (
+    HASH_BITS, PerceptualHashes, compute_hashes, hamming_distance, hash_thumbnails, load_thumbnail
+)
+
+
+def _hashes() -> PerceptualHashes:
+    """Perceptual hashes of some image"""
+    return PerceptualHashes(phash=1, dhash=2, ahash=3)
+
+
+def _scene(seed: int, width: int = 640, height: int = 480) -> Image.Image:
+    """A photo-like image: random shapes on a background, with sensor noise"""
+    rng = np.random.default_rng(seed)
+    image = Image.new('RGB', (width, height), tuple(int(v) for v in rng.integers(0, 256, 3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(30):
+        x, y = int(rng.integers(0, width)), int(rng.integers(0, height))
+        size = int(rng.integers(20, 200))
+        color = tuple(int(v) for v in rng.integers(0, 256, 3))
+        if rng.random() < 0.5:
+            draw.ellipse([x, y, x + size, y + size // 2 + 5], fill=color)
+        else:
+            draw.rectangle([x, y, x + size, y + size // 3 + 5], fill=color)
+    noisy = np.asarray(image).astype(np.int16) + rng.integers(-10, 10, (height, width, 3))
+    return Image.fromarray(np.clip(noisy, 0, 255).astype(np.uint8)).filter(ImageFilter.GaussianBlur(1))
+
+
+def _jpeg(image: Image.Image, quality: int = 90) -> bytes:
+    """Encode an image as JPEG"""
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+class TestPerceptualHashes:
+    """Test suite for pHash, dHash and aHash"""
+
+    def test_recompressed_and_resized_copy_matches(self):
+        """A re-saved, downscaled copy keeps nearly the same hashes"""
+        original = _scene(1)
+        copy = Image.open(io.BytesIO(_jpeg(original.resize((320, 240)), quality=60)))
+
+        similarity = compute_hashes(_jpeg(original)).similarity(compute_hashes(copy))
+
+        assert similarity >= 0.9
+
+    def test_different_photos_differ(self):
+        """Unrelated photos are far apart"""
+        similarities = [
+            compute_hashes(_scene(seed)).similarity(compute_hashes(_scene(seed + 100)))
+            for seed in range(5)
+        ]
+
+        assert max(similarities) < 0.8
+
+    def test_inputs_agree(self, tmp_path):
+        """Bytes, file paths and PIL images hash the same"""
+        data = _jpeg(_scene(2))
+        path = tmp_path / "scene.jpg"
+        path.write_bytes(data)
+
+        hashes = compute_hashes(data)
+
+        assert compute_hashes(str(path)) == hashes
+        assert compute_hashes(Image.open(io.BytesIO(data))) == hashes
+
+    def test_batch_matches_single(self):
+        """Hashing a stack of thumbnails equals hashing each one"""
+        thumbnails = np.stack([load_thumbnail(_scene(seed)) for seed in range(4)])
+        batch = hash_thumbnails(thumbnails)
+
+        for i, thumbnail in enumerate(thumbnails):
+            single = hash_thumbnails(thumbnail)
+            assert [int(values[i]) for values in batch] == [int(value) for value in single]
+
+    def test_hashes_use_all_bits(self):
+        """Hashes are 64-bit and roughly balanced"""
+        hashes = compute_hashes(_scene(3))
+
+        for value in (hashes.phash, hashes.dhash, hashes.ahash):
+            assert 0 <= value < 1 << HASH_BITS
+            assert 8 <= bin(value).count('1') <= 56
+        assert len(hashes.hex()) == 16
+
+    def test_hamming_distance(self):
+        """Distance counts differing bits"""
+        assert hamming_distance(0b1011, 0b0001) == 2
+        assert hamming_distance((1 << 64) - 1, 0) == 64
+        assert _hashes().similarity(_hashes()) == 1.0
+
+
+class TestHammingIndex:
+    """Test suite for the local near-duplicate index"""
+
+    def _history(self, count=6000, seed=0):
+        """Random hashes with near-duplicates of the first few planted"""
+        rng = np.random.default_rng(seed)
+        hashes = rng.integers(0, np.iinfo(np.uint64).max, count, dtype=np.uint64, endpoint=True)
+        for i in range(50):
+            flips = rng.choice(64, int(rng.integers(0, 8)), replace=False)
+            mask = sum(1 << int(bit) for bit in flips)
+            hashes[count - 1 - i] = hashes[i] ^ np.uint64(mask)
+        return [int(value) for value in hashes]
+
+    def _brute_force(self, hashes, value, max_distance):
+        """Positions within max_distance, by comparing every hash"""
+        return sorted(i for i, other in enumerate(hashes) if hamming_distance(other, value) <= max_distance)
+
+    def _check(self, index, hashes):
+        for value in hashes[:20]:
+            for max_distance in (0, 2, 3, 6):
+                positions, distances = index.search(value, max_distance)
+                assert sorted(positions.tolist()) == self._brute_force(hashes, value, max_distance)
+                assert list(distances) == sorted(distances)
+
+    def test_search_matches_brute_force(self, tmp_path):
+        """Band lookups and full scans find exactly the hashes within radius"""
+        hashes = self._history()
+        with HammingIndex(str(tmp_path / "index")) as index:
+            index.add_many(hashes, [f"CASE-{i}" for i in range(len(hashes))])
+            assert len(index) == len(hashes)
+            self._check(index, hashes)
+
+    def test_reopened_index_matches_brute_force(self, tmp_path):
+        """Saved band tables and records added after them are both searched"""
+        hashes = self._history()
+        with HammingIndex(str(tmp_path / "index")) as index:
+            index.add_many(hashes[:5000], [f"CASE-{i}" for i in range(5000)])
+        with HammingIndex(str(tmp_path / "index")) as index:
+            for i in range(5000, len(hashes)):
+                index.add(hashes[i], f"CASE-{i}")
+        with HammingIndex(str(tmp_path / "index")) as index:
+            self._check(index, hashes)
+
+    def test_query_returns_case_ids(self, tmp_path):
+        """Matches come back as case IDs, nearest first, each once"""
+        with HammingIndex(str(tmp_path / "index")) as index:
+            index.add(0b1111, "CASE-A")
+            index.add(0b0111, "CASE-B")
+            index.add(0b1111, "CASE-A")
+            index.add(1 << 40, "CASE-C")
+
+            assert index.query(0b1111, max_distance=1) == ["CASE-A", "CASE-B"]
+
+    def test_unchanged_index_not_rewritten(self, tmp_path, monkeypatch):
+        """Closing an index nothing was added to leaves the band tables alone"""
+        hashes = self._history(count=100)
+        with HammingIndex(str(tmp_path / "index")) as index:
+            index.add_many(hashes, [f"CASE-{i}" for i in range(len(hashes))])
+
+        def fail(*args, **kwargs):
+            raise AssertionError("band tables should not be rewritten")
+        with monkeypatch.context() as patch:
+            patch.setattr(HammingIndex, '_save_bands', fail)
+            with HammingIndex(str(tmp_path / "index")) as index:
+                assert index.query(hashes[0], 0) == ["CASE-0"]
+
+        with HammingIndex(str(tmp_path / "index")) as index:
+            index.add(hashes[0], "CASE-NEW")
+        with HammingIndex(str(tmp_path / "index")) as index:
+            assert index.query(hashes[0], 0) == ["CASE-0", "CASE-NEW"]
+            assert index._bands_saved
+
+    def test_torn_record_dropped(self, tmp_path):
+        """A half-written record from a crash is discarded on open"""
+        directory = tmp_path / "index"
+        with HammingIndex(str(directory)) as index:
+            index.add(42, "CASE-1")
+        with open(directory / "hashes.u64", 'ab') as f:
+            f.write(b'\x01\x02\x03')
+
+        with HammingIndex(str(directory)) as index:
+            assert len(index) == 1
+            assert index.query(42, 0) == ["CASE-1"]
+
+
+class TestIVFIndex:
+    """Test suite for the embedding nearest-neighbour index"""
+
+    DIM = 16
+    LISTS = 8
+
+    def _vectors(self, count, seed=0):
+        """Unit vectors around a few cluster centers"""
+        rng = np.random.default_rng(seed)
+        centers = rng.normal(size=(self.LISTS, self.DIM))
+        vectors = centers[rng.integers(0, self.LISTS, count)] + rng.normal(scale=0.3, size=(count, self.DIM))
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors.astype(np.float16).astype(np.float32)
+
+    def _brute_force(self, vectors, query, k):
+        similarities = vectors @ query
+        order = np.argsort(similarities)[::-1][:k]
+        return order.tolist(), similarities[order]
+
+    def test_untrained_search_is_exact(self, tmp_path):
+        """Before training every query scans all vectors"""
+        vectors = self._vectors(100)
+        with IVFIndex(str(tmp_path / "ivf"), self.DIM, n_lists=self.LISTS) as index:
+            index.add_many(vectors, [f"CASE-{i}" for i in range(len(vectors))])
+            assert not index.trained
+
+            for query in vectors[:10]:
+                positions, similarities = index.search(query, k=5)
+                expected, expected_similarities = self._brute_force(vectors, query, 5)
+                assert positions.tolist() == expected
+                assert np.allclose(similarities, expected_similarities, atol=1e-3)
+
+    def test_full_probe_matches_brute_force(self, tmp_path):
+        """Probing every list of a trained index finds the exact top-k"""
+        vectors = self._vectors(self.LISTS * TRAIN_PER_LIST + 300)
+        with IVFIndex(str(tmp_path / "ivf"), self.DIM, n_lists=self.LISTS, nprobe=self.LISTS) as index:
+            index.add_many(vectors[:-300], [f"CASE-{i}" for i in range(len(vectors) - 300)])
+            for i in range(len(vectors) - 300, len(vectors)):
+                index.add(vectors[i], f"CASE-{i}")
+            assert index.trained
+
+            for query in vectors[::37]:
+                positions, _ = index.search(query, k=10)
+                assert set(positions.tolist()) == set(self._brute_force(vectors, query, 10)[0])
+
+    def test_recall_with_few_probes(self, tmp_path):
+        """Probing a quarter of the lists still finds most true neighbours"""
+        vectors = self._vectors(self.LISTS * TRAIN_PER_LIST * 2)
+        with IVFIndex(str(tmp_path / "ivf"), self.DIM, n_lists=self.LISTS, nprobe=2) as index:
+            index.add_many(vectors, [f"CASE-{i}" for i in range(len(vectors))])
+
+            found = total = 0
+            for query in vectors[::50]:
+                positions, _ = index.search(query, k=10)
+                found += len(set(positions.tolist()) & set(self._brute_force(vectors, query, 10)[0]))
+                total += 10
+            assert found / total >= 0.9
+
+    def test_reopened_index_keeps_vectors_and_lists(self, tmp_path):
+        """A trained index reopens with the same answers"""
+        vectors = self._vectors(self.LISTS * TRAIN_PER_LIST + 10)
+        case_ids = [f"CASE-{i}" for i in range(len(vectors))]
+        with IVFIndex(str(tmp_path / "ivf"), self.DIM, n_lists=self.LISTS) as index:
+            index.add_many(vectors, case_ids)
+            before = index.query(vectors[3], k=5, min_similarity=0.5)
+
+        with IVFIndex(str(tmp_path / "ivf"), self.DIM, n_lists=self.LISTS) as index:
+            assert index.trained
+            assert len(index) == len(vectors)
+            assert index.query(vectors[3], k=5, min_similarity=0.5) == before
+            assert before[0] == ("CASE-3", pytest.approx(1.0, abs=1e-3))
+
+    def test_embedding_matches_cropped_copy(self):
+        """A cropped copy is closer than an unrelated photo"""
+        original = _scene(4)
+        cropped = original.crop((64, 48, 576, 432))
+
+        embedding = compute_embedding(_jpeg(original))
+        assert embedding.shape == (EMBEDDING_DIM,)
+        assert np.linalg.norm(embedding) == pytest.approx(1.0, abs=1e-5)
+        assert embedding @ compute_embedding(cropped) > embedding @ compute_embedding(_scene(5))
+
+
+class TestGeoIndex:
+    """Test suite for the case location index"""
+
+    def _points(self, count=2000, seed=0, lat=-34.6037, lon=-58.3816):
+        """Random claims within about 2 km of a center, over 30 days"""
+        rng = np.random.default_rng(seed)
+        return [
+            (lat + dlat, lon + dlon, f"CASE-{i}", 1_700_000_000 + t)
+            for i, (dlat, dlon, t) in enumerate(zip(
+                rng.uniform(-0.02, 0.02, count), rng.uniform(-0.02, 0.02, count), rng.uniform(0, 30 * 86400, count)
+            ))
+        ]
+
+    def _brute_force(self, points, lat, lon, radius_m, since=None, until=None):
+        """Case IDs within the radius and window, by measuring every point"""
+        lats, lons, case_ids, timestamps = zip(*points)
+        timestamps = np.array(timestamps)
+        keep = haversine_m(lat, lon, np.array(lats), np.array(lons)) <= radius_m
+        if since is not None:
+            keep &= (timestamps >= since) & (timestamps <= until)
+        return sorted(case_ids[i] for i in np.flatnonzero(keep))
+
+    def _check(self, index, points, queries=None):
+        for lat, lon, _, timestamp in points[:40] if queries is None else queries:
+            for radius_m in (50, 100, 400):
+                for since, until in ((None, None), (timestamp - 86400, timestamp + 86400)):
+                    found = index.query(lat, lon, radius_m, since=since, until=until)
+                    assert sorted(case for case, _ in found) == self._brute_force(
+                        points, lat, lon, radius_m, since, until
+                    )
+                    assert [distance for _, distance in found] == sorted(distance for _, distance in found)
+
+    def test_query_matches_brute_force(self):
+        """Radius and time window queries find exactly the nearby claims"""
+        points = self._points()
+        with GeoIndex() as index:
+            for lat, lon, case_id, timestamp in points:
+                index.add(lat, lon, case_id, timestamp)
+            self._check(index, points)
+
+    def test_antimeridian_and_high_latitudes(self):
+        """Cells wrap around at longitude 180 and widen at high latitudes"""
+        points = self._points(500, seed=1, lat=10.0, lon=179.999) + self._points(500, seed=2, lat=85.0, lon=0.0)
+        points = [
+            (lat, (lon + 180) % 360 - 180, f"CASE-{i}", t)
+            for i, (lat, lon, _, t) in enumerate(points)
+        ]
+        with GeoIndex() as index:
+            for lat, lon, case_id, timestamp in points:
+                index.add(lat, lon, case_id, timestamp)
+            self._check(index, points, points[:20] + points[-20:])
+
+    def test_reopened_index(self, tmp_path):
+        """Points persisted to disk are found after reopening"""
+        points = self._points(500)
+        with GeoIndex(str(tmp_path / "geo")) as index:
+            for lat, lon, case_id, timestamp in points:
+                index.add(lat, lon, case_id, timestamp)
+
+        with GeoIndex(str(tmp_path / "geo")) as index:
+            assert len(index) == len(points)
+            self._check(index, points)
+
+
+class TestBulkCheck:
+    """Test suite for fraud checking many images at once"""
+
+    def test_check_images_matches_check_image(self, tmp_path):
+        """Bulk results equal one check_image call per case, in input order"""
+        moto = pytest.importorskip("moto")
+        with moto.mock_aws():
+            s3 = boto3.client('s3', region_name='us-east-1')
+            s3.create_bucket(Bucket='evidence')
+            cases = []
+            for number in range(12):
+                # Claims 8 to 11 reuse the photos of claims 0 to 3
+                key = f"photos/{number % 8}.jpg"
+                s3.put_object(Bucket='evidence', Key=key, Body=_jpeg(_scene(number % 8)))
+                cases.append({
+                    'image_url': f"s3://evidence/{key}",
+                    'metadata': {'gps': {'latitude': -34.6037, 'longitude': -58.3816}},
+                    'case_id': f"CASE-{number}"
+                })
+
+            with FraudDetector(hash_store=SQLiteHashStore(str(tmp_path / "one.db"))) as detector:
+                expected = [detector.check_image(**case) for case in cases]
+            with FraudDetector(hash_store=SQLiteHashStore(str(tmp_path / "bulk.db"))) as detector:
+                results = list(detector.check_images(cases, workers=4))
+
+        assert results == expected
+        assert results[8].similar_cases == ["CASE-0"]
+
+
+class TestKnownFileHash:
+    """Test suite for reusing stored hashes instead of downloading images"""
+
+    @pytest.fixture
+    def s3_calls(self):
+        """A bucket with one image uploaded as EvidenceUploader does, and the S3 calls made"""
+        moto = pytest.importorskip("moto")
+        with moto.mock_aws():
+            data = _jpeg(_scene(7))
+            self.sha256 = hashlib.sha256(data).hexdigest()
+            s3 = boto3.client('s3', region_name='us-east-1')
+            s3.create_bucket(Bucket='evidence')
+            for key in ('a.jpg', 'b.jpg'):
+                s3.put_object(Bucket='evidence', Key=key, Body=data, Metadata={'file-hash': f"sha256:{self.sha256}"})
+            yield []
+
+    def _detector(self, tmp_path, calls, **kwargs):
+        detector = FraudDetector(hash_store=SQLiteHashStore(str(tmp_path / "history.db")), **kwargs)
+        detector.s3.meta.events.register('before-call.s3', lambda model, **_: calls.append(model.name))
+        return detector
+
+    def test_prefixed_metadata_hash_reused(self, s3_calls, tmp_path):
+        """The 'sha256:' metadata matches the plain hex history, so the copy is not downloaded"""
+        with self._detector(tmp_path, s3_calls) as detector:
+            detector.check_image("s3://evidence/a.jpg", {}, "CASE-1")
+            s3_calls.clear()
+            result = detector.check_image("s3://evidence/b.jpg", {}, "CASE-2")
+
+            assert s3_calls == ['HeadObject']
+            assert result.similar_cases == ["CASE-1"]
+            assert [record['case_id'] for record in detector.hash_store.find_file(self.sha256)] == ["CASE-1", "CASE-2"]
+
+    def test_digests_normalized(self, s3_calls, tmp_path):
+        """Phase 1 digests in either form skip the HEAD"""
+        with self._detector(tmp_path, s3_calls) as detector:
+            detector.check_image("s3://evidence/a.jpg", {}, "CASE-1", digests={'sha256': f"sha256:{self.sha256.upper()}"})
+            s3_calls.clear()
+            detector.check_image("s3://evidence/b.jpg", {}, "CASE-2", digests={'sha256': self.sha256})
+
+            assert s3_calls == []
+            assert len(detector.hash_store.find_file(self.sha256)) == 2
+
+    def test_no_head_with_embedding_index(self, s3_calls, tmp_path):
+        """With an embedding index the image is downloaded anyway, so it is not HEADed first"""
+        with self._detector(tmp_path, s3_calls, embedding_index_path=str(tmp_path / "ivf")) as detector:
+            detector.check_image("s3://evidence/a.jpg", {}, "CASE-1")
+
+            assert s3_calls == ['GetObject']
+            assert detector.hash_store.find_file(self.sha256)[0]['case_id'] == "CASE-1"
+
+
+class TestBatchScoring:
+    """Test suite for vectorized scoring over a metadata table"""
+
+    NOW = datetime(2026, 10, 18, 12, 0, 0)
+
+    def _timestamp(self, rng):
+        """An ISO timestamp near the rule boundaries, or a missing/broken one"""
+        choice = rng.random()
+        if choice < 0.15:
+            return None
+        if choice < 0.25:
+            return rng.choice(['garbage', ''])
+        days = rng.choice([-800, -366, -365.99999, -365, -2, -1, 0, 1e-6, -1e-6, 3])
+        value = self.NOW + timedelta(days=days + rng.uniform(-1, 1) * rng.choice([0, 1e-9, 0.5]))
+        if rng.random() < 0.2:
+            value = value.replace(tzinfo=timezone(timedelta(hours=rng.choice([0, 2, -5]))))
+        return value.isoformat()
+
+    def _metadata(self, rng):
+        """Forensic metadata with every field present, missing or invalid at random"""
+        metadata = {}
+        if rng.random() < 0.7:
+            metadata['camera'] = rng.choice([{'make': "Canon"}, {}, None])
+        if rng.random() < 0.7:
+            metadata['gps'] = rng.choice([{}, {
+                'latitude': rng.choice([0.05, 40.7, 91, -90, None]),
+                'longitude': rng.choice([0.0, -74, 181, -180.0, 0.09])
+            }])
+        if rng.random() < 0.8:
+            timestamp = {}
+            original = self._timestamp(rng)
+            if original is not None:
+                timestamp['original'] = original
+            modified = self._timestamp(rng)
+            if original and original != 'garbage' and rng.random() < 0.5:
+                # Edits around the one-day manipulation boundary
+                modified = (datetime.fromisoformat(original) + timedelta(days=rng.choice([1, 1.9999999, 2]))).isoformat()
+            if modified is not None:
+                timestamp['modified'] = modified
+            metadata['timestamp'] = timestamp
+        return metadata
+
+    @pytest.fixture
+    def claims(self):
+        """Random metadata, duplicates and pattern scores of 3000 claims"""
+        rng = random.Random(1)
+        count = 3000
+        return (
+            [self._metadata(rng) for _ in range(count)],
+            [rng.choice([[], [], ["CASE-A"], ["CASE-A", "CASE-B"]]) for _ in range(count)],
+            [rng.choice([0.0, 0.25, 0.5, 0.75, 1.0]) for _ in range(count)]
+        )
+
+    @pytest.fixture
+    def detector(self, tmp_path, monkeypatch):
+        """Detector whose clock is fixed at NOW"""
+        import fraud_detector
+        now = self.NOW
+
+        class FixedClock(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return now
+        monkeypatch.setattr(fraud_detector, 'datetime', FixedClock)
+
+        with FraudDetector(hash_store=SQLiteHashStore(str(tmp_path / "history.db"))) as detector:
+            yield detector
+
+    def _per_claim(self, detector, monkeypatch, metadatas, duplicates, pattern_scores):
+        """Results of the per-claim scorer with the same duplicates and pattern scores"""
+        results = []
+        fingerprint = ImageFingerprint(_hashes(), "", None)
+        monkeypatch.setattr(detector, '_store_image_hash', lambda *args, **kwargs: None)
+        for metadata, similar, pattern in zip(metadatas, duplicates, pattern_scores):
+            monkeypatch.setattr(detector, '_find_duplicates', lambda *args, similar=similar, **kwargs: list(similar))
+            monkeypatch.setattr(detector, '_analyze_patterns', lambda *args, pattern=pattern: pattern)
+            results.append(detector._score(fingerprint, "s3://evidence/a.jpg", metadata, "CASE-NEW"))
+        return results
+
+    def test_matches_per_claim_scoring(self, detector, claims, monkeypatch):
+        """Every result equals the per-claim scorer's, reasons and score included"""
+        batch = list(detector.score_batch(*claims, now=self.NOW))
+        expected = self._per_claim(detector, monkeypatch, *claims)
+
+        assert [result.model_dump() for result in batch] == [result.model_dump() for result in expected]
+        reasons = {reason.split(' (')[0] for result in batch for reason in result.reasons}
+        assert {"Timestamp is in the future", "Timestamp is more than 1 year old", "Invalid timestamp format",
+                "Invalid latitude", "Invalid longitude", "GPS coordinates at null island"} <= reasons
+        assert {"Metadata manipulation detected", "Suspicious pattern detected"} <= reasons
+
+    def test_saved_table_scores_the_same(self, detector, claims, tmp_path):
+        """A table saved and loaded gives the same results as the metadata"""
+        metadatas, duplicates, pattern_scores = claims
+        path = str(tmp_path / "claims.npz")
+        MetadataTable.from_metadata(metadatas).save(path)
+
+        reloaded = detector.score_batch(MetadataTable.load(path), duplicates, pattern_scores, now=self.NOW)
+        direct = detector.score_batch(metadatas, duplicates, pattern_scores, now=self.NOW)
+
+        assert list(reloaded) == list(direct)
+
+    def test_defaults_count_as_clean(self, detector):
+        """Without duplicates and pattern scores those checks do not fire"""
+        metadata = {'camera': {'make': "Canon"}, 'gps': {'latitude': 40.7, 'longitude': -74.0}}
+
+        assert list(detector.score_batch([metadata], now=self.NOW))[0].reasons == ["No fraud indicators detected"]
+        assert list(detector.score_batch([], now=self.NOW)) == []
+
+
+class TestBurstScoring:
+    """Test suite for inspector, camera and grid cell burst scores"""
+
+    @pytest.fixture
+    def detector(self, tmp_path):
+        """Create a detector on a local history with a burst snapshot"""
+        detector = FraudDetector(
+            hash_store=SQLiteHashStore(str(tmp_path / "history.db")),
+            burst_snapshot_path=str(tmp_path / "bursts.json")
+        )
+        yield detector
+        detector.close()
+
+    def _metadata(self, serial=None, model="PowerShot G7"):
+        """Forensic metadata of a claim shot with one camera, without GPS"""
+        return {'camera': {'make': "Canon", 'model': model, 'serial': serial}}
+
+    def _record_claims(self, detector, metadata, count, prefix):
+        """Record count claims of distinct cases"""
+        for number in range(count):
+            for key in detector._burst_keys(metadata):
+                detector.bursts.add(key, time.time(), f"{prefix}-{number}")
+
+    def test_camera_keyed_on_serial(self, detector):
+        """Cameras of one model are counted per device"""
+        assert detector._burst_keys(self._metadata("SN-1")) == ["camera:canon powershot g7:SN-1"]
+        assert detector._burst_keys(self._metadata("SN-1")) != detector._burst_keys(self._metadata("SN-2"))
+
+    def test_no_camera_burst_without_serial(self, detector):
+        """Make and model alone do not identify a device"""
+        self._record_claims(detector, self._metadata(), 50, "CASE")
+
+        assert detector._burst_keys(self._metadata()) == []
+        assert detector._analyze_patterns(self._metadata(), "CASE-NEW") == 0.0
+
+    def test_device_burst_scored(self, detector):
+        """One device in many claims saturates the score"""
+        self._record_claims(detector, self._metadata("SN-1"), CAMERA_CLAIMS_FOR_MAX_SCORE, "CASE")
+
+        assert detector._analyze_patterns(self._metadata("SN-1"), "CASE-NEW") == 1.0
+        assert detector._analyze_patterns(self._metadata("SN-2"), "CASE-NEW") == 0.0
+
+    def test_saturation_calibrated_to_fleet_volume(self, detector):
+        """Devices as busy as the rest of the fleet are not a burst"""
+        for device in range(12):
+            self._record_claims(detector, self._metadata(f"SN-{device}"), 25, f"CASE-{device}")
+
+        saturation = detector._burst_saturation(time.time())
+        score = detector._analyze_patterns(self._metadata("SN-0"), "CASE-NEW")
+
+        assert saturation['camera'] == 75
+        assert score == pytest.approx(25 / 75)
+        assert saturation['inspector'] == 20
+
+    def test_small_fleet_uses_minimum(self, detector):
+        """Too few active devices to know normal volume keep the minimum"""
+        for device in range(3):
+            self._record_claims(detector, self._metadata(f"SN-{device}"), 25, f"CASE-{device}")
+
+        assert detector._burst_saturation(time.time())['camera'] == CAMERA_CLAIMS_FOR_MAX_SCORE
+
+    def test_snapshot_restore(self, tmp_path):
+        """Counts survive a restart without being replayed twice"""
+        history = str(tmp_path / "history.db")
+        snapshot = str(tmp_path / "bursts.json")
+        metadata = {**self._metadata("SN-1"), 'inspector_id': "INS-7"}
+
+        with FraudDetector(hash_store=SQLiteHashStore(history), burst_snapshot_path=snapshot) as detector:
+            for number in range(5):
+                detector._store_image_hash(_hashes(), f"CASE-{number}", "s3://evidence/a.jpg", f"file-{number}",
+                                           metadata=metadata)
+            before = detector._analyze_patterns(metadata, "CASE-NEW")
+
+        with FraudDetector(hash_store=SQLiteHashStore(history), burst_snapshot_path=snapshot) as restored:
+            assert restored.bursts.restored
+            assert restored.bursts.count("inspector:INS-7") == 5
+            assert restored.bursts.count("camera:canon powershot g7:SN-1") == 5
+            assert restored._analyze_patterns(metadata, "CASE-NEW") == before == 5 / 20
+
+    def test_counts_replayed_without_snapshot(self, tmp_path):
+        """Without a snapshot, camera counts are rebuilt from the history"""
+        history = str(tmp_path / "history.db")
+
+        with FraudDetector(hash_store=SQLiteHashStore(history)) as detector:
+            for number in range(3):
+                detector._store_image_hash(_hashes(), f"CASE-{number}", "s3://evidence/a.jpg", f"file-{number}",
+                                           metadata=self._metadata("SN-1"))
+
+        with FraudDetector(hash_store=SQLiteHashStore(history)) as replayed:
+            assert not replayed.bursts.restored
+            assert replayed.bursts.count("camera:canon powershot g7:SN-1") == 0
+            replayed._analyze_patterns(self._metadata("SN-1"), "CASE-NEW")
+            assert replayed.bursts.count("camera:canon powershot g7:SN-1") == 3
+
+    def test_history_not_queried_until_patterns_checked(self, tmp_path):
+        """Constructing a detector makes no history query"""
+        store = SQLiteHashStore(str(tmp_path / "history.db"))
+        queried = []
+        recent = store.recent
+        store.recent = lambda since: queried.append(since) or recent(since)
+
+        with FraudDetector(hash_store=store) as detector:
+            assert queried == []
+            detector._analyze_patterns(self._metadata("SN-1"), "CASE-0")
+            detector._analyze_patterns(self._metadata("SN-1"), "CASE-1")
+            assert len(queried) == 1
+
+    def test_history_without_serial_column_upgraded(self, tmp_path):
+        """Histories written before camera serials were stored gain the column"""
+        path = str(tmp_path / "old.db")
+        conn = sqlite3.connect(path)
+        conn.execute(
+            'CREATE TABLE hash_records (id INTEGER PRIMARY KEY, case_id TEXT NOT NULL, '
+            'image_hash TEXT NOT NULL, phash INTEGER, dhash INTEGER, ahash INTEGER, file_hash TEXT, '
+            'image_url TEXT, timestamp TEXT NOT NULL, camera TEXT, latitude REAL, longitude REAL)'
+        )
+        conn.execute("INSERT INTO hash_records (case_id, image_hash, timestamp) VALUES ('CASE-0', 'ab', '2026-01-01')")
+        conn.commit()
+        conn.close()
+
+        store = SQLiteHashStore(path)
+        assert store.find_file('ab')[0]['camera_serial'] is None
+        store.close()
+
+    def test_history_with_perceptual_image_hash_upgraded(self, tmp_path):
+        """Histories that kept the perceptual hash in image_hash are moved to perceptual_hash"""
+        path = str(tmp_path / "old.db")
+        conn = sqlite3.connect(path)
+        conn.execute(
+            'CREATE TABLE hash_records (id INTEGER PRIMARY KEY, case_id TEXT NOT NULL, '
+            'image_hash TEXT NOT NULL, phash INTEGER, dhash INTEGER, ahash INTEGER, file_hash TEXT, '
+            'image_url TEXT, timestamp TEXT NOT NULL, camera TEXT, latitude REAL, longitude REAL, camera_serial TEXT)'
+        )
+        conn.execute("INSERT INTO hash_records (case_id, image_hash, phash, dhash, ahash, file_hash, timestamp) "
+                     "VALUES ('CASE-0', 'cafe', 1, 2, 3, 'ab12', '2026-01-01')")
+        conn.commit()
+        conn.close()
+
+        store = SQLiteHashStore(path)
+        assert [record['case_id'] for record in store.find('cafe')] == ["CASE-0"]
+        assert store.find_file('ab12')[0]['image_hash'] == 'ab12'
+        store.close()
+
+    def test_snapshot_of_other_layout_rejected(self, tmp_path):
+        """A snapshot with other buckets cannot be read as this layout"""
+        path = str(tmp_path / "bursts.json")
+        counter = BurstCounter(path, bucket_seconds=60)
+        counter.add("camera:x:1", time.time(), "CASE-1")
+        counter.snapshot()
+
+        with pytest.raises(ValueError):
+            BurstCounter(path)
+
+
+
+class TestSQLiteHashStore:
+    """Test suite for the embedded fraud history"""
+
+    @pytest.fixture
+    def store(self, tmp_path):
+        """Create a store in a temporary directory"""
+        store = SQLiteHashStore(str(tmp_path / "history" / "hashes.db"))
+        yield store
+        store.close()
+
+    def _record(self, case_id, timestamp, **fields):
+        """Full hash record of a case"""
+        return {
+            'case_id': case_id, 'image_hash': f"file-{case_id}", 'perceptual_hash': f"hash-{case_id}",
+            'phash': 1, 'dhash': 2, 'ahash': 3, 'file_hash': f"file-{case_id}",
+            'image_url': f"s3://evidence/{case_id}.jpg",
+            'timestamp': timestamp, 'camera': "Canon PowerShot G7", 'latitude': -34.6, 'longitude': -58.4,
+            'camera_serial': "SN-1", **fields
+        }
+
+    def test_round_trip(self, store):
+        """Records come back as stored, including 64-bit hashes"""
+        record = self._record("CASE-1", "2026-01-01T10:00:00", phash=(1 << 64) - 1, dhash=1 << 63, ahash=0)
+        store.put(record)
+
+        assert store.find("hash-CASE-1") == [record]
+        assert store.find_file("file-CASE-1") == [record]
+        assert store.find("hash-CASE-2") == []
+        assert len(store) == 1
+
+    def test_missing_fields_stored_as_none(self, store):
+        """Records without camera or location keep them empty"""
+        store.put({'case_id': "CASE-1", 'image_hash': "ab", 'timestamp': "2026-01-01T10:00:00"})
+
+        record = store.find_file("ab")[0]
+        assert record['camera'] is None and record['latitude'] is None and record['phash'] is None
+        assert record['perceptual_hash'] is None
+
+    def test_recent_in_time_order(self, store):
+        """recent() returns records since a time, oldest first"""
+        for case_id, timestamp in (("CASE-3", "2026-01-03T00:00:00"), ("CASE-1", "2026-01-01T00:00:00"),
+                                   ("CASE-2", "2026-01-02T12:00:00")):
+            store.put(self._record(case_id, timestamp))
+
+        assert [record['case_id'] for record in store.recent("2026-01-02T00:00:00")] == ["CASE-2", "CASE-3"]
+
+    def test_shared_between_connections(self, store):
+        """A second connection sees records as soon as they are put"""
+        other = SQLiteHashStore(store.db_path)
+        store.put(self._record("CASE-1", "2026-01-01T10:00:00"))
+
+        assert [record['case_id'] for record in other.find("hash-CASE-1")] == ["CASE-1"]
+        other.close()
+
+    def test_lookups_use_indexes(self, store):
+        """Every lookup is an index search, not a table scan"""
+        for clause in ("perceptual_hash = 'a'", "image_hash = 'a'", "timestamp >= 'a' ORDER BY timestamp"):
+            plan = store.conn.execute(f"EXPLAIN QUERY PLAN SELECT * FROM hash_records WHERE {clause}").fetchall()
+            assert all('USING INDEX' in row[-1] for row in plan)
+
+    def test_detector_finds_recycled_photo(self, store, tmp_path):
+        """A detector on the store flags a photo claimed before, without the network"""
+        moto = pytest.importorskip("moto")
+        with moto.mock_aws():
+            s3 = boto3.client('s3', region_name='us-east-1')
+            s3.create_bucket(Bucket='evidence')
+            s3.put_object(Bucket='evidence', Key='a.jpg', Body=_jpeg(_scene(6)))
+            s3.put_object(Bucket='evidence', Key='b.jpg', Body=_jpeg(_scene(6)))
+
+            with FraudDetector(hash_store=store) as detector:
+                detector.check_image("s3://evidence/a.jpg", {}, "CASE-1")
+                result = detector.check_image("s3://evidence/b.jpg", {}, "CASE-2")
+
+        assert result.similar_cases == ["CASE-1"]
+        assert result.is_suspicious
+
+
+class TestDynamoHashStore:
+    """Test suite for the DynamoDB fraud history"""
+
+    @pytest.fixture
+    def table(self):
+        """Create the fraud history table with its indexes in moto"""
+        moto = pytest.importorskip("moto")
+        with moto.mock_aws():
+            dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+            yield dynamodb.create_table(
+                TableName='omni-inspector-fraud-detection',
+                KeySchema=[{'AttributeName': 'case_id', 'KeyType': 'HASH'}],
+                AttributeDefinitions=[
+                    {'AttributeName': 'case_id', 'AttributeType': 'S'},
+                    {'AttributeName': 'image_hash', 'AttributeType': 'S'},
+                    {'AttributeName': 'perceptual_hash', 'AttributeType': 'S'},
+                    {'AttributeName': 'record_month', 'AttributeType': 'S'},
+                    {'AttributeName': 'timestamp', 'AttributeType': 'S'}
+                ],
+                GlobalSecondaryIndexes=[
+                    {
+                        'IndexName': 'ImageHashIndex',
+                        'KeySchema': [{'AttributeName': 'image_hash', 'KeyType': 'HASH'}],
+                        'Projection': {'ProjectionType': 'ALL'}
+                    },
+                    {
+                        'IndexName': 'PerceptualHashIndex',
+                        'KeySchema': [{'AttributeName': 'perceptual_hash', 'KeyType': 'HASH'}],
+                        'Projection': {'ProjectionType': 'ALL'}
+                    },
+                    {
+                        'IndexName': 'RecordMonthIndex',
+                        'KeySchema': [
+                            {'AttributeName': 'record_month', 'KeyType': 'HASH'},
+                            {'AttributeName': 'timestamp', 'KeyType': 'RANGE'}
+                        ],
+                        'Projection': {'ProjectionType': 'ALL'}
+                    }
+                ],
+                BillingMode='PAY_PER_REQUEST'
+            )
+
+    def _record(self, case_id, timestamp, latitude=None):
+        """Hash record of a case stored at timestamp"""
+        return {
+            'case_id': case_id, 'image_hash': f"file-{case_id}", 'perceptual_hash': f"hash-{case_id}",
+            'phash': 1, 'dhash': 2, 'ahash': 3, 'file_hash': f"file-{case_id}",
+            'image_url': None, 'timestamp': timestamp.isoformat(),
+            'camera': None, 'latitude': latitude, 'longitude': None, 'camera_serial': None
+        }
+
+    def test_recent_spans_months(self, table):
+        """recent() returns written and buffered records since a time, oldest first"""
+        store = DynamoHashStore(table, batch_size=2)
+        now = datetime.now()
+        store.put(self._record("CASE-OLD", now - timedelta(days=40)))
+        store.put(self._record("CASE-1", now - timedelta(days=3), latitude=-34.6))
+        store.put(self._record("CASE-2", now - timedelta(minutes=5)))
+
+        recent = store.recent((now - timedelta(days=30)).isoformat())
+
+        assert [item['case_id'] for item in recent] == ["CASE-1", "CASE-2"]
+        assert float(recent[0]['latitude']) == -34.6
+        store.close()
+
+    def test_writes_batched(self, table):
+        """Records reach the table in batches, on flush and on close"""
+        store = DynamoHashStore(table, batch_size=3)
+        now = datetime.now()
+        for number in range(4):
+            store.put(self._record(f"CASE-{number}", now, latitude=1.5))
+        assert table.scan()['Count'] == 3
+
+        store.flush()
+        assert table.scan()['Count'] == 4
+        store.put(self._record("CASE-4", now))
+        store.close()
+
+        items = {item['case_id']: item for item in table.scan()['Items']}
+        assert len(items) == 5
+        assert str(items["CASE-0"]['latitude']) == "1.5"
+        assert 'longitude' not in items["CASE-0"]
+        assert items["CASE-0"]['record_month'] == now.strftime('%Y-%m')
+
+    def test_buffered_records_found(self, table):
+        """Lookups see records that are not written yet"""
+        store = DynamoHashStore(table)
+        store.put({**self._record("CASE-1", datetime.now()), 'image_hash': "ab12"})
+
+        assert [item['case_id'] for item in store.find("hash-CASE-1")] == ["CASE-1"]
+        assert [item['case_id'] for item in store.find_file("ab12")] == ["CASE-1"]
+        store.close()
+        assert [item['case_id'] for item in store.find("hash-CASE-1")] == ["CASE-1"]
+
+    def test_mirror_serves_lookups(self, table):
+        """After load_mirror, written and new records are found locally"""
+        writer = DynamoHashStore(table)
+        writer.put({**self._record("CASE-1", datetime.now()), 'image_hash': "ab12"})
+        writer.close()
+
+        store = DynamoHashStore(table)
+        store.load_mirror()
+        table.delete_item(Key={'case_id': "CASE-1"})
+        store.put({**self._record("CASE-2", datetime.now()), 'perceptual_hash': "hash-CASE-1"})
+
+        assert [item['case_id'] for item in store.find("hash-CASE-1")] == ["CASE-1", "CASE-2"]
+        assert [item['case_id'] for item in store.find_file("ab12")] == ["CASE-1"]
+        store.close()
+
+    def test_legacy_records_found_by_file(self, table):
+        """Records holding only the file's SHA-256 still match exact copies"""
+        sha256 = hashlib.sha256(b"legacy").hexdigest()
+        table.put_item(Item={'case_id': "LEGACY-1", 'image_hash': sha256,
+                             'image_url': "s3://evidence/old.jpg", 'timestamp': "2025-01-01T00:00:00"})
+
+        with FraudDetector(hash_store=DynamoHashStore(table)) as detector:
+            assert detector._find_duplicates(_hashes(), file_hash=sha256) == ["LEGACY-1"]
+            assert detector._find_duplicates(_hashes()) == []
+            detector.hash_store.load_mirror()
+            assert detector._find_duplicates(_hashes(), file_hash=sha256) == ["LEGACY-1"]
+
+    def test_duplicate_keys_in_one_batch(self, table):
+        """A case stored twice in one batch keeps the later record"""
+        store = DynamoHashStore(table)
+        store.put(self._record("CASE-1", datetime.now()))
+        store.put({**self._record("CASE-1", datetime.now()), 'image_hash': "later"})
+        store.close()
+
+        assert [item['image_hash'] for item in table.scan()['Items']] == ["later"]
+
+    def test_missing_table_counted(self, table, capsys):
+        """Writes to a missing table are dropped and counted, not raised"""
+        missing = boto3.resource('dynamodb', region_name='us-east-1').Table('missing-table')
+        store = DynamoHashStore(missing, batch_size=2)
+        for number in range(3):
+            store.put(self._record(f"CASE-{number}", datetime.now()))
+        store.close()
+
+        assert store.failed == 3
+        out = capsys.readouterr().out
+        assert "dropped 2 hash records" in out and "dropped 1 hash records" in out
+        assert store.find("hash-CASE-0") == []
+        assert store.find("hash-CASE-1") == []
+        assert capsys.readouterr().out.count("reading fraud history table") == 1
+
+    def test_read_failure_does_not_hide_dropped_writes(self, table, capsys):
+        """A missing index warns about reads; later failed writes still warn"""
+        store = DynamoHashStore(table, time_index_name='MissingIndex')
+        assert store.recent((datetime.now() - timedelta(days=1)).isoformat()) == []
+        assert "reading fraud history table" in capsys.readouterr().out
+
+        store.table = boto3.resource('dynamodb', region_name='us-east-1').Table('missing-table')
+        store.put(self._record("CASE-0", datetime.now()))
+        store.close()
+        assert "dropped 1 hash records" in capsys.readouterr().out
+
+    def test_exit_hook_holds_no_store(self, table):
+        """Open stores are flushed at exit without being kept alive"""
+        store = DynamoHashStore(table)
+        reference = weakref.ref(store)
+        assert store in hash_store._open_stores
+        store.close()
+        assert store not in hash_store._open_stores
+
+        del store
+        gc.collect()
+        assert reference() is None
+
+    def test_geo_patterns_rebuilt_from_history(self, table, tmp_path):
+        """A detector on the default backend sees locations of earlier runs"""
+        gps = {'gps': {'latitude': -34.6037, 'longitude': -58.3816}}
+        with FraudDetector(hash_store=DynamoHashStore(table)) as first:
+            for number in range(4):
+                first._store_image_hash(_hashes(), f"CASE-{number}", "s3://evidence/a.jpg", f"file-{number}",
+                                        metadata=gps)
+
+        with FraudDetector(hash_store=DynamoHashStore(table)) as second:
+            assert second._analyze_patterns(gps, "CASE-NEW") == 1.0